@@ -0,0 +1,3089 @@
+"""Routes and engine of the reconciliation API.
+
+Importing this module loads pandas, pyarrow, rapidfuzz and openpyxl, so main.py imports it in the background
+once the server is up and adds ``router`` to the app then.
+"""
+from fastapi import APIRouter, Body, File, UploadFile, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+import asyncio
+import base64
+import io
+import mmap
+import os
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
+from functools import lru_cache, partial
+import pandas as pd
+import numpy as np
+from typing import List, Dict, Any, BinaryIO, Callable, Iterator, Optional, Tuple
+import json
+from dataset_store import DatasetStore
+from exports import EXPORT_CHUNK_ROWS, EXPORT_MEDIA_TYPES, export_schema, gzip_stream, iter_csv, iter_parquet, write_xlsx
+from fuzzy_matching import fuzzy_key_match, no_fuzzy_pairs
+from invoice_index import InvoiceIndex
+from split_matching import no_split_matches, split_match
+from metrics import (
+    METRICS_ENABLED, METRICS_MEDIA_TYPE, StageTimings, observe_stages, render_metrics, server_timing, timings_block,
+)
+from jobs import JobManager, JobLimitReached, CANCELLED, COMPLETED, FAILED, FINISHED_STATES
+from result_cache import ResultCache, cache_key, file_sha256
+from result_json import RenderedJSONResponse, columns_json, dumps, records_json, with_field
+from periods import (
+    DEFAULT_SPILLOVER_MONTHS, FILING_PERIOD_FIELD, MAX_SPILLOVER_MONTHS, PERIOD_COLUMN, UNKNOWN_PERIOD, PeriodError,
+    PeriodScope, filing_periods, invoice_months,
+)
+from tax_checks import (
+    PLACE_OF_SUPPLY_FIELD, TAX_CHECK_COLUMN, TAX_COMPONENTS, TAX_FIELDS, check_counts, difference_checks, side_checks,
+    tax_components,
+)
+from tolerances import RULE_COLUMNS, RULE_FIELDS, TDS_FIELD, ToleranceRuleError, ToleranceRules, partial_reasons
+from partitions import (
+    PartitionSpill, SharedPartitions, discard_partition_pool, frame_from_arrow, frame_to_arrow, partition_count,
+    partition_ids, partition_pool, read_shared_partition,
+)
+
+router = APIRouter()
+
+# Uploaded data, kept per session so concurrent users and workers don't overwrite each other
+dataset_store = DatasetStore.from_env()
+
+# Reconciliations run in a process pool so they never block the event loop
+job_manager = JobManager.from_env()
+
+# Parsed uploads and reconciliation results, keyed by the content of the files they came from
+result_cache = ResultCache.from_env()
+
+# Every invoice ever uploaded, kept on disk for lookups against earlier periods and uploads
+invoice_index = InvoiceIndex.from_env()
+
+# Where out-of-core runs keep their uploaded inputs and category files
+OUT_OF_CORE_DIR = os.environ.get('OUT_OF_CORE_DIR') or os.path.join(tempfile.gettempdir(), 'reconciliation-runs')
+
+# How often the job events stream checks for progress
+JOB_EVENT_INTERVAL_SECONDS = 0.5
+
+# Result pages
+RESULT_PAGE_MAX_LIMIT = 1000
+RESULT_SORT_FIELDS = ['Difference', 'Difference_Percentage', 'Date_Difference_Days']
+# Result details as lists of records, or as one array per field
+RESULT_LAYOUT_PATTERN = '^(records|columns)$'
+# Amount filters use the GST side unless the category only has the AP/AR side
+RESULT_AMOUNT_COLUMNS = {'missingInGST': 'APAR_Amount'}
+# Text columns of out-of-core category files, read back as written rather than as numbers
+RESULT_FILE_DTYPES = {'Invoice_No': str, 'APAR_Invoice_No': str, 'GSTIN': str, 'GST_Date': str, 'APAR_Date': str}
+
+REQUIRED_FIELDS = ['Invoice_No', 'GSTIN', 'Invoice_Value', 'Invoice_Date']
+
+# Party-name columns used for fuzzy matching, so columnar uploads read them along with the required fields
+PARTY_NAME_FIELDS = ['Trade_Name', 'Vendor_Customer_Name']
+
+# Key and date columns are read as text so leading zeros and date formats survive parsing
+REQUIRED_FIELD_DTYPES = {'Invoice_No': str, 'GSTIN': str, 'Invoice_Date': str}
+
+# Rows parsed at a time while streaming an upload
+CSV_CHUNK_ROWS = 100_000
+
+# Accepted upload file extensions and the loader format they map to
+UPLOAD_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+
+# Columns added at upload holding the hash of each row's normalized (Invoice_No, GSTIN) pair and of
+# everything reconciliation reads from the row
+KEY_HASH_COLUMN = 'Invoice_Key_Hash'
+ROW_HASH_COLUMN = 'Invoice_Row_Hash'
+UPLOAD_HASH_COLUMNS = [KEY_HASH_COLUMN, ROW_HASH_COLUMN]
+
+# Frame attribute holding the cache key of the upload a dataset was parsed from
+CONTENT_HASH_ATTR = 'content_hash'
+
+# Names of the two uploaded sides, as stored and as shown in messages
+UPLOAD_SIDES = {'gst': 'GST', 'apar': 'AP/AR'}
+
+# Column added when an upload is stored, ordering rows of different period partitions as they were uploaded:
+# the upload's batch number times UPLOAD_ORDER_STRIDE plus the row's position in the upload
+ORDER_COLUMN = 'Upload_Order'
+UPLOAD_ORDER_STRIDE = 2 ** 40
+
+# Column added at upload holding Invoice_Value in whole paise, so amounts compare as integers
+PAISE_COLUMN = 'Invoice_Value_Paise'
+# From this many paise on, floats no longer hold every whole paise; such values count as not numeric
+PAISE_LIMIT = 2 ** 53
+
+# Uploaded Invoice_No values are kept stripped in Arrow-backed strings and GSTINs, which repeat across a
+# party's invoices, as categorical codes
+KEY_TEXT_DTYPE = 'string[pyarrow]'
+
+# Shape of a GSTIN: two-digit state code, PAN and entity number, 'Z' and a check character
+GSTIN_PATTERN = r'^[0-9]{2}[0-9A-Z]{11}Z[0-9A-Z]$'
+# Malformed GSTINs listed per upload
+INVALID_GSTIN_SAMPLE = 10
+
+# Sample rows returned per side by /preview-missing
+PREVIEW_SAMPLE_ROWS = 10
+
+# Row numbers listed per duplicated key, and duplicated keys listed per upload
+DUPLICATE_ROWS_LIMIT = 50
+DUPLICATE_GROUPS_LIMIT = 1000
+
+
+def detect_duplicates(df: pd.DataFrame, key_hashes: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Detect duplicate invoices in the dataset without modifying it.
+
+    Rows are grouped by a 64-bit hash of their (Invoice_No, GSTIN) pair, so no composite key strings are
+    built. Pass ``key_hashes`` when they were already computed while reading the file. Keys are listed in
+    order of first appearance; ``occurrences`` is always the full count while ``rows`` is capped.
+    """
+    if key_hashes is None:
+        key_hashes = pd.util.hash_pandas_object(df[['Invoice_No', 'GSTIN']], index=False).to_numpy()
+    
+    # Only rows whose hash repeats need grouping
+    positions = np.flatnonzero(pd.Series(key_hashes).duplicated(keep=False).to_numpy())
+    
+    duplicate_info = []
+    duplicate_count = 0
+    if len(positions):
+        # Group by sorting on (hash, position): each run of equal hashes is one duplicated key
+        order = np.lexsort((positions, key_hashes[positions]))
+        positions = positions[order]
+        sorted_hashes = key_hashes[positions]
+        starts = np.flatnonzero(np.r_[True, sorted_hashes[1:] != sorted_hashes[:-1]])
+        counts = np.diff(np.r_[starts, len(positions)])
+        duplicate_count = len(starts)
+        
+        reported = np.argsort(positions[starts], kind='stable')[:DUPLICATE_GROUPS_LIMIT]
+        row_labels = df.index.to_numpy()
+        for group in reported:
+            start, count = starts[group], counts[group]
+            first = positions[start]
+            duplicate_info.append({
+                'invoice_no': str(df['Invoice_No'].iat[first]),
+                'gstin': str(df['GSTIN'].iat[first]),
+                'occurrences': int(count),
+                'rows': row_labels[positions[start:start + min(count, DUPLICATE_ROWS_LIMIT)]].tolist()
+            })
+    
+    return {
+        'has_duplicates': duplicate_count > 0,
+        'duplicate_count': duplicate_count,
+        'duplicates': duplicate_info
+    }
+
+
+# Date layouts tried when detecting a column's format, most common first
+DATE_FORMATS = ['ISO8601', '%d-%m-%Y', '%d/%m/%Y', '%d/%m/%y', '%d-%m-%y', '%d.%m.%Y', '%Y/%m/%d', '%d-%b-%Y', '%d %b %Y', 'excel']
+
+# Month-first dates, never detected as a column's format and tried only on values no layout above reads,
+# so 03/04/2025 stays 3 April and only the likes of 04/25/2025 are read month-first
+FALLBACK_DATE_FORMATS = ['%m/%d/%Y']
+
+# Distinct values inspected to pick a column's format
+DATE_SAMPLE_SIZE = 1000
+
+# Excel serial day numbers accepted as dates (1954-10-03 to 2119-01-12)
+EXCEL_SERIAL_RANGE = (20000, 80000)
+
+
+def _parse_with_format(values: pd.Series, date_format: str) -> pd.Series:
+    """Parse text values with one layout; anything that does not fit becomes NaT"""
+    if date_format == 'excel':
+        serials = pd.to_numeric(values, errors='coerce')
+        serials = serials.where(serials.between(*EXCEL_SERIAL_RANGE))
+        return pd.to_datetime(serials, unit='D', origin='1899-12-30', errors='coerce')
+    return pd.to_datetime(values, format=date_format, errors='coerce')
+
+
+def detect_date_format(values: pd.Series) -> str:
+    """Pick the layout from DATE_FORMATS that parses most of a sample of the values"""
+    sample = values.head(DATE_SAMPLE_SIZE)
+    scores = [int(_parse_with_format(sample, date_format).notna().sum()) for date_format in DATE_FORMATS]
+    return DATE_FORMATS[int(np.argmax(scores))]
+
+
+def column_date_format(values: pd.Series) -> Optional[str]:
+    """Layout parse_dates tries first for a column, or None when the column already holds datetimes"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return None
+    if pd.api.types.is_numeric_dtype(values):
+        return 'excel'
+    text = pd.Series(pd.unique(values.dropna()), dtype=object).astype(str).str.strip()
+    return detect_date_format(text[text != ''])
+
+
+def parse_dates(values: pd.Series, date_format: Optional[str] = None) -> Tuple[pd.Series, np.ndarray]:
+    """Parse a date column and flag the non-empty values that could not be parsed.
+
+    Each distinct value is parsed once: the column is factorized, ``date_format`` (detected from the column
+    when omitted) is applied to the distinct strings in one vectorized call, and values it rejects get the
+    remaining formats in turn, FALLBACK_DATE_FORMATS last.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.Series(values.to_numpy(), index=values.index), np.zeros(len(values), dtype=bool)
+    
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    present = (text != '').to_numpy()
+    
+    if pd.api.types.is_numeric_dtype(values):
+        formats = ['excel']
+    else:
+        first = date_format or detect_date_format(text[present])
+        formats = [first] + [other for other in DATE_FORMATS if other != first] + FALLBACK_DATE_FORMATS
+    
+    parsed_uniques = np.full(len(text), np.datetime64('NaT'), dtype='datetime64[ns]')
+    remaining = present.copy()
+    for candidate in formats:
+        if not remaining.any():
+            break
+        attempt = _parse_with_format(text[remaining], candidate)
+        parsed = attempt.notna().to_numpy()
+        positions = np.flatnonzero(remaining)[parsed]
+        parsed_uniques[positions] = attempt.to_numpy()[parsed]
+        remaining[positions] = False
+    
+    # Missing values (code -1) stay NaT and are not counted as failures
+    parsed_values = np.where(codes >= 0, parsed_uniques[codes], np.datetime64('NaT'))
+    failed = (codes >= 0) & remaining[codes]
+    return pd.Series(parsed_values, index=values.index), failed
+
+
+def calculate_date_difference(dates1: pd.Series, dates2: pd.Series) -> np.ndarray:
+    """Absolute difference in whole days between two date columns, NaN where either date is missing"""
+    return np.abs((dates1 - dates2).dt.days.to_numpy())
+
+
+@router.post("/upload/gst")
+async def upload_gst(
+    file: UploadFile = File(...),
+    session_id: Optional[str] = None,
+    columns: Optional[List[str]] = Query(None),
+    timings: bool = False,
+    append: bool = False,
+):
+    """Upload and validate GST CSV, Parquet or Arrow IPC file with duplicate detection.
+
+    The file replaces the GST data stored for the session; with ``append`` it replaces only the periods it
+    holds and the other stored periods are kept.
+    """
+    session_id = session_id or dataset_store.new_session_id()
+    validate_session_id(session_id)
+    file_format = upload_format(file.filename)
+    stages = StageTimings()
+    
+    try:
+        upload = await run_in_threadpool(load_cached_upload, file.file, file_format, columns, stages)
+        stages('storing dataset', len(upload['dataframe']))
+        stored_periods = await run_in_threadpool(store_upload, session_id, 'gst', upload, append)
+        history = await run_in_threadpool(index_upload, 'gst', upload, stages)
+        response_data = build_upload_response(upload, "GST file uploaded successfully", session_id, stored_periods, history)
+        return with_timings(response_data, stages.finish(), timings)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+
+@router.post("/upload/apar")
+async def upload_apar(
+    file: UploadFile = File(...),
+    session_id: Optional[str] = None,
+    columns: Optional[List[str]] = Query(None),
+    timings: bool = False,
+    append: bool = False,
+):
+    """Upload and validate AP/AR CSV, Parquet or Arrow IPC file with duplicate detection.
+
+    The file replaces the AP/AR data stored for the session; with ``append`` it replaces only the periods it
+    holds and the other stored periods are kept.
+    """
+    session_id = session_id or dataset_store.new_session_id()
+    validate_session_id(session_id)
+    file_format = upload_format(file.filename)
+    stages = StageTimings()
+    
+    try:
+        upload = await run_in_threadpool(load_cached_upload, file.file, file_format, columns, stages)
+        stages('storing dataset', len(upload['dataframe']))
+        stored_periods = await run_in_threadpool(store_upload, session_id, 'apar', upload, append)
+        history = await run_in_threadpool(index_upload, 'apar', upload, stages)
+        response_data = build_upload_response(upload, "AP/AR file uploaded successfully", session_id, stored_periods, history)
+        return with_timings(response_data, stages.finish(), timings)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+
+
+def with_timings(response_data: Dict[str, Any], stages: List[Dict[str, Any]], include: bool) -> Dict[str, Any]:
+    """Record a request's stages in the metrics and add them to its response when asked to"""
+    observe_stages(stages)
+    if include:
+        response_data['timings'] = timings_block(stages)
+    return response_data
+
+
+def upload_format(filename: Optional[str]) -> str:
+    """Loader format for an uploaded file name, rejecting unsupported extensions"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in UPLOAD_FORMATS:
+        raise HTTPException(status_code=400, detail="Only CSV, Parquet or Arrow IPC (Feather) files are allowed")
+    return UPLOAD_FORMATS[extension]
+
+
+def _ignore_progress(phase: str, rows_processed: int = 0, rows_total: int = 0) -> None:
+    pass
+
+
+def load_cached_upload(
+    source: BinaryIO, file_format: str, columns: Optional[List[str]] = None, progress: Callable = _ignore_progress
+) -> Dict[str, Any]:
+    """load_upload, skipped when a file with the same content was parsed with the same options before"""
+    progress('hashing upload')
+    key = cache_key('upload', {'sha256': file_sha256(source), 'format': file_format, 'columns': sorted(columns or [])})
+    progress('checking upload cache')
+    upload = result_cache.get('upload', key)
+    if upload is not None:
+        progress('checking upload cache', len(upload['dataframe']))
+        return upload
+    
+    upload = load_upload(source, file_format, columns, progress)
+    upload['dataframe'].attrs[CONTENT_HASH_ATTR] = key
+    progress('caching upload', len(upload['dataframe']))
+    result_cache.put('upload', key, upload)
+    return upload
+
+
+def load_upload(
+    source: BinaryIO, file_format: str, columns: Optional[List[str]] = None, progress: Callable = _ignore_progress
+) -> Dict[str, Any]:
+    """Read an uploaded file with the loader for its format"""
+    if file_format == 'csv':
+        return load_csv_upload(source, progress=progress)
+    return load_columnar_upload(source, file_format, columns, progress)
+
+
+def load_csv_upload(source: BinaryIO, chunk_rows: int = CSV_CHUNK_ROWS, progress: Callable = _ignore_progress) -> Dict[str, Any]:
+    """Parse an uploaded CSV in fixed-size chunks, validating headers and totalling values as it goes"""
+    progress('parsing upload')
+    reader = pd.read_csv(source, chunksize=chunk_rows, dtype=REQUIRED_FIELD_DTYPES, encoding='utf-8')
+    
+    chunks = []
+    total_paise = 0
+    rows = 0
+    
+    for chunk in reader:
+        # Headers are known after the first chunk, so reject bad files before reading the rest
+        if not chunks:
+            missing_fields = [field for field in REQUIRED_FIELDS if field not in chunk.columns]
+            if missing_fields:
+                raise HTTPException(
+                    status_code=400, 
+                    detail=f"Missing required fields: {', '.join(missing_fields)}"
+                )
+        
+        normalize_upload(chunk)
+        total_paise += int(chunk[PAISE_COLUMN].sum())
+        chunks.append(chunk)
+        rows += len(chunk)
+        progress('parsing upload', rows)
+    
+    dataframe = pd.concat(chunks, ignore_index=True)
+    # Each chunk has its own GSTIN categories, which concat falls back to plain text for
+    dataframe['GSTIN'] = dataframe['GSTIN'].astype('category')
+    
+    return _checked_upload(dataframe, total_paise, progress)
+
+
+def load_columnar_upload(
+    source: BinaryIO, file_format: str, columns: Optional[List[str]] = None, progress: Callable = _ignore_progress
+) -> Dict[str, Any]:
+    """Read a Parquet or Arrow IPC upload, loading only the columns reconciliation reads plus any in ``columns``.
+
+    Pass ``columns=['*']`` to load every column. Arrow IPC files are memory-mapped when the upload was
+    spooled to disk, so only the selected columns are ever materialized.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise HTTPException(status_code=400, detail="Parquet and Arrow uploads need pyarrow installed on the server")
+    
+    progress('parsing upload')
+    buffer = _upload_buffer(source, pa)
+    if file_format == 'parquet':
+        reader = pyarrow.parquet.ParquetFile(pa.BufferReader(buffer))
+        schema = reader.schema_arrow
+    else:
+        reader = pyarrow.ipc.open_file(buffer)
+        schema = reader.schema
+    
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in schema.names]
+    if missing_fields:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Missing required fields: {', '.join(missing_fields)}"
+        )
+    
+    selected = _selected_columns(schema.names, columns)
+    if file_format == 'parquet':
+        table = reader.read(columns=selected)
+    else:
+        table = reader.read_all().select(selected)
+    
+    dataframe = _columnar_frame(table, pa)
+    normalize_upload(dataframe)
+    progress('parsing upload', len(dataframe))
+    
+    return _checked_upload(dataframe, int(dataframe[PAISE_COLUMN].sum()), progress)
+
+
+def _checked_upload(dataframe: pd.DataFrame, total_paise: int, progress: Callable) -> Dict[str, Any]:
+    """Loader result of a parsed upload, with its duplicates and malformed GSTINs"""
+    progress('indexing periods', len(dataframe))
+    dataframe[PERIOD_COLUMN] = upload_periods(dataframe)
+    progress('detecting duplicates', len(dataframe))
+    duplicate_check = detect_duplicates(dataframe, dataframe[KEY_HASH_COLUMN].to_numpy())
+    progress('checking GSTINs', len(dataframe))
+    
+    return {
+        'dataframe': dataframe,
+        'total_invoice_value': total_paise / 100,
+        'duplicates': duplicate_check,
+        'invalid_gstins': invalid_gstins(dataframe['GSTIN']),
+    }
+
+
+def _selected_columns(names: List[str], columns: Optional[List[str]]) -> List[str]:
+    if columns and '*' in columns:
+        return list(names)
+    requested = (
+        set(REQUIRED_FIELDS) | set(PARTY_NAME_FIELDS) | set(RULE_FIELDS) | set(TAX_FIELDS) | {FILING_PERIOD_FIELD}
+        | set(columns or [])
+    )
+    return [name for name in names if name in requested]
+
+
+def _columnar_frame(table, pa) -> pd.DataFrame:
+    """Convert an Arrow table like the CSV loader reads: keys and dates are text, missing values are NaN"""
+    for field in REQUIRED_FIELD_DTYPES:
+        index = table.schema.get_field_index(field)
+        table = table.set_column(index, field, table.column(field).cast(pa.string()))
+    dataframe = table.to_pandas()
+    for field in REQUIRED_FIELD_DTYPES:
+        dataframe[field] = dataframe[field].where(dataframe[field].notna(), np.nan)
+    return dataframe
+
+
+def _upload_buffer(source: BinaryIO, pa):
+    # Uploads larger than the spool threshold live in a temporary file that can be mapped instead of read
+    try:
+        return pa.py_buffer(mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ))
+    except (AttributeError, OSError, ValueError):
+        source.seek(0)
+        return pa.py_buffer(source.read())
+
+
+def upload_periods(df: pd.DataFrame) -> pd.Categorical:
+    """Period of each uploaded row: its Filing_Period, or the month of its Invoice_Date where it has none"""
+    if FILING_PERIOD_FIELD in df.columns:
+        periods = filing_periods(df[FILING_PERIOD_FIELD])
+    else:
+        periods = np.full(len(df), UNKNOWN_PERIOD, dtype=object)
+    unfiled = periods == UNKNOWN_PERIOD
+    if unfiled.any():
+        dates, _ = parse_dates(df['Invoice_Date'][unfiled])
+        periods[unfiled] = invoice_months(dates)
+    return pd.Categorical(periods)
+
+
+def normalize_upload(df: pd.DataFrame) -> None:
+    """Store the keys and amount in the compact form every later stage reads, and cache the hashes.
+
+    Invoice_No and GSTIN are stripped here once: Invoice_No into KEY_TEXT_DTYPE, GSTIN into categorical
+    codes. Invoice_Value is added as PAISE_COLUMN, missing where it is not a number.
+    """
+    df['Invoice_No'] = df['Invoice_No'].astype(str).str.strip().astype(KEY_TEXT_DTYPE)
+    df['GSTIN'] = df['GSTIN'].astype(str).str.strip().astype('category')
+    df[PAISE_COLUMN] = to_paise(df['Invoice_Value'])
+    add_upload_hashes(df)
+
+
+def key_text(df: pd.DataFrame, column: str) -> pd.Series:
+    """Stripped text of a key column, as stored when the upload was normalized"""
+    values = df[column]
+    if isinstance(values.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+        return values
+    return values.astype(str).str.strip()
+
+
+def to_paise(values: pd.Series) -> pd.Series:
+    """Amounts in whole paise as nullable integers, missing where a value is not a finite number"""
+    paise = (pd.to_numeric(values, errors='coerce').astype(float) * 100).round()
+    return paise.where(paise.abs() < PAISE_LIMIT).astype('Int64')
+
+
+def invoice_paise(df: pd.DataFrame) -> pd.Series:
+    """Invoice values in paise, stored at upload or converted for frames loaded without them"""
+    if PAISE_COLUMN in df.columns:
+        return df[PAISE_COLUMN]
+    return to_paise(df['Invoice_Value'])
+
+
+def invoice_amounts(df: pd.DataFrame) -> np.ndarray:
+    """Invoice values in rupees from their whole paise, NaN where missing"""
+    return invoice_paise(df).to_numpy(dtype=float, na_value=np.nan) / 100
+
+
+def invalid_gstins(gstins: pd.Series) -> Dict[str, Any]:
+    """Rows whose GSTIN does not have the GSTIN shape, checked once per distinct GSTIN"""
+    categories = gstins.cat.categories
+    invalid = ~categories.str.match(GSTIN_PATTERN)
+    return {
+        'count': int(np.isin(gstins.cat.codes, np.flatnonzero(invalid)).sum()),
+        'values': categories[invalid][:INVALID_GSTIN_SAMPLE].tolist(),
+    }
+
+
+def add_upload_hashes(df: pd.DataFrame) -> None:
+    """Cache the key and row hashes that previews, duplicate checks and incremental runs compare"""
+    df[KEY_HASH_COLUMN] = invoice_key_hashes(df)
+    df[ROW_HASH_COLUMN] = invoice_row_hashes(df)
+
+
+def invoice_key_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Hash each row's stripped (Invoice_No, GSTIN) pair, the key reconciliation matches on"""
+    keys = pd.DataFrame({'Invoice_No': key_text(df, 'Invoice_No'), 'GSTIN': key_text(df, 'GSTIN')})
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def invoice_row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Hash the fields reconciliation reads from each row, so an amended invoice gets a new hash"""
+    fields = pd.DataFrame({
+        'Invoice_No': key_text(df, 'Invoice_No'),
+        'GSTIN': key_text(df, 'GSTIN'),
+        # Paise fit a float exactly, and plain floats hash far faster than nullable integers
+        'Invoice_Value': invoice_paise(df).to_numpy(dtype=float, na_value=np.nan),
+        'Invoice_Date': df['Invoice_Date'].astype(str),
+    })
+    # An absent name or rule column hashes like an empty one, so adding the other side's name column changes nothing
+    for text_field in PARTY_NAME_FIELDS + RULE_FIELDS + [PLACE_OF_SUPPLY_FIELD]:
+        fields[text_field] = df[text_field].fillna('').astype(str) if text_field in df.columns else ''
+    # Tax components hash as numbers, NaN where absent, so an amended tax split counts as an amended invoice
+    components = tax_components(df)
+    for position, component in enumerate(TAX_COMPONENTS):
+        fields[component] = components[:, position]
+    return pd.util.hash_pandas_object(fields, index=False).to_numpy()
+
+
+def build_upload_response(
+    upload: Dict[str, Any],
+    message: str,
+    session_id: str,
+    stored_periods: Dict[str, int],
+    history: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Shape the upload summary returned by /upload/gst and /upload/apar, with the index_upload ``history`` if any"""
+    dataframe = upload['dataframe']
+    duplicate_check = upload['duplicates']
+    
+    response_data = {
+        "status": "success",
+        "message": message,
+        "session_id": session_id,
+        "records": len(dataframe),
+        "fields": [column for column in dataframe.columns if column not in UPLOAD_HASH_COLUMNS + [PERIOD_COLUMN]],
+        "total_invoice_value": round(upload['total_invoice_value'], 2),
+        "duplicates": duplicate_check,
+        "invalid_gstins": upload['invalid_gstins'],
+        "periods": period_counts(dataframe),
+        "stored_periods": stored_periods,
+    }
+    if history is not None:
+        response_data["history"] = history
+    
+    # Add warning if duplicates or malformed GSTINs found
+    warnings = []
+    if duplicate_check['has_duplicates']:
+        warnings.append(f"Found {duplicate_check['duplicate_count']} duplicate invoice(s)")
+    if upload['invalid_gstins']['count']:
+        warnings.append(f"Found {upload['invalid_gstins']['count']} invoice(s) with a malformed GSTIN")
+    if history is not None and history['cross_period_duplicates']:
+        warnings.append(f"Found {history['cross_period_duplicates']} invoice(s) uploaded before under another period")
+    if warnings:
+        response_data["warning"] = '; '.join(warnings)
+    
+    return response_data
+
+def validate_session_id(session_id: str):
+    if not dataset_store.is_valid_session_id(session_id):
+        raise HTTPException(status_code=400, detail="Invalid session_id")
+
+
+def period_counts(dataframe: pd.DataFrame) -> Dict[str, int]:
+    """Rows of an upload per period, in period order"""
+    counts = dataframe[PERIOD_COLUMN].value_counts(sort=False)
+    return {str(period): int(rows) for period, rows in sorted(counts[counts > 0].items())}
+
+
+def store_upload(session_id: str, side: str, upload: Dict[str, Any], append: bool = False) -> Dict[str, int]:
+    """Store an upload one partition per period and return the rows now stored per period.
+
+    Without ``append`` the upload replaces everything stored for the side. With it, the upload's periods
+    replace the same periods and the others are kept, so a year of history can be built up a month at a time.
+    """
+    dataframe = upload['dataframe']
+    index = dataset_store.partition_index(session_id, side) if append else None
+    batch = int(index['batch'].max()) + 1 if index is not None and len(index) else 0
+    upload_hash = dataframe.attrs.get(CONTENT_HASH_ATTR)
+    
+    partitions = {}
+    for period, positions in dataframe.groupby(PERIOD_COLUMN, observed=True).indices.items():
+        partition = dataframe.take(positions).reset_index(drop=True)
+        partition[ORDER_COLUMN] = batch * UPLOAD_ORDER_STRIDE + positions.astype(np.int64)
+        partition.attrs = {}
+        if upload_hash is not None:
+            partition.attrs[CONTENT_HASH_ATTR] = cache_key('partition', {'upload': upload_hash, 'period': str(period), 'batch': batch})
+        partitions[str(period)] = partition
+    
+    index = dataset_store.put_partitions(session_id, side, partitions, batch, append)
+    return dict(zip(index['partition'].astype(str), index['rows'].tolist()))
+
+
+def index_upload(side: str, upload: Dict[str, Any], progress: Callable = _ignore_progress) -> Optional[Dict[str, Any]]:
+    """Find the upload's invoices that earlier uploads of the side hold under another period, then index the upload.
+
+    Returns None without an invoice index. An earlier upload of the same file is not looked at and is not
+    added again, so uploading a file twice reports the same duplicates both times.
+    """
+    if not invoice_index.enabled:
+        return None
+    dataframe = upload['dataframe']
+    source = dataframe.attrs.get(CONTENT_HASH_ATTR) or uuid.uuid4().hex
+    key_hashes = cached_key_hashes(dataframe)
+    periods = dataframe[PERIOD_COLUMN].astype(str).to_numpy(dtype=object)
+    
+    progress('looking up invoice history', len(dataframe))
+    found = invoice_index.lookup(side, key_hashes, exclude_source=source)
+    found = found[_other_periods(found, periods)]
+    flagged = np.unique(found['position'].to_numpy())
+    # Only the listed rows have their periods written out
+    sample = flagged[:DUPLICATE_GROUPS_LIMIT]
+    other_periods = _history_periods(found[found['position'].isin(sample)])
+    records = [
+        {'invoice_no': invoice_no, 'gstin': gstin, 'period': period, 'other_periods': history_periods.split(', ')}
+        for invoice_no, gstin, period, history_periods in zip(
+            key_text(dataframe.iloc[sample], 'Invoice_No'),
+            key_text(dataframe.iloc[sample], 'GSTIN'),
+            periods[sample],
+            other_periods.loc[sample],
+        )
+    ]
+    
+    progress('indexing invoices', len(dataframe))
+    indexed = invoice_index.add(side, source, pd.DataFrame({
+        'key_hash': key_hashes,
+        'period': periods,
+        'amount_paise': invoice_paise(dataframe).to_numpy(),
+        'invoice_date': dataframe['Invoice_Date'].astype(str).to_numpy(),
+        'invoice_no': key_text(dataframe, 'Invoice_No').to_numpy(dtype=object),
+        'gstin': key_text(dataframe, 'GSTIN').to_numpy(dtype=object),
+    }))
+    return {'indexed': indexed, 'cross_period_duplicates': len(flagged), 'records': records}
+
+
+def _other_periods(found: pd.DataFrame, periods: np.ndarray) -> np.ndarray:
+    """Which invoice index matches are under a known period other than that of the row they were looked up for"""
+    found_periods = found['period'].to_numpy(dtype=object)
+    row_periods = periods[found['position'].to_numpy()]
+    return (found_periods != UNKNOWN_PERIOD) & (row_periods != UNKNOWN_PERIOD) & (found_periods != row_periods)
+
+
+def _history_periods(found: pd.DataFrame) -> pd.Series:
+    """The distinct periods of the invoice index matches of each looked-up position, as sorted text by position"""
+    periods = found[['position', 'period']].drop_duplicates().sort_values(['position', 'period'])
+    return periods.groupby('position', sort=True)['period'].agg(', '.join)
+
+
+def period_scope(period_from: Optional[str], period_to: Optional[str], spillover_months: int) -> Optional[PeriodScope]:
+    """Scope of a request's period parameters, rejecting ones that are not periods"""
+    try:
+        return PeriodScope.from_params(period_from, period_to, spillover_months)
+    except PeriodError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid period range: {str(e)}")
+
+
+def load_session_datasets(session_id: str, scope: Optional[PeriodScope] = None):
+    """Fetch both uploaded sides of a session or fail with the usual upload hint.
+
+    Only the period partitions a ``scope`` needs are read. Rows of the spill-over months around its range are
+    kept only where their key is on the other side inside the range, so an invoice filed in one month and
+    booked in the next matches instead of showing as missing, while the adjacent months' other invoices
+    stay out of the run.
+    """
+    validate_session_id(session_id)
+    indexes = {side: dataset_store.partition_index(session_id, side) for side in UPLOAD_SIDES}
+    if any(index is None for index in indexes.values()):
+        raise HTTPException(status_code=400, detail="Please upload both GST and AP/AR files first")
+    periods = {side: index['partition'].astype(str).tolist() for side, index in indexes.items()}
+    
+    if scope is None:
+        selected = {side: _read_partitions(session_id, side, periods[side]) for side in UPLOAD_SIDES}
+        adjacent = {side: [] for side in UPLOAD_SIDES}
+    else:
+        selected = {side: _read_partitions(session_id, side, scope.core(periods[side])) for side in UPLOAD_SIDES}
+        adjacent = {side: _read_partitions(session_id, side, scope.adjacent(periods[side])) for side in UPLOAD_SIDES}
+    
+    for side, label in UPLOAD_SIDES.items():
+        if not selected[side] and not adjacent[side]:
+            stored = ', '.join(periods[side]) or 'none'
+            raise HTTPException(status_code=400, detail=f"No {label} invoices uploaded for these periods (stored: {stored})")
+    
+    # One key for everything read, since the spill-over rows kept on each side depend on the other side
+    partition_hashes = [
+        frame.attrs.get(CONTENT_HASH_ATTR) for side in UPLOAD_SIDES for frame in selected[side] + adjacent[side]
+    ]
+    datasets = []
+    for side, other in (('gst', 'apar'), ('apar', 'gst')):
+        frames = selected[side]
+        if adjacent[side]:
+            other_keys = np.concatenate([cached_key_hashes(frame) for frame in selected[other]] or [np.array([], dtype=np.uint64)])
+            frames = frames + [frame[np.isin(cached_key_hashes(frame), other_keys)] for frame in adjacent[side]]
+        dataframe = _assemble_partitions(frames)
+        if all(partition_hash is not None for partition_hash in partition_hashes):
+            scope_spec = scope.spec() if scope is not None else None
+            dataframe.attrs[CONTENT_HASH_ATTR] = cache_key('periods', {'side': side, 'partitions': partition_hashes, 'scope': scope_spec})
+        datasets.append(dataframe)
+    
+    return tuple(datasets)
+
+
+def _read_partitions(session_id: str, side: str, periods: List[str]) -> List[pd.DataFrame]:
+    partitions = dataset_store.get_partitions(session_id, side, periods)
+    if partitions is None:
+        raise HTTPException(status_code=400, detail="Please upload both GST and AP/AR files first")
+    return partitions
+
+
+def _assemble_partitions(partitions: List[pd.DataFrame]) -> pd.DataFrame:
+    """One dataset of period partitions, with its rows back in upload order"""
+    dataframe = pd.concat(partitions, ignore_index=True)
+    dataframe.attrs = {}
+    order = dataframe[ORDER_COLUMN].to_numpy()
+    if len(order) > 1 and (np.diff(order) < 0).any():
+        dataframe = dataframe.take(np.argsort(order, kind='stable')).reset_index(drop=True)
+    # Partitions of different uploads have their own GSTIN categories, which concat falls back to plain text for
+    if not isinstance(dataframe['GSTIN'].dtype, pd.CategoricalDtype):
+        dataframe['GSTIN'] = dataframe['GSTIN'].astype('category')
+    return dataframe
+
+
+@router.get("/preview-missing")
+async def preview_missing_records(
+    session_id: str,
+    period_from: Optional[str] = None,
+    period_to: Optional[str] = None,
+    spillover_months: int = Query(DEFAULT_SPILLOVER_MONTHS, ge=0, le=MAX_SPILLOVER_MONTHS),
+):
+    """Quick check for missing records before full reconciliation, over the periods from ``period_from`` to ``period_to``"""
+    scope = period_scope(period_from, period_to, spillover_months)
+    gst_dataframe, apar_dataframe = await run_in_threadpool(load_session_datasets, session_id, scope)
+    
+    try:
+        return await run_in_threadpool(build_missing_preview, gst_dataframe, apar_dataframe)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Preview error: {str(e)}")
+
+
+@router.get("/periods")
+async def list_periods(session_id: str):
+    """Rows stored per period for each uploaded side of a session"""
+    validate_session_id(session_id)
+    indexes = {side: await run_in_threadpool(dataset_store.partition_index, session_id, side) for side in UPLOAD_SIDES}
+    return {
+        side: dict(zip(index['partition'].astype(str), index['rows'].tolist())) if index is not None else {}
+        for side, index in indexes.items()
+    }
+
+
+def cached_key_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Key hashes stored at upload, recomputed for datasets stored before they were cached"""
+    if KEY_HASH_COLUMN in df.columns:
+        return df[KEY_HASH_COLUMN].to_numpy()
+    return invoice_key_hashes(df)
+
+
+def cached_row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Row hashes stored at upload, recomputed for datasets stored before they were cached"""
+    if ROW_HASH_COLUMN in df.columns:
+        return df[ROW_HASH_COLUMN].to_numpy()
+    return invoice_row_hashes(df)
+
+
+def build_missing_preview(gst_df: pd.DataFrame, apar_df: pd.DataFrame) -> Dict[str, Any]:
+    """Anti-join both sides on their key hashes to count and sample the keys only one side has"""
+    gst_hashes = pd.Series(cached_key_hashes(gst_df))
+    apar_hashes = pd.Series(cached_key_hashes(apar_df))
+    
+    # One entry per distinct key, taken from its first row
+    gst_first = np.flatnonzero(~gst_hashes.duplicated().to_numpy())
+    apar_first = np.flatnonzero(~apar_hashes.duplicated().to_numpy())
+    
+    # With keys distinct per side, a key repeating across the concatenation is on both sides
+    distinct = pd.concat([gst_hashes.iloc[gst_first], apar_hashes.iloc[apar_first]], ignore_index=True)
+    on_both_sides = distinct.duplicated(keep=False).to_numpy()
+    gst_common = on_both_sides[:len(gst_first)]
+    apar_common = on_both_sides[len(gst_first):]
+    
+    return {
+        'status': 'success',
+        'missing_in_apar': _missing_key_summary(gst_df, gst_first[~gst_common]),
+        'missing_in_gst': _missing_key_summary(apar_df, apar_first[~apar_common]),
+        'common_records': int(gst_common.sum()),
+        'total_gst_records': len(gst_first),
+        'total_apar_records': len(apar_first)
+    }
+
+
+def _missing_key_summary(df: pd.DataFrame, positions: np.ndarray) -> Dict[str, Any]:
+    values = pd.Series(invoice_amounts(df)[positions])
+    
+    sample = positions[:PREVIEW_SAMPLE_ROWS]
+    records = [
+        {
+            'invoice_no': invoice_no,
+            'gstin': gstin,
+            'invoice_value': None if pd.isna(value) else float(value),
+            'invoice_date': str(invoice_date)
+        }
+        for invoice_no, gstin, value, invoice_date in zip(
+            key_text(df.iloc[sample], 'Invoice_No'),
+            key_text(df.iloc[sample], 'GSTIN'),
+            values.iloc[:PREVIEW_SAMPLE_ROWS],
+            df['Invoice_Date'].iloc[sample],
+        )
+    ]
+    
+    return {
+        'count': len(positions),
+        'total_value': round(float(values.sum()), 2),
+        'records': records
+    }
+
+@router.post("/reconcile")
+async def reconcile(
+    session_id: str,
+    fuzzy: bool = False,
+    incremental: bool = True,
+    timings: bool = False,
+    layout: str = Query('records', pattern=RESULT_LAYOUT_PATTERN),
+    split: bool = False,
+    tax: bool = False,
+    rules: Optional[Dict[str, Any]] = Body(None),
+    period_from: Optional[str] = None,
+    period_to: Optional[str] = None,
+    spillover_months: int = Query(DEFAULT_SPILLOVER_MONTHS, ge=0, le=MAX_SPILLOVER_MONTHS),
+):
+    """Perform AI-powered reconciliation between GST and AP/AR data, with the tolerance ``rules`` in the body"""
+    scope = period_scope(period_from, period_to, spillover_months)
+    job_id = await submit_reconciliation(session_id, fuzzy, incremental, rules, split, scope, tax)
+    job = await job_manager.wait(job_id)
+    
+    if job['status'] == CANCELLED:
+        raise HTTPException(status_code=409, detail="Reconciliation was cancelled")
+    if job['status'] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Reconciliation error: {job['error']}")
+    
+    classified = job_manager.result(job_id)
+    rows_total = classified['gst_count'] + classified['apar_count']
+    stages = StageTimings()
+    stages('serializing response', rows_total)
+    body = await run_in_threadpool(partial(render_reconciliation_result, **classified, layout=layout))
+    observe_stages(stages.finish())
+    
+    run_stages = job_manager.timings(job_id) + stages.stages
+    if timings:
+        body = with_field(body, 'timings', timings_block(run_stages))
+    headers = {'Server-Timing': server_timing(run_stages)} if METRICS_ENABLED else None
+    return RenderedJSONResponse(body, headers=headers)
+
+
+async def submit_reconciliation(
+    session_id: str,
+    fuzzy: bool,
+    incremental: bool,
+    rules: Optional[Dict[str, Any]] = None,
+    split: bool = False,
+    scope: Optional[PeriodScope] = None,
+    tax: bool = False,
+) -> str:
+    """Queue a reconciliation of the session's datasets in the process pool.
+
+    With ``incremental``, the state kept from the session's previous run lets the job re-merge only the keys
+    that changed and report them. Every completed run replaces that state. ``rules`` is a tolerance rule
+    set as documented in the tolerances module, compiled here once for the whole run. ``split`` adds the
+    split-invoice pass of the split_matching module. ``scope`` limits the run to a range of periods. ``tax``
+    adds the tax-component checks of the tax_checks module.
+    """
+    try:
+        tolerances = ToleranceRules.from_spec(rules)
+    except ToleranceRuleError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid tolerance rules: {str(e)}")
+    
+    gst_dataframe, apar_dataframe = await run_in_threadpool(load_session_datasets, session_id, scope)
+    baseline = await run_in_threadpool(load_session_baseline, session_id) if incremental else None
+    
+    key = reconciliation_cache_key(gst_dataframe, apar_dataframe, {'fuzzy': fuzzy, 'split': split, 'tax': tax, 'tolerances': tolerances.spec()})
+    datasets = (gst_dataframe, apar_dataframe)
+    if key is not None:
+        job_id = await run_in_threadpool(complete_from_cache, session_id, key, baseline, datasets)
+        if job_id is not None:
+            return job_id
+    
+    on_complete = partial(keep_session_result, session_id, key, datasets)
+    try:
+        if partition_count(len(gst_dataframe) + len(apar_dataframe)) > 1:
+            # The job only coordinates the partition pool, which reads its partitions from shared memory
+            return job_manager.submit(
+                classify_reconciliation, gst_dataframe, apar_dataframe, fuzzy, baseline, tolerances, split, tax,
+                on_complete=on_complete, in_process=True,
+            )
+        handles, release = await run_in_threadpool(share_reconciliation_inputs, gst_dataframe, apar_dataframe, baseline)
+        try:
+            return job_manager.submit(
+                classify_shared_inputs, handles, fuzzy, tolerances, split, tax,
+                on_complete=on_complete, on_finish=release,
+            )
+        except BaseException:
+            release()
+            raise
+    except JobLimitReached as e:
+        raise HTTPException(status_code=429, detail=f"Too many reconciliations in progress: {str(e)}")
+
+
+def share_reconciliation_inputs(
+    gst_df: pd.DataFrame, apar_df: pd.DataFrame, baseline: Optional[Dict[str, pd.DataFrame]]
+) -> Tuple[Dict[str, Any], Callable[[], None]]:
+    """Put a job's frames in shared memory as Arrow streams, so they are not pickled into the worker.
+
+    Returns the handles, with the baseline's date formats, and the call that releases the memory.
+    """
+    frames = {'gst': gst_df, 'apar': apar_df}
+    if baseline is not None:
+        frames.update({BASELINE_KINDS[kind]: frame for kind, frame in baseline.items()})
+    stack = ExitStack()
+    try:
+        handles = {name: stack.enter_context(SharedPartitions.whole(frame)).handle(0) for name, frame in frames.items()}
+    except BaseException:
+        stack.close()
+        raise
+    if baseline is not None:
+        handles['baseline_date_formats'] = baseline['keys'].attrs.get('date_formats')
+    return handles, stack.close
+
+
+def classify_shared_inputs(
+    handles: Dict[str, Any],
+    fuzzy_matching: bool,
+    tolerances: Optional[ToleranceRules],
+    split_matching: bool,
+    tax_checks: bool,
+    progress: Callable = _ignore_progress,
+) -> Dict[str, Any]:
+    """classify_reconciliation in a job worker, of the inputs share_reconciliation_inputs put in shared memory"""
+    gst_df = read_shared_partition(handles['gst'])
+    apar_df = read_shared_partition(handles['apar'])
+    baseline = None
+    if BASELINE_KINDS['keys'] in handles:
+        baseline = {kind: read_shared_partition(handles[stored]) for kind, stored in BASELINE_KINDS.items()}
+        baseline['keys'].attrs['date_formats'] = handles['baseline_date_formats']
+    return classify_reconciliation(
+        gst_df, apar_df, fuzzy_matching, baseline, tolerances, split_matching, tax_checks, progress, partitions=1
+    )
+
+
+def load_session_baseline(session_id: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """State kept from the session's last reconciliation, or None if any part of it is gone"""
+    baseline = {name: dataset_store.get(session_id, kind) for name, kind in BASELINE_KINDS.items()}
+    if any(frame is None for frame in baseline.values()):
+        return None
+    return baseline
+
+
+def reconciliation_cache_key(gst_df: pd.DataFrame, apar_df: pd.DataFrame, settings: Dict[str, Any]) -> Optional[str]:
+    """Cache key of reconciling both uploads with ``settings``, or None unless both came through the upload cache"""
+    gst_hash = gst_df.attrs.get(CONTENT_HASH_ATTR)
+    apar_hash = apar_df.attrs.get(CONTENT_HASH_ATTR)
+    if gst_hash is None or apar_hash is None:
+        return None
+    return cache_key('result', {'gst': gst_hash, 'apar': apar_hash, 'settings': settings})
+
+
+def complete_from_cache(
+    session_id: str,
+    key: str,
+    baseline: Optional[Dict[str, pd.DataFrame]],
+    datasets: Tuple[pd.DataFrame, pd.DataFrame],
+) -> Optional[str]:
+    """Register the cached result of ``key`` as a completed job, or return None on a miss.
+
+    The changes against the session's baseline and the invoice history of the reconciled ``datasets`` are
+    worked out again, so a hit answers exactly like a run.
+    """
+    stages = StageTimings()
+    stages('checking result cache')
+    cached = result_cache.get('result', key)
+    if cached is None:
+        return None
+    
+    rows_total = cached['gst_count'] + cached['apar_count']
+    stages('checking result cache', rows_total)
+    result = dict(cached, changes=None)
+    if baseline is not None:
+        stages('comparing with baseline', rows_total)
+        result['changes'] = _key_changes(baseline['keys'], cached['baseline']['keys'])
+    if invoice_index.enabled:
+        stages('looking up invoice history', rows_total)
+    result['history'] = invoice_history(result['categories'], *datasets)
+    stages('storing baseline', rows_total)
+    result = keep_session_baseline(session_id, result)
+    
+    job_stages = stages.finish()
+    observe_stages(job_stages)
+    return job_manager.add_completed(result, job_stages, rows_total)
+
+
+def keep_session_result(
+    session_id: str, key: Optional[str], datasets: Tuple[pd.DataFrame, pd.DataFrame], result: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Cache a finished job's result, then keep its state as the session's baseline and add its invoice history"""
+    if key is not None:
+        # Changes depend on the session's baseline, so they are worked out again on every hit
+        result_cache.put('result', key, {name: value for name, value in result.items() if name != 'changes'})
+    # History depends on everything indexed since, so it is never cached
+    result['history'] = invoice_history(result['categories'], *datasets)
+    return keep_session_baseline(session_id, result)
+
+
+def keep_session_baseline(session_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Store a finished job's state as the session's baseline and return the rest of its result"""
+    for name, frame in result.pop('baseline').items():
+        dataset_store.put(session_id, BASELINE_KINDS[name], frame)
+    return result
+
+
+# Missing-invoice categories looked up in the invoice index, with the side their rows come from and the column
+# holding each row's position in that side's dataset
+HISTORY_CATEGORIES = {'missingInGST': ('apar', 'APAR_Order'), 'missingInAPAR': ('gst', 'GST_Row')}
+
+# Flags of invoice history records, in the order they are counted:
+#   late_filing             an invoice missing from the GST data was filed in GST, only in periods after its own
+#   filed_before            an invoice missing from the GST data was filed in GST under an earlier or the same period
+#   booked_elsewhere        an invoice missing from the AP/AR data was booked in an AP/AR upload
+#   cross_period_duplicate  the invoice was uploaded on its own side before, under another period
+HISTORY_FLAGS = ['late_filing', 'filed_before', 'booked_elsewhere', 'cross_period_duplicate']
+HISTORY_COLUMNS = ['Invoice_No', 'GSTIN', 'Category', 'Period', 'Flag', 'History_Periods']
+
+
+def invoice_history(categories: Dict[str, pd.DataFrame], gst_df: pd.DataFrame, apar_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """Invoices missing on one side that the invoice index holds from other periods or uploads, or None without one.
+
+    The keys of each missing category are looked up in batches on both sides of the index. Each record names the
+    invoice, its category and period, a HISTORY_FLAGS flag and the periods the index holds it under.
+    """
+    if not invoice_index.enabled:
+        return None
+    datasets = {'gst': gst_df, 'apar': apar_df}
+    flagged = []
+    for category, (side, position_column) in HISTORY_CATEGORIES.items():
+        frame = categories[category]
+        positions = frame[position_column].to_numpy(dtype=np.int64)
+        key_hashes = cached_key_hashes(datasets[side])[positions]
+        periods = datasets[side][PERIOD_COLUMN].astype(str).to_numpy(dtype=object)[positions]
+        
+        # On the other side, anything found is history; on the GST side, whether it is late depends on its periods
+        found = invoice_index.lookup('apar' if side == 'gst' else 'gst', key_hashes)
+        if side == 'apar':
+            found_periods = found['period'].to_numpy(dtype=object)
+            row_periods = periods[found['position'].to_numpy()]
+            later = (found_periods != UNKNOWN_PERIOD) & (row_periods != UNKNOWN_PERIOD) & (found_periods > row_periods)
+            late = pd.Series(later).groupby(found['position'].to_numpy()).all()
+            flags = pd.Series(np.where(late.to_numpy(), 'late_filing', 'filed_before'), index=late.index)
+        else:
+            positions_found = np.unique(found['position'].to_numpy())
+            flags = pd.Series('booked_elsewhere', index=positions_found, dtype=object)
+        flagged.append(_history_records(frame, category, periods, found, flags))
+        
+        found = invoice_index.lookup(side, key_hashes)
+        found = found[_other_periods(found, periods)]
+        flags = pd.Series('cross_period_duplicate', index=np.unique(found['position'].to_numpy()), dtype=object)
+        flagged.append(_history_records(frame, category, periods, found, flags))
+    
+    history = pd.concat(flagged, ignore_index=True)
+    # Each category's records by row, a row's flags in HISTORY_FLAGS order
+    order = np.lexsort((
+        history['Flag'].map(HISTORY_FLAGS.index).to_numpy(),
+        history.pop('Row').to_numpy(),
+        history['Category'].map(list(HISTORY_CATEGORIES).index).to_numpy(),
+    ))
+    return history.iloc[order].reset_index(drop=True)
+
+
+def _history_records(
+    frame: pd.DataFrame, category: str, periods: np.ndarray, found: pd.DataFrame, flags: pd.Series
+) -> pd.DataFrame:
+    """History records of the rows of ``frame`` at the positions ``flags`` is indexed by"""
+    rows = flags.index.to_numpy(dtype=np.int64)
+    return pd.DataFrame({
+        'Invoice_No': frame['Invoice_No'].to_numpy(dtype=object)[rows],
+        'GSTIN': frame['GSTIN'].to_numpy(dtype=object)[rows],
+        'Category': category,
+        'Period': periods[rows],
+        'Flag': flags.to_numpy(dtype=object),
+        'History_Periods': _history_periods(found).reindex(rows).to_numpy(dtype=object),
+        'Row': rows,
+    }, columns=HISTORY_COLUMNS + ['Row'])
+
+
+@router.post("/jobs/reconcile")
+async def create_reconcile_job(
+    session_id: str,
+    fuzzy: bool = False,
+    incremental: bool = True,
+    split: bool = False,
+    tax: bool = False,
+    rules: Optional[Dict[str, Any]] = Body(None),
+    period_from: Optional[str] = None,
+    period_to: Optional[str] = None,
+    spillover_months: int = Query(DEFAULT_SPILLOVER_MONTHS, ge=0, le=MAX_SPILLOVER_MONTHS),
+):
+    """Start a reconciliation in the background and return its job ID"""
+    scope = period_scope(period_from, period_to, spillover_months)
+    job_id = await submit_reconciliation(session_id, fuzzy, incremental, rules, split, scope, tax)
+    return job_manager.status(job_id)
+
+
+@router.post("/jobs/reconcile-files")
+async def create_out_of_core_job(
+    gst_file: UploadFile = File(...),
+    apar_file: UploadFile = File(...),
+    fuzzy: bool = False,
+    split: bool = False,
+):
+    """Reconcile two files too large for memory in the background, writing each category to disk"""
+    run_dir = os.path.join(OUT_OF_CORE_DIR, uuid.uuid4().hex)
+    inputs = {}
+    for kind, upload in (('gst', gst_file), ('apar', apar_file)):
+        upload_format(upload.filename)
+        inputs[kind] = (upload.file, os.path.join(run_dir, 'inputs', kind + os.path.splitext(upload.filename)[1].lower()))
+    await run_in_threadpool(save_uploads, inputs.values())
+    
+    try:
+        job_id = job_manager.submit(reconcile_saved_files, run_dir, inputs['gst'][1], inputs['apar'][1], fuzzy, split)
+    except JobLimitReached as e:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        raise HTTPException(status_code=429, detail=f"Too many reconciliations in progress: {str(e)}")
+    return job_manager.status(job_id)
+
+
+def save_uploads(uploads) -> None:
+    for source, path in uploads:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        source.seek(0)
+        with open(path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """Prometheus histograms of the wall time, rows and peak allocation of every timed stage"""
+    return Response(render_metrics(), media_type=METRICS_MEDIA_TYPE)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hits, misses and size of the upload and result cache"""
+    return await run_in_threadpool(result_cache.stats)
+
+
+@router.get("/invoice-index")
+async def get_invoice_index_stats():
+    """Uploads and invoices held by the invoice index, and its size on disk"""
+    return await run_in_threadpool(invoice_index.stats)
+
+
+@router.get("/invoice-index/lookup")
+async def lookup_invoice(gstin: str, invoice_no: str):
+    """Every upload of an invoice on either side, by its GSTIN and Invoice_No"""
+    if not invoice_index.enabled:
+        raise HTTPException(status_code=400, detail="No invoice index is kept; set INVOICE_INDEX_PATH to keep one")
+    key_hashes = invoice_key_hashes(pd.DataFrame({'Invoice_No': [invoice_no], 'GSTIN': [gstin]}))
+    found = {side: await run_in_threadpool(invoice_index.lookup, side, key_hashes) for side in UPLOAD_SIDES}
+    return {
+        side: [
+            {
+                'period': period,
+                'invoice_value': None if pd.isna(paise) else int(paise) / 100,
+                'invoice_date': invoice_date,
+                'source': source,
+            }
+            for period, paise, invoice_date, source in zip(
+                matches['period'], matches['amount_paise'], matches['invoice_date'], matches['source']
+            )
+        ]
+        for side, matches in found.items()
+    }
+
+
+@router.get("/jobs/{job_id}/files/{category}")
+async def download_result_file(job_id: str, category: str):
+    """Category rows of an out-of-core run as CSV"""
+    result = get_completed_result(job_id)
+    path = result.get('files', {}).get(category)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No result file for {category}")
+    return FileResponse(path, media_type='text/csv', filename=f'{category}.csv')
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Poll a reconciliation job's state and progress"""
+    return get_job_status(job_id)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-sent events stream of a job's progress until it finishes"""
+    get_job_status(job_id)
+    
+    async def events():
+        last_sent = None
+        while True:
+            job = job_manager.status(job_id)
+            if job is None:
+                return
+            if job != last_sent:
+                yield f"data: {json.dumps(job)}\n\n"
+                last_sent = job
+            if job['status'] in FINISHED_STATES:
+                return
+            await asyncio.sleep(JOB_EVENT_INTERVAL_SECONDS)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, layout: str = Query('records', pattern=RESULT_LAYOUT_PATTERN)):
+    """Fetch the reconciliation result once the job has completed"""
+    result = get_completed_result(job_id)
+    # Out-of-core runs keep their rows on disk and already hold their summary
+    if 'files' in result:
+        return result
+    return RenderedJSONResponse(await run_in_threadpool(partial(render_reconciliation_result, **result, layout=layout)))
+
+
+@router.get("/results/{job_id}/summary")
+async def get_result_summary(job_id: str):
+    """Summary, insights and per-category counts of a completed reconciliation"""
+    result = get_completed_result(job_id)
+    if 'files' in result:
+        return {'summary': result['summary'], 'insights': result['insights'], 'categories': result['counts']}
+    overview = summarize_reconciliation(
+        result['categories'], result['gst_count'], result['apar_count'], result['unparsed_dates'], result.get('history'),
+        result['default_tolerances'],
+    )
+    overview['categories'] = {name: len(frame) for name, frame in result['categories'].items()}
+    if result['changes'] is not None:
+        overview['changes'] = count_changes(result['changes'])
+    return overview
+
+
+@router.get("/results/{job_id}/{category}")
+async def get_result_page(
+    job_id: str,
+    category: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=RESULT_PAGE_MAX_LIMIT),
+    sort_by: Optional[str] = None,
+    order: str = Query('asc', pattern='^(asc|desc)$'),
+    gstin: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+):
+    """One page of a result category, optionally sorted and filtered by GSTIN or amount range"""
+    result = get_completed_result(job_id)
+    
+    if 'files' in result:
+        raise HTTPException(status_code=409, detail=f"Rows of this run are on disk, download them from /jobs/{job_id}/files/{category}")
+    if category not in result['categories']:
+        raise HTTPException(status_code=404, detail=f"Unknown result category: {category}")
+    frame = result['categories'][category]
+    if sort_by is not None and (sort_by not in RESULT_SORT_FIELDS or sort_by not in frame.columns):
+        raise HTTPException(status_code=400, detail=f"Cannot sort {category} by {sort_by}")
+    
+    positions = sorted_result_positions(job_id, category, sort_by, order == 'desc')
+    
+    keep = np.ones(len(frame), dtype=bool)
+    if gstin:
+        keep &= frame['GSTIN'].to_numpy() == gstin.strip()
+    amount = frame[RESULT_AMOUNT_COLUMNS.get(category, 'GST_Amount')].to_numpy()
+    if min_amount is not None:
+        keep &= amount >= min_amount
+    if max_amount is not None:
+        keep &= amount <= max_amount
+    positions = positions[keep[positions]]
+    
+    start = decode_result_cursor(cursor)
+    end = start + limit
+    page = frame.iloc[positions[start:end]]
+    
+    return {
+        'category': category,
+        'total': len(positions),
+        'records': category_records(category, page),
+        'next_cursor': encode_result_cursor(end) if end < len(positions) else None
+    }
+
+
+@router.get("/export/{job_id}/{category}")
+async def export_result_category(
+    job_id: str,
+    category: str,
+    request: Request,
+    file_format: str = Query('csv', alias='format', pattern='^(csv|xlsx|parquet)$'),
+):
+    """Every row of a result category as a CSV, XLSX or Parquet download.
+
+    CSV and Parquet are streamed as they are written; CSV is gzip-compressed for clients that accept it.
+    """
+    result = get_completed_result(job_id)
+    chunks = result_export_chunks(result, category)
+    filename = f'{category}.{file_format}'
+
+    if file_format == 'xlsx':
+        return await xlsx_response({category: chunks}, filename)
+
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    if file_format == 'parquet':
+        frame = None if 'files' in result else result['categories'][category]
+        stream = iter_parquet(chunks, export_schema(export_columns(category, frame)))
+    else:
+        stream = iter_csv(chunks)
+        headers['Vary'] = 'Accept-Encoding'
+        if 'gzip' in request.headers.get('accept-encoding', ''):
+            stream = gzip_stream(stream)
+            headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(stream, media_type=EXPORT_MEDIA_TYPES[file_format], headers=headers)
+
+
+@router.get("/export/{job_id}")
+async def export_result_workbook(job_id: str):
+    """Every result category of a completed reconciliation as one XLSX workbook, a worksheet per category"""
+    result = get_completed_result(job_id)
+    return await xlsx_response(
+        {category: result_export_chunks(result, category) for category in RECORD_COLUMNS},
+        'reconciliation.xlsx',
+    )
+
+
+def result_export_chunks(result: Dict[str, Any], category: str) -> Iterator[pd.DataFrame]:
+    """Export rows of a result category, EXPORT_CHUNK_ROWS at a time, read from memory or an out-of-core run's file.
+
+    Checks the category before the first chunk is requested, so an unknown one fails the request instead of the stream.
+    """
+    if 'files' in result:
+        if category not in result['files']:
+            raise HTTPException(status_code=404, detail=f"Unknown result category: {category}")
+        frames = pd.read_csv(result['files'][category], chunksize=EXPORT_CHUNK_ROWS, dtype=RESULT_FILE_DTYPES)
+    else:
+        if category not in result['categories']:
+            raise HTTPException(status_code=404, detail=f"Unknown result category: {category}")
+        frame = result['categories'][category]
+        # An empty category still yields one empty chunk, so its export has a header
+        frames = (frame.iloc[start:start + EXPORT_CHUNK_ROWS] for start in range(0, max(len(frame), 1), EXPORT_CHUNK_ROWS))
+
+    return (export_records(category, chunk) for chunk in frames)
+
+
+def export_records(category: str, frame: pd.DataFrame) -> pd.DataFrame:
+    """The category's records for ``frame``, as a frame with the export columns"""
+    records = pd.DataFrame.from_records(category_records(category, frame), columns=export_columns(category, frame))
+    if 'Date_Mismatch' in records.columns:
+        records['Date_Mismatch'] = records['Date_Mismatch'].fillna(False).astype(bool)
+    return records
+
+
+async def xlsx_response(sheets: Dict[str, Iterator[pd.DataFrame]], filename: str) -> FileResponse:
+    """Write a workbook to a temporary file off the event loop and send it, removing the file afterwards"""
+    descriptor, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(descriptor)
+    try:
+        await run_in_threadpool(write_xlsx, sheets, path)
+    except BaseException:
+        os.remove(path)
+        raise
+    return FileResponse(path, media_type=EXPORT_MEDIA_TYPES['xlsx'], filename=filename, background=BackgroundTask(os.remove, path))
+
+
+def get_completed_result(job_id: str) -> Dict[str, Any]:
+    job = get_job_status(job_id)
+    
+    if job['status'] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Reconciliation error: {job['error']}")
+    if job['status'] != COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    
+    return job_manager.result(job_id)
+
+
+@lru_cache(maxsize=64)
+def sorted_result_positions(job_id: str, category: str, sort_by: Optional[str], descending: bool) -> np.ndarray:
+    """Row order of a result category, computed once per sort and reused across pages"""
+    frame = job_manager.result(job_id)['categories'][category]
+    if sort_by is None:
+        return np.arange(len(frame))
+    
+    values = frame[sort_by].to_numpy(dtype=float)
+    # Negating keeps the sort stable for ties and leaves NaN last in both directions
+    return np.argsort(-values if descending else values, kind='stable')
+
+
+def encode_result_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({'offset': offset}).encode()).decode()
+
+
+def decode_result_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))['offset']
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running reconciliation job"""
+    get_job_status(job_id)
+    job_manager.cancel(job_id)
+    return get_job_status(job_id)
+
+
+def get_job_status(job_id: str) -> Dict[str, Any]:
+    job = job_manager.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def shutdown_job_pool():
+    """Stop the job and partition pools; called by the app's lifespan when the server shuts down"""
+    job_manager.shutdown()
+    discard_partition_pool()
+
+
+# Uploads reconciled by warm_up: an exact, a fuzzy and a split match, each with its tax split
+WARM_UP_GST_CSV = b"""Invoice_No,GSTIN,Invoice_Value,Invoice_Date,Trade_Name,Taxable_Value,CGST_Amount,SGST_Amount,IGST_Amount,Total_Tax,Place_of_Supply
+INV-001,29ABCDE1234F1Z5,1180.00,2025-07-01,Acme Traders,1000.00,90.00,90.00,0.00,180.00,Karnataka
+INV-002,29ABCDE1234F1Z5,2360.00,2025-07-02,Acme Traders,2000.00,180.00,180.00,0.00,360.00,Karnataka
+INV-003,29ABCDE1234F1Z5,3540.00,2025-07-03,Acme Traders,3000.00,270.00,270.00,0.00,540.00,Karnataka
+"""
+WARM_UP_APAR_CSV = b"""Invoice_No,GSTIN,Invoice_Value,Invoice_Date,Vendor_Customer_Name,Taxable_Value,CGST_Amount,SGST_Amount,IGST_Amount,Total_Tax,Place_of_Supply
+INV-001,29ABCDE1234F1Z5,1180.00,2025-07-01,Acme Traders,1000.00,90.00,90.00,0.00,180.00,Karnataka
+INV/0002,29ABCDE1234F1Z5,2360.00,2025-07-02,Acme Traders,2000.00,180.00,180.00,0.00,360.00,Karnataka
+BILL-31,29ABCDE1234F1Z5,1540.00,2025-07-03,Acme Traders,,,,,,
+BILL-32,29ABCDE1234F1Z5,2000.00,2025-07-04,Acme Traders,,,,,,
+"""
+
+
+def warm_up() -> None:
+    """Reconcile a few invoices in this process, then start the job pool.
+
+    Parts of pandas, pyarrow and rapidfuzz are only imported when first used, so the first real request would
+    pay for them. Pool workers are forked from this process once everything is loaded.
+    """
+    gst_df = load_csv_upload(io.BytesIO(WARM_UP_GST_CSV))['dataframe']
+    apar_df = load_csv_upload(io.BytesIO(WARM_UP_APAR_CSV))['dataframe']
+    classified = classify_reconciliation(gst_df, apar_df, True, None, ToleranceRules.from_spec(None), True, True)
+    classified.pop('baseline')
+    render_reconciliation_result(**classified, layout='records')
+    job_manager.start()
+
+
+# Columns that identify the same invoice on both sides
+MATCH_KEYS = ['Invoice_No', 'GSTIN']
+
+# Above this share of changed keys an incremental run reconciles everything again
+INCREMENTAL_MAX_CHANGED_RATIO = 0.5
+
+
+def _prepare_side(
+    df: pd.DataFrame,
+    prefix: str,
+    name_column: str,
+    date_format: Optional[str],
+    rule_fields: List[str] = (),
+    tax_checks: bool = False,
+) -> pd.DataFrame:
+    """Build the cleaned columnar view of one side without touching the uploaded frame.
+
+    Dates are parsed with ``date_format`` first; ``{prefix}_Date_Unparsed`` flags those that could not be parsed.
+    Each of ``rule_fields`` that tolerance rules read is carried as ``{prefix}_{field}``. With ``tax_checks``
+    the tax components are carried as ``{prefix}_{component}`` and the side's own consistency checks as
+    ``{prefix}_Tax_Checks``.
+    """
+    parsed_dates, unparsed_dates = parse_dates(df['Invoice_Date'], date_format)
+    side = pd.DataFrame({
+        'Invoice_No': key_text(df, 'Invoice_No').to_numpy(dtype=object),
+        'GSTIN': key_text(df, 'GSTIN').to_numpy(dtype=object),
+        f'{prefix}_Amount': invoice_amounts(df),
+        f'{prefix}_Date': df['Invoice_Date'].astype(str).to_numpy(),
+        f'{prefix}_Date_Parsed': parsed_dates.to_numpy(),
+        f'{prefix}_Name': _party_names(df, name_column).to_numpy(),
+        f'{prefix}_Date_Unparsed': unparsed_dates,
+    })
+    for field in rule_fields:
+        side[f'{prefix}_{field}'] = _rule_values(df, field)
+    if tax_checks:
+        components = tax_components(df)
+        places = df[PLACE_OF_SUPPLY_FIELD] if PLACE_OF_SUPPLY_FIELD in df.columns else None
+        for position, component in enumerate(TAX_COMPONENTS):
+            side[f'{prefix}_{component}'] = components[:, position]
+        side[f'{prefix}_{TAX_CHECK_COLUMN}'] = side_checks(
+            components, side[f'{prefix}_Amount'].to_numpy(), key_text(df, 'GSTIN'), places, prefix
+        )
+    return side
+
+
+def _party_names(df: pd.DataFrame, name_column: str) -> pd.Series:
+    """Stripped party names of one side, empty where the column is absent or blank"""
+    if name_column not in df.columns:
+        return pd.Series('', index=df.index)
+    return df[name_column].fillna('').astype(str).str.strip()
+
+
+def _rule_values(df: pd.DataFrame, field: str) -> np.ndarray:
+    """A column tolerance rules read: TDS in rupees, 0 where missing or absent; other fields as stripped text"""
+    if field == TDS_FIELD:
+        if field not in df.columns:
+            return np.zeros(len(df))
+        return pd.to_numeric(df[field], errors='coerce').fillna(0).to_numpy(dtype=float)
+    return _party_names(df, field).to_numpy()
+
+
+def _round2(values) -> List[float]:
+    """Round like the builtin round() so results match the original row-by-row output"""
+    return [round(value, 2) for value in values]
+
+
+def match_invoices(
+    gst_df: pd.DataFrame,
+    apar_df: pd.DataFrame,
+    progress: Callable = _ignore_progress,
+    fuzzy_matching: bool = True,
+    baseline: Optional[Dict[str, pd.DataFrame]] = None,
+    date_formats: Optional[Dict[str, Optional[str]]] = None,
+    fuzzy_use_names: Optional[bool] = None,
+    tolerances: Optional[ToleranceRules] = None,
+    split_matching: bool = False,
+    tax_checks: bool = False,
+) -> Dict[str, Any]:
+    """Outer-merge both sides on (Invoice_No, GSTIN) and classify every row with NumPy masks.
+
+    With the ``baseline`` state of an earlier run, only keys whose rows were added, removed or amended on
+    either side are merged again and the rows of every other key are carried over from the baseline; the
+    fuzzy pass still sees all leftovers, so the categories are the same as from a full run.
+
+    ``date_formats`` and ``fuzzy_use_names`` are detected from the inputs unless given, which a partition of
+    a larger input needs so it decides like the whole would. ``tolerances`` decide how far amounts and dates
+    of a pair may differ; the default rules keep the fixed thresholds. ``split_matching`` adds the pass that
+    matches a GST invoice to several AP/AR entries adding up to it. ``tax_checks`` adds the Tax_Checks
+    bitmask of the tax_checks module to every invoice.
+
+    Returns the category frames, the unparseable date counts per side, the state to keep as the next
+    baseline and, when a baseline was given, the keys that changed since it.
+    """
+    rows_total = len(gst_df) + len(apar_df)
+
+    progress('indexing keys', 0, rows_total)
+    gst_keys = cached_key_hashes(gst_df)
+    apar_keys = cached_key_hashes(apar_df)
+    # A repeated AP/AR key keeps its first position but the values of its last row
+    apar_order, apar_uniques = pd.factorize(apar_keys)
+    date_formats = date_formats or input_date_formats(gst_df, apar_df)
+    tolerances = tolerances or ToleranceRules.from_spec(None)
+    rule_fields = tolerances.apar_fields
+    digests = {
+        'gst': _key_digests(gst_keys, cached_row_hashes(gst_df)),
+        'apar': _key_digests(apar_keys, cached_row_hashes(apar_df)),
+    }
+
+    # Carried pairs are classified again, so they need every column the rules read, and have tax checks
+    # exactly when this run checks tax
+    carried = None
+    if (
+        baseline is not None
+        and baseline['keys'].attrs.get('date_formats') == date_formats
+        and all(f'APAR_{field}' in baseline['pairs'].columns for field in rule_fields)
+        and (TAX_CHECK_COLUMN in baseline['pairs'].columns) == tax_checks
+    ):
+        carried = _carry_over_baseline(baseline, digests, gst_keys, apar_order, apar_uniques)
+
+    if carried is None:
+        gst_positions = np.arange(len(gst_df))
+        apar_positions = np.arange(len(apar_df))
+    else:
+        gst_positions = np.flatnonzero(~pd.Series(gst_keys).isin(carried['unchanged']).to_numpy())
+        apar_positions = np.flatnonzero(~pd.Series(apar_keys).isin(carried['unchanged']).to_numpy())
+
+    progress('preparing GST', 0, rows_total)
+    gst = _prepare_side(
+        gst_df if carried is None else gst_df.iloc[gst_positions], 'GST', 'Trade_Name', date_formats['gst'],
+        tax_checks=tax_checks,
+    )
+    gst['GST_Row'] = gst_positions
+    gst['Key_Hash'] = gst_keys[gst_positions]
+
+    progress('preparing AP/AR', len(gst_df), rows_total)
+    apar = _prepare_side(
+        apar_df if carried is None else apar_df.iloc[apar_positions], 'APAR', 'Vendor_Customer_Name', date_formats['apar'],
+        rule_fields, tax_checks,
+    )
+    apar['APAR_Order'] = apar_order[apar_positions]
+    apar['Key_Hash'] = apar_keys[apar_positions]
+    unparsed_counts = {
+        'gst': _key_counts(gst['Key_Hash'].to_numpy(), gst['GST_Date_Unparsed'].to_numpy()),
+        'apar': _key_counts(apar['Key_Hash'].to_numpy(), apar['APAR_Date_Unparsed'].to_numpy()),
+    }
+
+    progress('matching', rows_total, rows_total)
+    pairs, missing_in_gst = _match_exact(gst, apar)
+    if tax_checks:
+        _combine_tax_checks(pairs, missing_in_gst)
+    if carried is not None:
+        pairs = pd.concat([carried['pairs'], pairs]).sort_values('GST_Row', kind='stable').reset_index(drop=True)
+        missing_in_gst = pd.concat([carried['missing'], missing_in_gst]).sort_values('APAR_Order', kind='stable').reset_index(drop=True)
+        for side in ('gst', 'apar'):
+            unparsed_counts[side] = pd.concat([carried['unparsed'][side], unparsed_counts[side]])
+        if split_matching:
+            # The split pass compares the dates of leftovers, which the baseline keeps as text only
+            _parse_carried_dates(pairs, (pairs['_merge'] != 'both').to_numpy(), 'GST', date_formats['gst'])
+            _parse_carried_dates(missing_in_gst, np.ones(len(missing_in_gst), dtype=bool), 'APAR', date_formats['apar'])
+
+    progress('classifying', rows_total, rows_total)
+    categories = _classify_pairs(
+        pairs, missing_in_gst, progress, rows_total, fuzzy_matching, fuzzy_use_names, tolerances, split_matching
+    )
+
+    keys = _key_states(digests, unparsed_counts, categories)
+    keys.attrs['date_formats'] = date_formats
+    return {
+        'categories': categories,
+        'unparsed_dates': {side: int(keys[f'{side.upper()}_Unparsed'].sum()) for side in ('gst', 'apar')},
+        'state': {'keys': keys, 'pairs': pairs, 'missing': missing_in_gst},
+        'changes': _key_changes(baseline['keys'], keys) if baseline is not None else None,
+    }
+
+
+def _parse_carried_dates(frame: pd.DataFrame, rows: np.ndarray, prefix: str, date_format: Optional[str]) -> None:
+    """Parse the text dates of the selected rows that have no parsed date, as rows carried from a baseline"""
+    parsed = pd.to_datetime(frame[f'{prefix}_Date_Parsed'])
+    rows = np.flatnonzero(rows & parsed.isna().to_numpy())
+    if len(rows):
+        parsed.iloc[rows] = parse_dates(frame[f'{prefix}_Date'].iloc[rows], date_format)[0].to_numpy()
+    frame[f'{prefix}_Date_Parsed'] = parsed
+
+
+def input_date_formats(gst_df: pd.DataFrame, apar_df: pd.DataFrame) -> Dict[str, Optional[str]]:
+    return {'gst': column_date_format(gst_df['Invoice_Date']), 'apar': column_date_format(apar_df['Invoice_Date'])}
+
+
+def _match_exact(gst: pd.DataFrame, apar: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Pair every prepared GST row with its AP/AR row, returning the pairs and the AP/AR-only rows"""
+    apar = apar[~apar['Key_Hash'].duplicated(keep='last').to_numpy()]
+    apar_keys = pd.Series(apar['Key_Hash'].to_numpy(), index=apar['APAR_Order'].to_numpy())
+    merged = gst.drop(columns=['GST_Date_Unparsed', 'Key_Hash']).merge(
+        apar.drop(columns=['APAR_Date_Unparsed', 'Key_Hash']), on=MATCH_KEYS, how='outer', indicator=True
+    )
+    # An outer merge of empty frames leaves the keys where the left frame had them; keep them first always
+    merged = merged[MATCH_KEYS + [column for column in merged.columns if column not in MATCH_KEYS]]
+
+    in_gst = merged['_merge'] != 'right_only'
+    pairs = merged[in_gst].sort_values('GST_Row', kind='stable').reset_index(drop=True)
+    missing_in_gst = merged[~in_gst].sort_values('APAR_Order', kind='stable').reset_index(drop=True)
+    # Key hashes skip the merge, where missing values would turn them into floats
+    pairs['Key_Hash'] = gst['Key_Hash'].to_numpy()
+    missing_in_gst['Key_Hash'] = apar_keys.loc[missing_in_gst['APAR_Order'].to_numpy(dtype=np.int64)].to_numpy()
+
+    gst_amount = pairs['GST_Amount'].to_numpy()
+    difference = _amount_difference(gst_amount, pairs['APAR_Amount'].to_numpy())
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pairs['Difference'] = np.abs(difference)
+        pairs['Difference_Percentage'] = np.abs(difference / gst_amount * 100)
+
+    pairs['Date_Difference_Days'] = calculate_date_difference(pairs['GST_Date_Parsed'], pairs['APAR_Date_Parsed'])
+    return pairs, missing_in_gst
+
+
+def _combine_tax_checks(pairs: pd.DataFrame, missing_in_gst: pd.DataFrame) -> None:
+    """Replace the tax components and side checks of merged rows by one Tax_Checks bitmask per invoice.
+
+    A pair gets both sides' consistency checks and the components the sides disagree on; a row found on one
+    side only gets that side's checks.
+    """
+    components = {
+        prefix: [f'{prefix}_{component}' for component in TAX_COMPONENTS] for prefix in ('GST', 'APAR')
+    }
+    pairs[TAX_CHECK_COLUMN] = (
+        _tax_check_values(pairs['GST_Tax_Checks'])
+        | _tax_check_values(pairs['APAR_Tax_Checks'])
+        | difference_checks(pairs[components['GST']].to_numpy(dtype=float), pairs[components['APAR']].to_numpy(dtype=float))
+    )
+    missing_in_gst[TAX_CHECK_COLUMN] = _tax_check_values(missing_in_gst['APAR_Tax_Checks'])
+    for frame in (pairs, missing_in_gst):
+        frame.drop(columns=components['GST'] + components['APAR'] + ['GST_Tax_Checks', 'APAR_Tax_Checks'], inplace=True)
+
+
+def _tax_check_values(column: pd.Series) -> np.ndarray:
+    # The outer merge leaves the checks of an absent side missing
+    return column.fillna(0).to_numpy().astype(np.uint16)
+
+
+def _amount_difference(gst_amount: np.ndarray, apar_amount: np.ndarray) -> np.ndarray:
+    """GST minus AP/AR amount, subtracted in whole paise so amounts that agree to the paise differ by exactly 0"""
+    return (np.round(gst_amount * 100) - np.round(apar_amount * 100)) / 100
+
+
+def _classify_pairs(
+    pairs: pd.DataFrame,
+    missing_in_gst: pd.DataFrame,
+    progress: Callable,
+    rows_total: int,
+    fuzzy_matching: bool,
+    fuzzy_use_names: Optional[bool] = None,
+    tolerances: Optional[ToleranceRules] = None,
+    split_matching: bool = False,
+) -> Dict[str, pd.DataFrame]:
+    """Split the exact-key pairs into categories and pair the leftovers whose keys differ only by formatting.
+
+    Every pair is judged by its own tolerances, carried baseline pairs included, and flags its date mismatch.
+    With ``split_matching``, GST leftovers are then matched to several AP/AR leftovers adding up to them.
+    """
+    limits = (tolerances or ToleranceRules.from_spec(None)).evaluate(pairs)
+    found = (pairs['_merge'] == 'both').to_numpy()
+    difference = pairs['Difference'].to_numpy()
+    date_difference = pairs['Date_Difference_Days'].to_numpy()
+    tds = pairs[f'APAR_{TDS_FIELD}'].to_numpy() if f'APAR_{TDS_FIELD}' in pairs.columns else 0
+    with np.errstate(invalid='ignore'):
+        exact = found & (difference <= limits['exact_amount'])
+        within_percent = pairs['Difference_Percentage'].to_numpy() <= limits['partial_percent']
+        within_amount = difference <= limits['partial_amount']
+        within_tds = difference <= limits['partial_amount'] + np.where(limits['tds'], tds, 0)
+        partial = found & ~exact & (within_percent | within_amount | within_tds)
+        pairs['Date_Mismatch'] = found & (date_difference > limits['date_window_days'])
+        pairs['Date_Critical'] = pairs['Date_Mismatch'].to_numpy() & (date_difference > limits['critical_date_days'])
+    mismatched = found & ~exact & ~partial
+
+    partial_pairs = pairs[partial].assign(Reason=partial_reasons(
+        within_percent[partial],
+        within_amount[partial],
+        _row_values(limits['partial_percent'], partial),
+        _row_values(limits['partial_amount'], partial),
+    ))
+
+    # Second pass: leftovers whose keys differ only by formatting
+    missing_in_apar = pairs[~found]
+    fuzzy_pairs = no_fuzzy_pairs()
+    if fuzzy_matching:
+        progress('fuzzy matching', rows_total, rows_total)
+        fuzzy_pairs = fuzzy_key_match(missing_in_apar, missing_in_gst, fuzzy_use_names)
+    fuzzy_key_matches = _fuzzy_key_matches(missing_in_apar, missing_in_gst, fuzzy_pairs)
+    missing_in_apar = missing_in_apar.drop(missing_in_apar.index[fuzzy_pairs['gst_position']])
+    missing_in_gst = missing_in_gst.drop(missing_in_gst.index[fuzzy_pairs['apar_position']])
+
+    # Third pass: GST leftovers the ledger booked in parts or netted with credit notes
+    split_pairs = no_split_matches()
+    if split_matching:
+        progress('split matching', rows_total, rows_total)
+        split_tolerance = _row_values(limits['exact_amount'], pairs.index.get_indexer(missing_in_apar.index))
+        split_pairs = split_match(missing_in_apar, missing_in_gst, split_tolerance)
+    split_matches = _split_matches(missing_in_apar, missing_in_gst, split_pairs)
+    missing_in_apar = missing_in_apar.drop(missing_in_apar.index[np.unique(split_pairs['gst_position'])])
+    missing_in_gst = missing_in_gst.drop(missing_in_gst.index[split_pairs['apar_position']])
+
+    return {
+        'matched': pairs[exact],
+        'partialMatch': partial_pairs,
+        'mismatched': pairs[mismatched],
+        'missingInGST': missing_in_gst,
+        'missingInAPAR': missing_in_apar,
+        'dateDiscrepancies': pairs[pairs['Date_Mismatch'].to_numpy()],
+        'fuzzyKeyMatch': fuzzy_key_matches,
+        'splitMatch': split_matches,
+    }
+
+
+def _row_values(values: Any, rows: np.ndarray) -> Any:
+    """The selected rows (a mask or positions) of a per-row tolerance, or the tolerance itself when every row shares it"""
+    return values[rows] if np.ndim(values) else values
+
+
+def _key_digests(key_hashes: np.ndarray, row_hashes: np.ndarray) -> pd.Series:
+    """Order-sensitive digest of the row hashes of each key, indexed by key hash"""
+    order = np.argsort(key_hashes, kind='stable')
+    keys = key_hashes[order]
+    if len(keys) == 0:
+        return pd.Series(np.array([], dtype=np.uint64), index=pd.Index(keys))
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    rank = np.arange(len(keys)) - np.repeat(starts, np.diff(np.r_[starts, len(keys)]))
+    # uint64 arithmetic wraps, so the weighted sum mixes row content with row order within the key
+    weighted = row_hashes[order] * (2 * rank.astype(np.uint64) + 1)
+    return pd.Series(np.add.reduceat(weighted, starts), index=pd.Index(keys[starts]))
+
+
+def _key_counts(key_hashes: np.ndarray, flags: np.ndarray) -> pd.Series:
+    """Number of flagged rows per key, indexed by key hash"""
+    keys, codes = np.unique(key_hashes, return_inverse=True)
+    return pd.Series(np.bincount(codes, weights=flags, minlength=len(keys)).astype(np.int64), index=pd.Index(keys))
+
+
+def _carry_over_baseline(
+    baseline: Dict[str, pd.DataFrame],
+    digests: Dict[str, pd.Series],
+    gst_keys: np.ndarray,
+    apar_order: np.ndarray,
+    apar_uniques: np.ndarray,
+) -> Optional[Dict[str, Any]]:
+    """Rows of the baseline whose keys are unchanged on both sides, renumbered to their current positions.
+
+    Returns None when so much changed, or the baseline is so inconsistent, that a full run is the better choice.
+    """
+    previous = baseline['keys'].set_index('Key_Hash')
+    current = digests['gst'].index.union(digests['apar'].index)
+    gst_digest = digests['gst'].reindex(current, fill_value=0).to_numpy()
+    apar_digest = digests['apar'].reindex(current, fill_value=0).to_numpy()
+
+    known = previous.index.get_indexer(current)
+    same = (
+        (known >= 0)
+        & (previous['GST_Digest'].to_numpy()[known] == gst_digest)
+        & (previous['APAR_Digest'].to_numpy()[known] == apar_digest)
+    )
+    if (~same).sum() > INCREMENTAL_MAX_CHANGED_RATIO * max(len(current), 1):
+        return None
+    unchanged = current[same]
+
+    pairs = baseline['pairs'][baseline['pairs']['Key_Hash'].isin(unchanged).to_numpy()]
+    missing = baseline['missing'][baseline['missing']['Key_Hash'].isin(unchanged).to_numpy()]
+
+    # Unchanged keys have the same GST rows in the same order, only possibly at other positions
+    positions = np.flatnonzero(pd.Series(gst_keys).isin(unchanged).to_numpy())
+    positions = positions[np.argsort(gst_keys[positions], kind='stable')]
+    if len(positions) != len(pairs):
+        return None
+    pairs = pairs.iloc[np.lexsort((pairs['GST_Row'].to_numpy(), pairs['Key_Hash'].to_numpy()))].copy()
+    pairs['GST_Row'] = positions
+
+    codes = pd.Index(apar_uniques)
+    found = (pairs['_merge'] == 'both').to_numpy()
+    pairs['APAR_Order'] = np.where(found, codes.get_indexer(pairs['Key_Hash']), np.nan)
+    missing = missing.assign(APAR_Order=codes.get_indexer(missing['Key_Hash']))
+
+    return {
+        'unchanged': unchanged,
+        'pairs': pairs,
+        'missing': missing,
+        'unparsed': {
+            side: previous[f'{side.upper()}_Unparsed'].reindex(unchanged).pipe(lambda counts: counts[counts > 0])
+            for side in ('gst', 'apar')
+        },
+    }
+
+
+def _key_states(
+    digests: Dict[str, pd.Series],
+    unparsed_counts: Dict[str, pd.Series],
+    categories: Dict[str, pd.DataFrame],
+) -> pd.DataFrame:
+    """One row per key with its row digests, unparseable dates and category, kept for the next incremental run"""
+    keys = digests['gst'].index.union(digests['apar'].index)
+    key_categories = _key_categories(categories).reindex(keys)
+    return pd.DataFrame({
+        'Key_Hash': keys.to_numpy(),
+        'GST_Digest': digests['gst'].reindex(keys, fill_value=0).to_numpy(),
+        'APAR_Digest': digests['apar'].reindex(keys, fill_value=0).to_numpy(),
+        'GST_Unparsed': unparsed_counts['gst'].groupby(level=0).sum().reindex(keys, fill_value=0).to_numpy(),
+        'APAR_Unparsed': unparsed_counts['apar'].groupby(level=0).sum().reindex(keys, fill_value=0).to_numpy(),
+        'Category': key_categories['Category'].to_numpy(),
+        'Invoice_No': key_categories['Invoice_No'].to_numpy(),
+        'GSTIN': key_categories['GSTIN'].to_numpy(),
+    })
+
+
+# Categories that place each key exactly once; a repeated GST key takes the category of its first row
+KEY_CATEGORY_SOURCES = [
+    ('matched', 'Key_Hash'),
+    ('partialMatch', 'Key_Hash'),
+    ('mismatched', 'Key_Hash'),
+    ('missingInAPAR', 'Key_Hash'),
+    ('missingInGST', 'Key_Hash'),
+    ('fuzzyKeyMatch', 'Key_Hash'),
+    ('fuzzyKeyMatch', 'APAR_Key_Hash'),
+    ('splitMatch', 'Key_Hash'),
+    ('splitMatch', 'APAR_Key_Hash'),
+]
+
+
+def _key_categories(categories: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    parts = []
+    for category, key_column in KEY_CATEGORY_SOURCES:
+        frame = categories[category]
+        invoice_column = 'APAR_Invoice_No' if key_column == 'APAR_Key_Hash' else 'Invoice_No'
+        parts.append(pd.DataFrame({
+            'Key_Hash': frame[key_column].to_numpy(dtype=np.uint64),
+            'Category': category,
+            'Invoice_No': frame[invoice_column].to_numpy(dtype=object),
+            'GSTIN': frame['GSTIN'].to_numpy(dtype=object),
+            'Row': frame['GST_Row'].to_numpy(dtype=float) if 'GST_Row' in frame.columns else np.nan,
+        }))
+    keys = pd.concat(parts, ignore_index=True).sort_values('Row', kind='stable')
+    return keys.drop_duplicates('Key_Hash').set_index('Key_Hash')
+
+
+def _key_changes(previous: pd.DataFrame, current: pd.DataFrame) -> pd.DataFrame:
+    """Keys added, removed, amended or moved to another category since the previous run"""
+    previous = previous.set_index('Key_Hash')
+    current = current.set_index('Key_Hash')
+    common = current.index.intersection(previous.index)
+    before = previous.loc[common]
+    after = current.loc[common]
+    amended = (
+        (before['GST_Digest'].to_numpy() != after['GST_Digest'].to_numpy())
+        | (before['APAR_Digest'].to_numpy() != after['APAR_Digest'].to_numpy())
+    )
+    reclassified = ~amended & (before['Category'].to_numpy() != after['Category'].to_numpy())
+
+    added = current.loc[current.index.difference(previous.index)]
+    removed = previous.loc[previous.index.difference(current.index)]
+    parts = [
+        (added, 'added', None, added['Category']),
+        (after[amended], 'amended', before['Category'][amended], after['Category'][amended]),
+        (after[reclassified], 'reclassified', before['Category'][reclassified], after['Category'][reclassified]),
+        (removed, 'removed', removed['Category'], None),
+    ]
+    return pd.concat([
+        pd.DataFrame({
+            'Invoice_No': frame['Invoice_No'].to_numpy(dtype=object),
+            'GSTIN': frame['GSTIN'].to_numpy(dtype=object),
+            'Change': change,
+            'Previous_Category': None if previous_category is None else previous_category.to_numpy(dtype=object),
+            'Current_Category': None if current_category is None else current_category.to_numpy(dtype=object),
+        }).sort_values(['Invoice_No', 'GSTIN'], kind='stable')
+        for frame, change, previous_category, current_category in parts
+    ], ignore_index=True)
+
+
+def _fuzzy_key_matches(missing_in_apar: pd.DataFrame, missing_in_gst: pd.DataFrame, fuzzy_pairs: pd.DataFrame) -> pd.DataFrame:
+    """Join the fuzzy pairs back into one row per GST invoice with its AP/AR counterpart"""
+    gst_side = missing_in_apar.iloc[fuzzy_pairs['gst_position']]
+    apar_side = missing_in_gst.iloc[fuzzy_pairs['apar_position']]
+    return pd.DataFrame({
+        'Invoice_No': gst_side['Invoice_No'].to_numpy(),
+        'APAR_Invoice_No': apar_side['Invoice_No'].to_numpy(),
+        'GSTIN': gst_side['GSTIN'].to_numpy(),
+        'GST_Amount': gst_side['GST_Amount'].to_numpy(),
+        'APAR_Amount': apar_side['APAR_Amount'].to_numpy(),
+        'GST_Date': gst_side['GST_Date'].to_numpy(),
+        'APAR_Date': apar_side['APAR_Date'].to_numpy(),
+        'GST_Row': gst_side['GST_Row'].to_numpy(),
+        'APAR_Order': apar_side['APAR_Order'].to_numpy(),
+        'Difference': np.abs(_amount_difference(gst_side['GST_Amount'].to_numpy(), apar_side['APAR_Amount'].to_numpy())),
+        'Fuzzy_Score': fuzzy_pairs['score'].to_numpy(),
+        'Key_Hash': gst_side['Key_Hash'].to_numpy(),
+        'APAR_Key_Hash': apar_side['Key_Hash'].to_numpy(),
+        **_paired_tax_checks(gst_side, apar_side),
+    })
+
+def _split_matches(missing_in_apar: pd.DataFrame, missing_in_gst: pd.DataFrame, split_pairs: pd.DataFrame) -> pd.DataFrame:
+    """Join the split matches back into one row per AP/AR part, next to the GST invoice the parts add up to"""
+    gst_side = missing_in_apar.iloc[split_pairs['gst_position']]
+    apar_side = missing_in_gst.iloc[split_pairs['apar_position']]
+    gst_amount = gst_side['GST_Amount'].to_numpy()
+    apar_amount = apar_side['APAR_Amount'].to_numpy()
+    # Totals are summed in whole paise, like differences, so parts that add up differ by exactly 0
+    totals = pd.Series(np.round(apar_amount * 100)).groupby(split_pairs['gst_position'].to_numpy()).transform('sum').to_numpy() / 100
+    return pd.DataFrame({
+        'Invoice_No': gst_side['Invoice_No'].to_numpy(),
+        'APAR_Invoice_No': apar_side['Invoice_No'].to_numpy(),
+        'GSTIN': gst_side['GSTIN'].to_numpy(),
+        'GST_Amount': gst_amount,
+        'APAR_Amount': apar_amount,
+        'Split_Total': totals,
+        'Split_Parts': split_pairs['parts'].to_numpy(),
+        'GST_Date': gst_side['GST_Date'].to_numpy(),
+        'APAR_Date': apar_side['APAR_Date'].to_numpy(),
+        'GST_Row': gst_side['GST_Row'].to_numpy(),
+        'APAR_Order': apar_side['APAR_Order'].to_numpy(),
+        'Difference': np.abs(_amount_difference(gst_amount, totals)),
+        'Key_Hash': gst_side['Key_Hash'].to_numpy(),
+        'APAR_Key_Hash': apar_side['Key_Hash'].to_numpy(),
+        **_paired_tax_checks(gst_side, apar_side),
+    })
+
+
+def _paired_tax_checks(gst_side: pd.DataFrame, apar_side: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Tax_Checks of leftovers paired by a later pass: each side's own checks, as the components are gone by then"""
+    if TAX_CHECK_COLUMN not in gst_side.columns:
+        return {}
+    return {TAX_CHECK_COLUMN: gst_side[TAX_CHECK_COLUMN].to_numpy() | apar_side[TAX_CHECK_COLUMN].to_numpy()}
+
+
+def _record_columns(frame: pd.DataFrame, fields: List[str], **values) -> Dict[str, Any]:
+    """Record fields of a category as columns: ``fields`` of the frame, then ``values`` in order.
+
+    Each of ``values`` is an array or list with a value per row, or one value shared by every row.
+    """
+    columns = {field: frame[field].to_numpy() for field in fields}
+    columns.update(values)
+    return columns
+
+
+def _matched_columns(frame: pd.DataFrame) -> Dict[str, Any]:
+    return _record_columns(
+        frame, ['Invoice_No', 'GSTIN', 'GST_Amount', 'APAR_Amount', 'GST_Date', 'APAR_Date'],
+        Difference=_matched_differences(frame['Difference'].to_numpy()),
+        Match_Type='Exact Match',
+        Confidence=1.0,
+    )
+
+
+def _partial_columns(frame: pd.DataFrame) -> Dict[str, Any]:
+    percentage = frame['Difference_Percentage'].tolist()
+    return _record_columns(
+        frame, ['Invoice_No', 'GSTIN', 'GST_Amount', 'APAR_Amount', 'GST_Date', 'APAR_Date', 'Difference'],
+        Difference_Percentage=_round2(percentage),
+        Match_Type='Partial Match',
+        Confidence=_round2(1 - (value / 100) for value in percentage),
+        Reason=frame['Reason'].to_numpy(),
+    )
+
+
+def _matched_differences(differences: np.ndarray) -> Any:
+    """Differences of exact matches, written as 0 where the amounts agree as they always were before tolerances"""
+    if not differences.any():
+        return 0
+    values = differences.astype(object)
+    values[differences == 0] = 0
+    return values
+
+
+def _mismatched_columns(frame: pd.DataFrame) -> Dict[str, Any]:
+    percentage = frame['Difference_Percentage'].tolist()
+    return _record_columns(
+        frame, ['Invoice_No', 'GSTIN', 'GST_Amount', 'APAR_Amount', 'GST_Date', 'APAR_Date', 'Difference'],
+        Difference_Percentage=_round2(percentage),
+        Match_Type='Mismatched',
+        Confidence=0.0,
+        Reason=_mismatch_reasons(frame, percentage),
+    )
+
+
+def _mismatch_reasons(frame: pd.DataFrame, percentage: List[float]) -> List[str]:
+    """Why each pair is mismatched: the percentage it differs by, or which side's amount could not be read"""
+    gst_missing = frame['GST_Amount'].isna().to_numpy()
+    apar_missing = frame['APAR_Amount'].isna().to_numpy()
+    return [
+        'GST and AP/AR amounts missing or not numeric' if gst and apar
+        else 'GST amount missing or not numeric' if gst
+        else 'AP/AR amount missing or not numeric' if apar
+        else f'Amount differs by {value:.2f}%'
+        for gst, apar, value in zip(gst_missing, apar_missing, percentage)
+    ]
+
+
+def _missing_in_apar_columns(frame: pd.DataFrame) -> Dict[str, Any]:
+    return _record_columns(
+        frame, ['Invoice_No', 'GSTIN', 'GST_Amount', 'GST_Date'],
+        Match_Type='Missing in AP/AR',
+        Confidence=0.0,
+        Reason='Invoice exists in GST but not in AP/AR ledger',
+    )
+
+
+def _missing_in_gst_columns(frame: pd.DataFrame) -> Dict[str, Any]:
+    return _record_columns(
+        frame, ['Invoice_No', 'GSTIN', 'APAR_Amount', 'APAR_Date'],
+        Match_Type='Missing in GST',
+        Confidence=0.0,
+        Reason='Invoice exists in AP/AR but not filed in GST',
+    )
+
+
+def _fuzzy_key_columns(frame: pd.DataFrame) -> Dict[str, Any]:
+    return _record_columns(
+        frame, ['Invoice_No', 'APAR_Invoice_No', 'GSTIN', 'GST_Amount', 'APAR_Amount', 'GST_Date', 'APAR_Date', 'Difference'],
+        Match_Type='Fuzzy Key Match',
+        Confidence=(frame['Fuzzy_Score'] / 100).round(2).to_numpy(),
+        Reason=[
+            f"Invoice number '{gst_invoice}' matched to '{apar_invoice}' ({score:.0f}% similar)"
+            for gst_invoice, apar_invoice, score in zip(frame['Invoice_No'], frame['APAR_Invoice_No'], frame['Fuzzy_Score'])
+        ],
+    )
+
+
+def _split_columns(frame: pd.DataFrame) -> Dict[str, Any]:
+    return _record_columns(
+        frame, ['Invoice_No', 'APAR_Invoice_No', 'GSTIN', 'GST_Amount', 'APAR_Amount', 'Split_Total', 'Split_Parts', 'GST_Date', 'APAR_Date', 'Difference'],
+        Match_Type='Split Match',
+        Confidence=(1 - frame['Difference'] / frame['GST_Amount'].abs()).round(2).to_numpy(),
+        Reason=[
+            f'One of {parts} AP/AR entries adding up to {total:.2f}'
+            for parts, total in zip(frame['Split_Parts'], frame['Split_Total'])
+        ],
+    )
+
+
+def _date_discrepancy_columns(frame: pd.DataFrame) -> Dict[str, Any]:
+    return _record_columns(
+        frame, ['Invoice_No', 'GSTIN', 'GST_Date', 'APAR_Date'],
+        Difference_Days=frame['Date_Difference_Days'].astype(int).to_numpy(),
+    )
+
+
+# Record fields of each result category as columns, in the order the details payload lists the categories
+RECORD_COLUMNS = {
+    'matched': _matched_columns,
+    'partialMatch': _partial_columns,
+    'mismatched': _mismatched_columns,
+    'missingInGST': _missing_in_gst_columns,
+    'missingInAPAR': _missing_in_apar_columns,
+    'dateDiscrepancies': _date_discrepancy_columns,
+    'fuzzyKeyMatch': _fuzzy_key_columns,
+    'splitMatch': _split_columns,
+}
+
+# Categories whose records also carry the date mismatch fields when their dates disagree
+DATE_FLAG_CATEGORIES = ['matched', 'partialMatch', 'mismatched']
+
+# Categories whose records carry the Tax_Checks bitmask of runs that checked tax components
+TAX_CHECK_CATEGORIES = ['matched', 'partialMatch', 'mismatched', 'missingInGST', 'missingInAPAR', 'fuzzyKeyMatch', 'splitMatch']
+
+
+def record_columns(category: str, frame: pd.DataFrame) -> Dict[str, Any]:
+    """Record fields of a category as columns, ending with Tax_Checks when the run checked tax components"""
+    columns = RECORD_COLUMNS[category](frame)
+    if category in TAX_CHECK_CATEGORIES and TAX_CHECK_COLUMN in frame.columns:
+        columns[TAX_CHECK_COLUMN] = frame[TAX_CHECK_COLUMN].to_numpy(dtype=np.int64)
+    return columns
+
+
+def category_records(category: str, frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """The category's records for ``frame`` as dicts"""
+    columns = record_columns(category, frame)
+    records = pd.DataFrame(columns, index=range(len(frame))).to_dict('records')
+    # Missing and unreadable amounts are NaN, which JSON cannot hold; they are null, as category_json writes them
+    for field, values in columns.items():
+        values = np.asarray(values)
+        if values.ndim == 0 or values.dtype.kind not in 'fO':
+            continue
+        missing = ~np.isfinite(values) if values.dtype.kind == 'f' else pd.isna(values)
+        for position in np.flatnonzero(missing):
+            records[position][field] = None
+    if category in DATE_FLAG_CATEGORIES:
+        flags = frame['Date_Mismatch'].to_numpy()
+        days = frame['Date_Difference_Days'].to_numpy()
+        for position in np.flatnonzero(flags):
+            records[position]['Date_Mismatch'] = True
+            records[position]['Date_Difference_Days'] = int(days[position])
+    return records
+
+
+def category_json(category: str, frame: pd.DataFrame, layout: str = 'records') -> str:
+    """The category's records for ``frame`` as JSON text, written column-wise.
+
+    The ``records`` layout is the same text as the dicts of category_records; the ``columns`` layout is one
+    array per field, with Date_Mismatch on every row and Date_Difference_Days null where the dates agree.
+    """
+    columns = record_columns(category, frame)
+    flags = frame['Date_Mismatch'].to_numpy(dtype=bool) if category in DATE_FLAG_CATEGORIES else None
+    if layout == 'columns':
+        if flags is not None:
+            days = np.full(len(frame), None, dtype=object)
+            days[flags] = frame['Date_Difference_Days'].to_numpy()[flags].astype(int)
+            columns.update(Date_Mismatch=flags, Date_Difference_Days=days)
+        return columns_json(columns, len(frame))
+    suffixes = None
+    if flags is not None:
+        suffixes = [''] * len(frame)
+        days = frame['Date_Difference_Days'].to_numpy()
+        for position in np.flatnonzero(flags):
+            suffixes[position] = f',"Date_Mismatch":true,"Date_Difference_Days":{int(days[position])}'
+    return records_json(columns, len(frame), suffixes)
+
+
+# Fields of each category's records, in export column order; the date flags only
+# appear on records whose dates disagree
+DATE_FLAG_FIELDS = ['Date_Mismatch', 'Date_Difference_Days']
+EXPORT_COLUMNS = {
+    'matched': ['Invoice_No', 'GSTIN', 'GST_Amount', 'APAR_Amount', 'GST_Date', 'APAR_Date', 'Difference', 'Match_Type', 'Confidence'] + DATE_FLAG_FIELDS,
+    'partialMatch': ['Invoice_No', 'GSTIN', 'GST_Amount', 'APAR_Amount', 'GST_Date', 'APAR_Date', 'Difference', 'Difference_Percentage', 'Match_Type', 'Confidence', 'Reason'] + DATE_FLAG_FIELDS,
+    'mismatched': ['Invoice_No', 'GSTIN', 'GST_Amount', 'APAR_Amount', 'GST_Date', 'APAR_Date', 'Difference', 'Difference_Percentage', 'Match_Type', 'Confidence', 'Reason'] + DATE_FLAG_FIELDS,
+    'missingInGST': ['Invoice_No', 'GSTIN', 'APAR_Amount', 'APAR_Date', 'Match_Type', 'Confidence', 'Reason'],
+    'missingInAPAR': ['Invoice_No', 'GSTIN', 'GST_Amount', 'GST_Date', 'Match_Type', 'Confidence', 'Reason'],
+    'dateDiscrepancies': ['Invoice_No', 'GSTIN', 'GST_Date', 'APAR_Date', 'Difference_Days'],
+    'fuzzyKeyMatch': ['Invoice_No', 'APAR_Invoice_No', 'GSTIN', 'GST_Amount', 'APAR_Amount', 'GST_Date', 'APAR_Date', 'Difference', 'Match_Type', 'Confidence', 'Reason'],
+    'splitMatch': ['Invoice_No', 'APAR_Invoice_No', 'GSTIN', 'GST_Amount', 'APAR_Amount', 'Split_Total', 'Split_Parts', 'GST_Date', 'APAR_Date', 'Difference', 'Match_Type', 'Confidence', 'Reason'],
+}
+
+
+def export_columns(category: str, frame: Optional[pd.DataFrame]) -> List[str]:
+    """Export columns of a category, with Tax_Checks when ``frame``, None for out-of-core results, has them"""
+    columns = list(EXPORT_COLUMNS[category])
+    if frame is not None and category in TAX_CHECK_CATEGORIES and TAX_CHECK_COLUMN in frame.columns:
+        # Before the date flags, as in the records
+        position = columns.index('Date_Mismatch') if 'Date_Mismatch' in columns else len(columns)
+        columns.insert(position, TAX_CHECK_COLUMN)
+    return columns
+
+
+# Working columns that are not needed once rows are classified
+SCRATCH_COLUMNS = ['GST_Date_Parsed', 'APAR_Date_Parsed', '_merge', 'Key_Hash', 'APAR_Key_Hash'] + RULE_COLUMNS
+
+# Kinds under which a session's baseline state is kept in the dataset store
+BASELINE_KINDS = {'keys': 'baseline_keys', 'pairs': 'baseline_pairs', 'missing': 'baseline_missing'}
+
+# Change kinds reported against the baseline, in the order they are listed
+CHANGE_KINDS = ['added', 'amended', 'reclassified', 'removed']
+
+
+def classify_reconciliation(
+    gst_df: pd.DataFrame,
+    apar_df: pd.DataFrame,
+    fuzzy_matching: bool = True,
+    baseline: Optional[Dict[str, pd.DataFrame]] = None,
+    tolerances: Optional[ToleranceRules] = None,
+    split_matching: bool = False,
+    tax_checks: bool = False,
+    progress: Callable = _ignore_progress,
+    partitions: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Classified category frames and input counts, compact enough to send back from a worker process.
+
+    Also returns the state to keep as the next run's ``baseline`` and, when given one, the changed keys.
+    With more than one partition (by default from partition_count) both sides are split by GSTIN and
+    reconciled in a process pool; the result is the same as from a single process.
+    """
+    partitions = partitions or partition_count(len(gst_df) + len(apar_df))
+    if partitions > 1:
+        classified = _classify_partitioned(
+            gst_df, apar_df, fuzzy_matching, baseline, tolerances, split_matching, tax_checks, progress, partitions
+        )
+    else:
+        matched = match_invoices(
+            gst_df, apar_df, progress, fuzzy_matching, baseline, tolerances=tolerances, split_matching=split_matching,
+            tax_checks=tax_checks,
+        )
+        classified = _classified(matched, len(gst_df), len(apar_df))
+    # The insights only name the fixed partial-match threshold when no rule moved it
+    classified['default_tolerances'] = tolerances is None or tolerances.is_default
+    return classified
+
+
+def _classified(matched: Dict[str, Any], gst_count: int, apar_count: int) -> Dict[str, Any]:
+    state = matched['state']
+    return {
+        'categories': {
+            name: frame.drop(columns=[column for column in SCRATCH_COLUMNS if column in frame.columns])
+            for name, frame in matched['categories'].items()
+        },
+        'gst_count': gst_count,
+        'apar_count': apar_count,
+        'unparsed_dates': matched['unparsed_dates'],
+        'changes': matched['changes'],
+        'baseline': {
+            'keys': state['keys'],
+            'pairs': state['pairs'].drop(columns=['GST_Date_Parsed', 'APAR_Date_Parsed']),
+            'missing': state['missing'].drop(columns=['GST_Date_Parsed', 'APAR_Date_Parsed']),
+        },
+    }
+
+
+# Column each merged frame is put back into input order by; keys are ordered by hash like a single run's
+PARTITION_ORDER_COLUMNS = {'missingInGST': 'APAR_Order', 'missing': 'APAR_Order', 'keys': 'Key_Hash'}
+
+
+def _classify_partitioned(
+    gst_df: pd.DataFrame,
+    apar_df: pd.DataFrame,
+    fuzzy_matching: bool,
+    baseline: Optional[Dict[str, pd.DataFrame]],
+    tolerances: Optional[ToleranceRules],
+    split_matching: bool,
+    tax_checks: bool,
+    progress: Callable,
+    partitions: int,
+) -> Dict[str, Any]:
+    """Reconcile GSTIN hash partitions of both sides in the partition pool and merge them back in input order.
+
+    Every key and every fuzzy candidate block belongs to one GSTIN, so partitions are independent. What a
+    partition cannot see, the date formats and whether the fuzzy pass scores names, is decided here from
+    the whole input. Partitions travel to the workers as Arrow streams in shared memory, and the workers
+    send their frames back as Arrow streams too.
+    """
+    rows_total = len(gst_df) + len(apar_df)
+    progress('partitioning', 0, rows_total)
+    gst = _partition_side(gst_df, 'Trade_Name', tax_checks=tax_checks)
+    gst['Row_Position'] = np.arange(len(gst))
+    apar = _partition_side(
+        apar_df, 'Vendor_Customer_Name', tolerances.apar_fields if tolerances is not None else [], tax_checks
+    )
+    apar['Key_Order'] = pd.factorize(apar[KEY_HASH_COLUMN].to_numpy())[0]
+
+    settings = {
+        'fuzzy_matching': fuzzy_matching,
+        'date_formats': input_date_formats(gst_df, apar_df),
+        'fuzzy_use_names': fuzzy_matching and _fuzzy_use_names(gst_df, apar_df),
+        'baseline_date_formats': baseline['keys'].attrs.get('date_formats') if baseline is not None else None,
+        'tolerances': tolerances,
+        'split_matching': split_matching,
+        'tax_checks': tax_checks,
+    }
+    sides = {'gst': gst, 'apar': apar}
+    if baseline is not None:
+        sides.update({BASELINE_KINDS[kind]: frame for kind, frame in baseline.items()})
+
+    pool = partition_pool()
+    with ExitStack() as stack:
+        shared = {
+            name: stack.enter_context(SharedPartitions(frame, partition_ids(frame['GSTIN'], partitions), partitions))
+            for name, frame in sides.items()
+        }
+        futures = []
+        try:
+            futures = [
+                pool.submit(_reconcile_partition, {name: part.handle(partition) for name, part in shared.items()}, settings)
+                for partition in range(partitions)
+            ]
+            for done, _ in enumerate(as_completed(futures), start=1):
+                progress('reconciling partitions', rows_total * done // partitions, rows_total)
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            # A worker died and took the pool with it; the next run starts a new one
+            discard_partition_pool(pool)
+            raise
+        finally:
+            # Other runs share the pool, so a failed or cancelled run only withdraws its own partitions
+            for future in futures:
+                future.cancel()
+
+    progress('merging partitions', rows_total, rows_total)
+    keys = _merge_partition_frames([result['baseline']['keys'] for result in results], 'keys')
+    keys.attrs['date_formats'] = settings['date_formats']
+    return {
+        'categories': {
+            name: _merge_partition_frames([result['categories'][name] for result in results], name)
+            for name in RECORD_COLUMNS
+        },
+        'gst_count': len(gst_df),
+        'apar_count': len(apar_df),
+        'unparsed_dates': {
+            side: sum(result['unparsed_dates'][side] for result in results) for side in ('gst', 'apar')
+        },
+        'changes': _merge_partition_changes([result['changes'] for result in results]) if baseline is not None else None,
+        'baseline': {
+            'keys': keys,
+            'pairs': _merge_partition_frames([result['baseline']['pairs'] for result in results], 'pairs'),
+            'missing': _merge_partition_frames([result['baseline']['missing'] for result in results], 'missing'),
+        },
+    }
+
+
+def _partition_side(
+    df: pd.DataFrame, name_column: str, rule_fields: List[str] = (), tax_checks: bool = False
+) -> pd.DataFrame:
+    """The columns match_invoices reads from one side, with cached hashes and Arrow-friendly types.
+
+    Keys and amounts keep their normalized upload form, which Arrow carries as strings, dictionaries and
+    integers, so a partition prepares to the same values without stripping them again.
+    """
+    side = pd.DataFrame({
+        'Invoice_No': key_text(df, 'Invoice_No').array,
+        'GSTIN': key_text(df, 'GSTIN').array,
+        PAISE_COLUMN: invoice_paise(df).array,
+        'Invoice_Date': df['Invoice_Date'].to_numpy(),
+        KEY_HASH_COLUMN: cached_key_hashes(df),
+        ROW_HASH_COLUMN: cached_row_hashes(df),
+    })
+    if name_column in df.columns:
+        side[name_column] = _party_names(df, name_column).to_numpy()
+    for field in rule_fields:
+        side[field] = _rule_values(df, field)
+    if tax_checks:
+        components = tax_components(df)
+        for position, component in enumerate(TAX_COMPONENTS):
+            if component in df.columns:
+                side[component] = components[:, position]
+        if PLACE_OF_SUPPLY_FIELD in df.columns:
+            side[PLACE_OF_SUPPLY_FIELD] = _party_names(df, PLACE_OF_SUPPLY_FIELD).to_numpy()
+    return side
+
+
+def _fuzzy_use_names(gst_df: pd.DataFrame, apar_df: pd.DataFrame) -> bool:
+    """Whether the fuzzy pass over the whole input would score party names, as partitions cannot tell"""
+    gst_named = (_party_names(gst_df, 'Trade_Name') != '').to_numpy()
+    apar_named = (_party_names(apar_df, 'Vendor_Customer_Name') != '').to_numpy()
+    if not (gst_named.any() and apar_named.any()):
+        return False
+    if gst_named.all() and apar_named.all():
+        return True
+
+    # Only the names of rows left over for the fuzzy pass count; a repeated AP/AR key leaves its last row
+    gst_keys = pd.Series(cached_key_hashes(gst_df))
+    apar_keys = pd.Series(cached_key_hashes(apar_df))
+    gst_left = ~gst_keys.isin(apar_keys).to_numpy()
+    apar_left = ~apar_keys.duplicated(keep='last').to_numpy() & ~apar_keys.isin(gst_keys).to_numpy()
+    return bool(gst_named[gst_left].any() and apar_named[apar_left].any())
+
+
+def _reconcile_partition(handles: Dict[str, Tuple[str, int, int]], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Reconcile one partition in a pool worker, returning its frames as Arrow streams in input positions"""
+    gst = read_shared_partition(handles['gst'])
+    apar = read_shared_partition(handles['apar'])
+    baseline = None
+    if BASELINE_KINDS['keys'] in handles:
+        baseline = {kind: read_shared_partition(handles[stored]) for kind, stored in BASELINE_KINDS.items()}
+        baseline['keys'].attrs['date_formats'] = settings['baseline_date_formats']
+
+    matched = match_invoices(
+        gst, apar,
+        fuzzy_matching=settings['fuzzy_matching'],
+        baseline=baseline,
+        date_formats=settings['date_formats'],
+        fuzzy_use_names=settings['fuzzy_use_names'],
+        tolerances=settings['tolerances'],
+        split_matching=settings['split_matching'],
+        tax_checks=settings['tax_checks'],
+    )
+    classified = _classified(matched, len(gst), len(apar))
+
+    # GST_Row and APAR_Order count within the partition; map them to the whole input's positions
+    gst_rows = gst['Row_Position'].to_numpy()
+    apar_codes = pd.factorize(apar[KEY_HASH_COLUMN].to_numpy())[0]
+    key_orders = np.zeros(apar_codes.max() + 1 if len(apar_codes) else 0, dtype=np.int64)
+    key_orders[apar_codes] = apar['Key_Order'].to_numpy()
+
+    def encode(frame: pd.DataFrame) -> bytes:
+        frame = frame.copy()
+        for column, positions in (('GST_Row', gst_rows), ('APAR_Order', key_orders)):
+            if column in frame.columns:
+                frame[column] = _input_positions(frame[column], positions)
+        return frame_to_arrow(frame)
+
+    return {
+        'categories': {name: encode(frame) for name, frame in classified['categories'].items()},
+        'unparsed_dates': classified['unparsed_dates'],
+        'changes': frame_to_arrow(classified['changes']) if classified['changes'] is not None else None,
+        'baseline': {kind: encode(frame) for kind, frame in classified['baseline'].items()},
+    }
+
+
+def _input_positions(local: pd.Series, positions: np.ndarray) -> np.ndarray:
+    """Look up partition-local positions in ``positions``, keeping missing ones missing"""
+    if local.dtype.kind in 'iu':
+        return positions[local.to_numpy()]
+    present = local.notna().to_numpy()
+    mapped = np.full(len(local), np.nan)
+    mapped[present] = positions[local.to_numpy()[present].astype(np.int64)]
+    return mapped
+
+
+def _merge_partition_frames(streams: List[bytes], name: str) -> pd.DataFrame:
+    frames = [frame_from_arrow(stream) for stream in streams]
+    # Empty partitions carry no dtypes worth keeping
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    merged = pd.concat(frames, ignore_index=True)
+    return merged.sort_values(PARTITION_ORDER_COLUMNS.get(name, 'GST_Row'), kind='stable').reset_index(drop=True)
+
+
+def _merge_partition_changes(streams: List[bytes]) -> pd.DataFrame:
+    frames = [frame_from_arrow(stream) for stream in streams]
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    changes = pd.concat(frames, ignore_index=True)
+    rank = changes['Change'].map({kind: position for position, kind in enumerate(CHANGE_KINDS)})
+    order = changes.assign(_rank=rank).sort_values(['_rank', 'Invoice_No', 'GSTIN'], kind='stable').index
+    return changes.loc[order].reset_index(drop=True)
+
+
+# Memory used while a partition is reconciled, per byte of its spilled Arrow data
+OUT_OF_CORE_MEMORY_FACTOR = 5
+
+# Spill partitions per budget-sized share of the input, so a skewed GSTIN rarely pushes one over budget
+OUT_OF_CORE_PARTITION_SLACK = 4
+
+# Rough memory per row of a chunk while it is read and partitioned
+OUT_OF_CORE_ROW_BYTES = 2048
+
+# Reconciliation of one GSTIN never splits, so at most this many spill files are written per side
+OUT_OF_CORE_MAX_PARTITIONS = 1024
+
+
+def out_of_core_budget() -> int:
+    """Memory budget of an out-of-core run from OUT_OF_CORE_MEMORY_BUDGET_MB"""
+    return int(float(os.environ.get('OUT_OF_CORE_MEMORY_BUDGET_MB', 512)) * 1024 * 1024)
+
+
+def reconcile_out_of_core(
+    gst_path: str,
+    apar_path: str,
+    output_dir: str,
+    fuzzy_matching: bool = True,
+    memory_budget_bytes: Optional[int] = None,
+    split_matching: bool = False,
+    progress: Callable = _ignore_progress,
+) -> Dict[str, Any]:
+    """Reconcile two upload files that need not fit in memory, writing every category to a CSV in ``output_dir``.
+
+    Both files are read in chunks and spilled to disk partitioned by GSTIN hash, as partitioned runs split
+    them. Groups of partitions whose spilled size fits ``memory_budget_bytes`` are then reconciled one at a
+    time and their rows appended to the category files, so memory stays near the budget whatever the input
+    size; only a single GSTIN too large for the budget can exceed it.
+
+    Summary and insights equal an in-memory run's. Rows in the category files are grouped by partition;
+    GST_Row and APAR_Order give their position in the input files.
+    """
+    budget = memory_budget_bytes or out_of_core_budget()
+    input_bytes = _input_bytes(gst_path) + _input_bytes(apar_path)
+    partitions = min(
+        OUT_OF_CORE_MAX_PARTITIONS,
+        max(1, -(-input_bytes * OUT_OF_CORE_MEMORY_FACTOR * OUT_OF_CORE_PARTITION_SLACK // budget)),
+    )
+    chunk_rows = max(1000, min(CSV_CHUNK_ROWS, budget // OUT_OF_CORE_ROW_BYTES))
+    os.makedirs(output_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix='spill-', dir=output_dir) as spill_dir:
+        progress('partitioning GST', 0, 0)
+        gst = _spill_upload(gst_path, 'Trade_Name', os.path.join(spill_dir, 'gst'), partitions, chunk_rows)
+        progress('partitioning AP/AR', gst['rows'], 0)
+        apar = _spill_upload(apar_path, 'Vendor_Customer_Name', os.path.join(spill_dir, 'apar'), partitions, chunk_rows)
+        rows_total = gst['rows'] + apar['rows']
+
+        date_formats = {'gst': detect_date_format(gst['date_sample']), 'apar': detect_date_format(apar['date_sample'])}
+        fuzzy_use_names = fuzzy_matching and _spilled_fuzzy_use_names(gst, apar)
+
+        output = CategoryFiles(output_dir)
+        totals = {'counts': dict.fromkeys(RECORD_COLUMNS, 0), 'unparsed_dates': {'gst': 0, 'apar': 0}}
+        mismatched_first = pd.DataFrame({'GST_Row': [], 'Invoice_No': []})
+        largest_date_gap = None
+        rows_done = 0
+
+        for group in _partition_groups(gst['spill'].sizes, apar['spill'].sizes, budget):
+            progress('reconciling partitions', rows_done, rows_total)
+            gst_rows = gst['spill'].read(group)
+            apar_rows = apar['spill'].read(group)
+            for rows in (gst_rows, apar_rows):
+                rows['GSTIN'] = rows['GSTIN'].astype('category')
+            rows_done += len(gst_rows) + len(apar_rows)
+
+            matched = match_invoices(
+                gst_rows, apar_rows,
+                fuzzy_matching=fuzzy_matching, date_formats=date_formats, fuzzy_use_names=fuzzy_use_names,
+                split_matching=split_matching,
+            )
+            categories = _classified(matched, len(gst_rows), len(apar_rows))['categories']
+            positions = {'GST_Row': gst_rows['Row_Position'].to_numpy(), 'APAR_Order': _first_row_positions(apar_rows)}
+            for name, frame in categories.items():
+                for column, column_positions in positions.items():
+                    if column in frame.columns:
+                        frame[column] = _input_positions(frame[column], column_positions)
+                output.append(name, frame)
+                totals['counts'][name] += len(frame)
+            for side in ('gst', 'apar'):
+                totals['unparsed_dates'][side] += matched['unparsed_dates'][side]
+
+            # The insights name the first mismatches and the largest date gap in GST order
+            mismatched_first = pd.concat([
+                mismatched_first, categories['mismatched'][['GST_Row', 'Invoice_No']].nsmallest(5, 'GST_Row'),
+            ]).nsmallest(5, 'GST_Row')
+            largest_date_gap = _largest_date_gap(categories['dateDiscrepancies'], largest_date_gap)
+
+    progress('building results', rows_total, rows_total)
+    overview = summarize_counts(
+        totals['counts'],
+        gst['rows'],
+        apar['rows'],
+        totals['unparsed_dates'],
+        mismatched_first['Invoice_No'].tolist(),
+        largest_date_gap[1:] if largest_date_gap is not None else None,
+    )
+    result = {
+        'summary': overview['summary'],
+        'insights': overview['insights'],
+        'counts': totals['counts'],
+        'files': output.paths,
+        'partitions': partitions,
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as summary_file:
+        json.dump(result, summary_file, ensure_ascii=False, indent=2)
+    return result
+
+
+def reconcile_saved_files(
+    run_dir: str,
+    gst_path: str,
+    apar_path: str,
+    fuzzy_matching: bool,
+    split_matching: bool = False,
+    progress: Callable = _ignore_progress,
+) -> Dict[str, Any]:
+    """Out-of-core run over the files saved by /jobs/reconcile-files, which are removed afterwards"""
+    try:
+        return reconcile_out_of_core(
+            gst_path, apar_path, os.path.join(run_dir, 'results'), fuzzy_matching, split_matching=split_matching, progress=progress
+        )
+    finally:
+        shutil.rmtree(os.path.join(run_dir, 'inputs'), ignore_errors=True)
+
+
+class CategoryFiles:
+    """Appends category frames to one CSV per category, writing the header with the first rows"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.paths: Dict[str, str] = {}
+        self._columns: Dict[str, List[str]] = {}
+
+    def append(self, category: str, frame: pd.DataFrame) -> None:
+        if category not in self.paths:
+            self.paths[category] = os.path.join(self.directory, f'{category}.csv')
+            self._columns[category] = list(frame.columns)
+            frame.to_csv(self.paths[category], index=False)
+        elif len(frame):
+            frame.reindex(columns=self._columns[category]).to_csv(self.paths[category], mode='a', header=False, index=False)
+
+
+def iter_upload_chunks(path: str, chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Read the required and party-name columns of an upload file from disk in chunks, normalized like the upload loaders"""
+    for chunk in _read_upload_chunks(path, chunk_rows):
+        normalize_upload(chunk)
+        yield chunk
+
+
+def _read_upload_chunks(path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    file_format = upload_format(path)
+    if file_format == 'csv':
+        header = pd.read_csv(path, nrows=0, encoding='utf-8').columns
+        _check_required_fields(header)
+        yield from pd.read_csv(
+            path, chunksize=chunk_rows, dtype=REQUIRED_FIELD_DTYPES, encoding='utf-8',
+            usecols=_selected_columns(header, None),
+        )
+        return
+
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    if file_format == 'parquet':
+        reader = pyarrow.parquet.ParquetFile(path)
+        _check_required_fields(reader.schema_arrow.names)
+        batches = reader.iter_batches(batch_size=chunk_rows, columns=_selected_columns(reader.schema_arrow.names, None))
+    else:
+        reader = pyarrow.ipc.open_file(pa.memory_map(path))
+        _check_required_fields(reader.schema.names)
+        selected = _selected_columns(reader.schema.names, None)
+        batches = (
+            batch.select(selected).slice(start, chunk_rows)
+            for batch in (reader.get_batch(index) for index in range(reader.num_record_batches))
+            for start in range(0, batch.num_rows, chunk_rows)
+        )
+    for batch in batches:
+        yield _columnar_frame(pa.Table.from_batches([batch]), pa)
+
+
+def _check_required_fields(columns) -> None:
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in columns]
+    if missing_fields:
+        raise HTTPException(status_code=400, detail=f"Missing required fields: {', '.join(missing_fields)}")
+
+
+def _input_bytes(path: str) -> int:
+    """Size of an input file's data, uncompressed for Parquet"""
+    if upload_format(path) == 'parquet':
+        import pyarrow.parquet
+        metadata = pyarrow.parquet.ParquetFile(path).metadata
+        return sum(metadata.row_group(index).total_byte_size for index in range(metadata.num_row_groups))
+    return os.path.getsize(path)
+
+
+def _spill_upload(path: str, name_column: str, directory: str, partitions: int, chunk_rows: int) -> Dict[str, Any]:
+    """Partition one input file onto disk, noting what the whole-input decisions need on the way.
+
+    That is a sample of distinct dates like column_date_format takes and whether party names are present.
+    """
+    import pyarrow as pa
+
+    spill = None
+    rows = 0
+    date_sample: Dict[Any, None] = {}
+    sample_size = 0
+    named = {'any': False, 'all': True}
+    for chunk in iter_upload_chunks(path, chunk_rows):
+        side = _partition_side(chunk, name_column)
+        side['Row_Position'] = np.arange(rows, rows + len(side))
+        if spill is None:
+            spill = PartitionSpill(directory, partitions, _spill_schema(side, pa))
+        spill.write(side.reindex(columns=spill.schema.names), partition_ids(side['GSTIN'], partitions))
+        rows += len(side)
+
+        if sample_size < DATE_SAMPLE_SIZE:
+            for value in pd.unique(chunk['Invoice_Date'].dropna()):
+                if value not in date_sample and str(value).strip() != '':
+                    date_sample[value] = None
+                    sample_size += 1
+                    if sample_size == DATE_SAMPLE_SIZE:
+                        break
+        names = side[name_column] != '' if name_column in side.columns else np.zeros(len(side), dtype=bool)
+        named['any'] |= bool(names.any())
+        named['all'] &= bool(names.all())
+
+    if spill is None:
+        raise HTTPException(status_code=400, detail=f"{os.path.basename(path)} has no rows")
+    spill.close()
+    return {
+        'spill': spill,
+        'rows': rows,
+        'date_sample': pd.Series(list(date_sample), dtype=object).astype(str).str.strip(),
+        'named': named,
+    }
+
+
+def _spill_schema(side: pd.DataFrame, pa):
+    """Fixed Arrow types for a spilled side, so chunks with an all-missing column still line up"""
+    types = {
+        KEY_HASH_COLUMN: pa.uint64(),
+        ROW_HASH_COLUMN: pa.uint64(),
+        'Row_Position': pa.int64(),
+        PAISE_COLUMN: pa.int64(),
+    }
+    # The pandas metadata brings Invoice_No back as Arrow-backed strings. GSTIN is spilled as plain text,
+    # since a dictionary column would repeat each chunk's whole dictionary in every partition.
+    schema = pa.Schema.from_pandas(side, preserve_index=False)
+    for index, column in enumerate(side.columns):
+        schema = schema.set(index, pa.field(column, types.get(column, pa.string())))
+    return schema
+
+
+def _spilled_fuzzy_use_names(gst: Dict[str, Any], apar: Dict[str, Any]) -> bool:
+    """_fuzzy_use_names for spilled inputs, reading the partitions again only when names are partly blank"""
+    if not (gst['named']['any'] and apar['named']['any']):
+        return False
+    if gst['named']['all'] and apar['named']['all']:
+        return True
+
+    found = {'gst': False, 'apar': False}
+    for partition in range(len(gst['spill'].paths)):
+        partition_found = _leftover_party_names(gst['spill'].read([partition]), apar['spill'].read([partition]))
+        for side in found:
+            found[side] |= partition_found[side]
+        if all(found.values()):
+            return True
+    return False
+
+
+def _leftover_party_names(gst: pd.DataFrame, apar: pd.DataFrame) -> Dict[str, bool]:
+    """Whether the rows of each side left for the fuzzy pass have any party name"""
+    gst_keys = pd.Series(gst[KEY_HASH_COLUMN].to_numpy())
+    apar_keys = pd.Series(apar[KEY_HASH_COLUMN].to_numpy())
+    gst_left = ~gst_keys.isin(apar_keys).to_numpy()
+    apar_left = ~apar_keys.duplicated(keep='last').to_numpy() & ~apar_keys.isin(gst_keys).to_numpy()
+    return {
+        'gst': bool((_party_names(gst, 'Trade_Name') != '').to_numpy()[gst_left].any()),
+        'apar': bool((_party_names(apar, 'Vendor_Customer_Name') != '').to_numpy()[apar_left].any()),
+    }
+
+
+def _partition_groups(gst_sizes: List[int], apar_sizes: List[int], budget: int) -> Iterator[List[int]]:
+    """Consecutive partitions whose combined spilled size fits the budget, one group at a time"""
+    group, group_bytes = [], 0
+    for partition, size in enumerate(np.add(gst_sizes, apar_sizes)):
+        if group and (group_bytes + size) * OUT_OF_CORE_MEMORY_FACTOR > budget:
+            yield group
+            group, group_bytes = [], 0
+        group.append(partition)
+        group_bytes += size
+    if group:
+        yield group
+
+
+def _first_row_positions(apar: pd.DataFrame) -> np.ndarray:
+    """Input position of the first row of each AP/AR key, in the order match_invoices numbers the keys"""
+    codes = pd.factorize(apar[KEY_HASH_COLUMN].to_numpy())[0]
+    return apar['Row_Position'].to_numpy()[~pd.Series(codes).duplicated().to_numpy()]
+
+
+def _largest_date_gap(date_discrepancies: pd.DataFrame, largest: Optional[Tuple[int, str, int]]) -> Optional[Tuple[int, str, int]]:
+    """Keep (GST_Row, Invoice_No, days) of the largest critical gap, the earliest row winning ties as np.argmax would"""
+    date_discrepancies = date_discrepancies[date_discrepancies['Date_Critical'].to_numpy(dtype=bool)]
+    if len(date_discrepancies) == 0:
+        return largest
+    days = date_discrepancies['Date_Difference_Days'].to_numpy()
+    rows = date_discrepancies['GST_Row'].to_numpy()
+    candidates = np.flatnonzero(days == days.max())
+    position = candidates[np.argmin(rows[candidates])]
+    candidate = (int(rows[position]), date_discrepancies['Invoice_No'].iloc[position], int(days[position]))
+    if largest is None or (days[position], -candidate[0]) > (largest[2], -largest[0]):
+        return candidate
+    return largest
+
+
+def perform_reconciliation(
+    gst_df: pd.DataFrame,
+    apar_df: pd.DataFrame,
+    fuzzy_matching: bool = True,
+    progress: Callable = _ignore_progress,
+    partitions: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Core reconciliation logic with AI fuzzy matching and date discrepancy detection"""
+    classified = classify_reconciliation(gst_df, apar_df, fuzzy_matching, progress=progress, partitions=partitions)
+    classified.pop('baseline')
+    rows_total = len(gst_df) + len(apar_df)
+    progress('building results', rows_total, rows_total)
+    return build_reconciliation_result(**classified)
+
+
+def summarize_reconciliation(
+    categories: Dict[str, pd.DataFrame],
+    gst_count: int,
+    apar_count: int,
+    unparsed_dates: Optional[Dict[str, int]] = None,
+    history: Optional[pd.DataFrame] = None,
+    default_tolerances: bool = True,
+) -> Dict[str, Any]:
+    """Summary counts and AI insights for the classified frames and the invoice ``history`` of a run that has one"""
+    date_discrepancies = categories['dateDiscrepancies']
+    critical = date_discrepancies[date_discrepancies['Date_Critical'].to_numpy(dtype=bool)]
+    largest_date_gap = None
+    if len(critical) > 0:
+        largest = int(np.argmax(critical['Date_Difference_Days'].to_numpy()))
+        largest_date_gap = (
+            critical['Invoice_No'].iloc[largest],
+            int(critical['Date_Difference_Days'].iloc[largest]),
+        )
+    
+    tax_masks = [
+        frame[TAX_CHECK_COLUMN].to_numpy(dtype=np.uint16)
+        for name, frame in categories.items() if name in TAX_CHECK_CATEGORIES and TAX_CHECK_COLUMN in frame.columns
+    ]
+    
+    return summarize_counts(
+        {name: len(frame) for name, frame in categories.items()},
+        gst_count,
+        apar_count,
+        unparsed_dates,
+        categories['mismatched']['Invoice_No'].head(5).tolist(),
+        largest_date_gap,
+        check_counts(np.concatenate(tax_masks)) if tax_masks else None,
+        count_history(history) if history is not None else None,
+        default_tolerances,
+    )
+
+
+def summarize_counts(
+    counts: Dict[str, int],
+    gst_count: int,
+    apar_count: int,
+    unparsed_dates: Optional[Dict[str, int]],
+    mismatch_invoices: List[str],
+    largest_date_gap: Optional[Tuple[str, int]],
+    tax_checks: Optional[Dict[str, Any]] = None,
+    history: Optional[Dict[str, int]] = None,
+    default_tolerances: bool = True,
+) -> Dict[str, Any]:
+    """Summary and insights from category sizes, the first mismatched invoices and the largest critical date gap.
+
+    ``tax_checks`` are the check_counts of a run that checked tax components, ``history`` the count_history
+    of a run looked up in the invoice index. Without ``default_tolerances`` the partial matches were judged by
+    tolerance rules, so their insight names no threshold.
+    """
+    unparsed_dates = unparsed_dates or {'gst': 0, 'apar': 0}
+    unparsed_date_count = unparsed_dates['gst'] + unparsed_dates['apar']
+    insights = []
+
+    # Generate AI insights
+    if counts['partialMatch'] > 0 and default_tolerances:
+        insights.append(f"TDS deductions causing ±2% variations in {counts['partialMatch']} invoices")
+    elif counts['partialMatch'] > 0:
+        insights.append(f"{counts['partialMatch']} invoices differ by amounts within the tolerance rules")
+    
+    if counts['missingInAPAR'] > 0:
+        insights.append(f"{counts['missingInAPAR']} invoices filed in GST but missing in AP/AR ledger")
+    
+    if counts['missingInGST'] > 0:
+        insights.append(f"{counts['missingInGST']} invoices in AP/AR but not yet filed in GST")
+    
+    if counts['fuzzyKeyMatch'] > 0:
+        insights.append(f"{counts['fuzzyKeyMatch']} invoice(s) paired despite differently formatted invoice numbers - check the key formats")
+    
+    if counts['splitMatch'] > 0:
+        insights.append(f"{counts['splitMatch']} AP/AR entries add up to GST invoices booked in parts or netted with credit notes")
+    
+    if tax_checks is not None and tax_checks['flagged'] > 0:
+        check, failures = max(tax_checks['checks'].items(), key=lambda item: item[1])
+        insights.append(f"{tax_checks['flagged']} invoice(s) fail tax-component checks, most often {check.replace('_', ' ')} ({failures})")
+    
+    if history is not None:
+        if history['late_filing'] > 0:
+            insights.append(f"{history['late_filing']} invoice(s) missing from GST were filed late, in a later period")
+        if history['filed_before'] > 0:
+            insights.append(f"{history['filed_before']} invoice(s) missing from GST were filed in an earlier upload")
+        if history['booked_elsewhere'] > 0:
+            insights.append(f"{history['booked_elsewhere']} invoice(s) missing in AP/AR were booked in another AP/AR upload")
+        if history['cross_period_duplicate'] > 0:
+            insights.append(f"⚠️ {history['cross_period_duplicate']} missing invoice(s) were uploaded before under another period - possible duplicates")
+    
+    # NEW: Date discrepancy insights
+    if counts['dateDiscrepancies'] > 0:
+        insights.append(f"⚠️ Found {counts['dateDiscrepancies']} invoice(s) with date mismatches between GST and AP/AR")
+        
+        # Flag the largest date difference beyond its critical window
+        if largest_date_gap is not None:
+            invoice_no, max_days = largest_date_gap
+            insights.append(f"🚨 Critical: Invoice {invoice_no} has {max_days} days date difference")
+    
+    if unparsed_date_count > 0:
+        insights.append(f"⚠️ {unparsed_date_count} invoice date(s) could not be parsed (GST: {unparsed_dates['gst']}, AP/AR: {unparsed_dates['apar']})")
+    
+    if counts['mismatched'] > 0:
+        insights.append(f"Recommended: Review invoices {', '.join(mismatch_invoices)} for amount discrepancies")
+    
+    match_ratio = counts['matched'] / gst_count if gst_count > 0 else 0
+    if match_ratio > 0.95:
+        insights.append("Excellent reconciliation rate (>95%)! Financial data is well-aligned.")
+    elif match_ratio < 0.80:
+        insights.append("Warning: Low match rate (<80%). Consider reviewing data entry processes.")
+    
+    # Calculate summary
+    summary = {
+        'totalInvoices': gst_count + apar_count,
+        'matched': counts['matched'],
+        'partialMatch': counts['partialMatch'],
+        'mismatched': counts['mismatched'],
+        'missingInGST': counts['missingInGST'],
+        'missingInAPAR': counts['missingInAPAR'],
+        'dateDiscrepancies': counts['dateDiscrepancies'],  # NEW
+        'matchRate': round((counts['matched'] / gst_count) * 100, 2) if gst_count > 0 else 0,
+        'fuzzyKeyMatch': counts['fuzzyKeyMatch'],
+        'splitMatch': counts['splitMatch'],
+        'unparsedDates': unparsed_date_count
+    }
+    if tax_checks is not None:
+        summary['taxChecks'] = tax_checks
+    if history is not None:
+        summary['invoiceHistory'] = history
+    
+    return {
+        'summary': summary,
+        'insights': insights
+    }
+
+
+def build_reconciliation_result(
+    categories: Dict[str, pd.DataFrame],
+    gst_count: int,
+    apar_count: int,
+    unparsed_dates: Optional[Dict[str, int]] = None,
+    changes: Optional[pd.DataFrame] = None,
+    history: Optional[pd.DataFrame] = None,
+    default_tolerances: bool = True,
+) -> Dict[str, Any]:
+    """Turn the classified frames into the summary/details/insights payload"""
+    overview = summarize_reconciliation(categories, gst_count, apar_count, unparsed_dates, history, default_tolerances)
+    
+    result = {
+        'summary': overview['summary'],
+        'details': {
+            name: category_records(name, _detail_rows(name, frame))
+            for name, frame in categories.items()
+        },
+        'insights': overview['insights']
+    }
+    
+    # Only runs that had a baseline to compare against report what changed since it
+    if changes is not None:
+        result['changes'] = {
+            'counts': count_changes(changes),
+            'records': changes.to_dict('records')
+        }
+    
+    # Only runs with an invoice index report the history of their missing invoices
+    if history is not None:
+        result['history'] = {
+            'counts': count_history(history),
+            'records': history.to_dict('records')
+        }
+    
+    return result
+
+
+def render_reconciliation_result(
+    categories: Dict[str, pd.DataFrame],
+    gst_count: int,
+    apar_count: int,
+    unparsed_dates: Optional[Dict[str, int]] = None,
+    changes: Optional[pd.DataFrame] = None,
+    history: Optional[pd.DataFrame] = None,
+    default_tolerances: bool = True,
+    layout: str = 'records',
+) -> bytes:
+    """The build_reconciliation_result payload encoded as JSON, with the tables written column-wise.
+
+    In the ``records`` layout the bytes are the same as JSONResponse writes for build_reconciliation_result;
+    the ``columns`` layout has an object of field arrays in place of each list of records.
+    """
+    overview = summarize_reconciliation(categories, gst_count, apar_count, unparsed_dates, history, default_tolerances)
+    details = ','.join(
+        f'{dumps(name)}:{category_json(name, _detail_rows(name, frame), layout)}' for name, frame in categories.items()
+    )
+    parts = ['{"summary":', dumps(overview['summary']), ',"details":{', details, '},"insights":', dumps(overview['insights'])]
+    
+    if changes is not None:
+        columns = {column: changes[column].to_numpy() for column in changes.columns}
+        records = columns_json(columns, len(changes)) if layout == 'columns' else records_json(columns, len(changes))
+        parts += [',"changes":{"counts":', dumps(count_changes(changes)), ',"records":', records, '}']
+    
+    if history is not None:
+        columns = {column: history[column].to_numpy() for column in history.columns}
+        records = columns_json(columns, len(history)) if layout == 'columns' else records_json(columns, len(history))
+        parts += [',"history":{"counts":', dumps(count_history(history)), ',"records":', records, '}']
+    
+    parts.append('}')
+    return ''.join(parts).encode('utf-8')
+
+
+def _detail_rows(category: str, frame: pd.DataFrame) -> pd.DataFrame:
+    # Matched invoices are the bulk of a result and only a sample of them is listed
+    return frame.head(100) if category == 'matched' else frame
+
+
+def count_changes(changes: pd.DataFrame) -> Dict[str, int]:
+    return {kind: int((changes['Change'] == kind).sum()) for kind in CHANGE_KINDS}
+
+
+def count_history(history: pd.DataFrame) -> Dict[str, int]:
+    return {flag: int((history['Flag'] == flag).sum()) for flag in HISTORY_FLAGS}
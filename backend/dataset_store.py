@@ -0,0 +1,234 @@
+"""Session-scoped storage for uploaded GST and AP/AR datasets"""
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Session IDs end up in spill paths, so only plain tokens are accepted
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class DatasetStore:
+    """Keeps uploaded DataFrames per session with LRU/TTL eviction and an optional Parquet spill directory.
+
+    Without a spill directory the store lives in process memory only. With one, every dataset is also
+    written to ``<spill_dir>/<session_id>/<kind>.parquet`` so other uvicorn workers pointed at the same
+    directory can load it, and datasets evicted from memory stay available until their TTL expires.
+
+    A kind can also be stored as named partitions, each kept as a dataset of its own under
+    ``<kind>/<name>`` and listed in an index dataset ``<kind>.index``, so readers load only the partitions
+    they need.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 32,
+        ttl_seconds: float = 3600,
+        memory_budget_bytes: int = 1024 * 1024 * 1024,
+        spill_dir: Optional[str] = None,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.memory_budget_bytes = memory_budget_bytes
+        self.spill_dir = spill_dir
+        self._sessions: "OrderedDict[str, Dict[str, Dict]]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "DatasetStore":
+        """Build a store from the DATASET_* environment variables"""
+        return cls(
+            max_sessions=int(os.environ.get('DATASET_MAX_SESSIONS', 32)),
+            ttl_seconds=float(os.environ.get('DATASET_TTL_SECONDS', 3600)),
+            memory_budget_bytes=int(float(os.environ.get('DATASET_MEMORY_BUDGET_MB', 1024)) * 1024 * 1024),
+            spill_dir=os.environ.get('DATASET_SPILL_DIR') or None,
+        )
+
+    @staticmethod
+    def new_session_id() -> str:
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def is_valid_session_id(session_id: str) -> bool:
+        return bool(SESSION_ID_PATTERN.match(session_id))
+
+    def put(self, session_id: str, kind: str, dataframe: pd.DataFrame) -> None:
+        """Store one side ('gst' or 'apar') of a session, evicting older sessions if needed"""
+        spilled_at = self._spill(session_id, kind, dataframe)
+        size = int(dataframe.memory_usage(deep=True).sum())
+
+        with self._lock:
+            self._evict_expired()
+            datasets = self._sessions.setdefault(session_id, {})
+            if kind in datasets:
+                self._memory_bytes -= datasets[kind]['size']
+            datasets[kind] = {'dataframe': dataframe, 'size': size, 'spilled_at': spilled_at}
+            self._memory_bytes += size
+            self._touch(session_id)
+            self._evict_over_budget(keep=session_id)
+
+    def get(self, session_id: str, kind: str) -> Optional[pd.DataFrame]:
+        """Return one side of a session, reloading it from the spill directory when needed"""
+        with self._lock:
+            self._evict_expired()
+            entry = self._sessions.get(session_id, {}).get(kind)
+            if entry is not None:
+                self._touch(session_id)
+
+        path = self._spill_path(session_id, kind)
+        if path is None or not os.path.exists(path):
+            return entry['dataframe'] if entry is not None else None
+
+        modified = os.path.getmtime(path)
+        if time.time() - modified > self.ttl_seconds:
+            self._remove_spilled(session_id, kind)
+            return None
+
+        # Another worker may have replaced this dataset since it was cached here
+        if entry is not None and entry['spilled_at'] >= modified:
+            return entry['dataframe']
+
+        # Normalized key columns were stored as Arrow-backed strings and should come back as such
+        with pd.option_context('mode.string_storage', 'pyarrow'):
+            dataframe = pd.read_parquet(path)
+        with self._lock:
+            datasets = self._sessions.setdefault(session_id, {})
+            if kind in datasets:
+                self._memory_bytes -= datasets[kind]['size']
+            size = int(dataframe.memory_usage(deep=True).sum())
+            datasets[kind] = {'dataframe': dataframe, 'size': size, 'spilled_at': modified}
+            self._memory_bytes += size
+            self._touch(session_id)
+            self._evict_over_budget(keep=session_id)
+        return dataframe
+
+    def put_partitions(
+        self, session_id: str, kind: str, partitions: Dict[str, pd.DataFrame], batch: int, append: bool = False
+    ) -> pd.DataFrame:
+        """Store one side as named partitions and return its updated index.
+
+        The index has one row per partition: its ``partition`` name, its ``rows`` and the ``batch`` it was
+        stored in, which callers number to tell uploads apart. With ``append`` the partitions join those
+        already stored, replacing any of the same name; otherwise they replace them all.
+        """
+        previous = self.partition_index(session_id, kind)
+        for name, dataframe in partitions.items():
+            self.put(session_id, f'{kind}/{name}', dataframe)
+
+        index = pd.DataFrame({
+            'partition': list(partitions),
+            'rows': [len(dataframe) for dataframe in partitions.values()],
+            'batch': batch,
+        })
+        if previous is not None:
+            replaced = previous['partition'].isin(list(partitions))
+            if append:
+                index = pd.concat([previous[~replaced], index], ignore_index=True)
+            else:
+                for name in previous['partition'][~replaced]:
+                    self.delete(session_id, f'{kind}/{name}')
+        index = index.astype({'rows': 'int64', 'batch': 'int64'}).sort_values('partition', ignore_index=True)
+        self.put(session_id, f'{kind}.index', index)
+        return index
+
+    def partition_index(self, session_id: str, kind: str) -> Optional[pd.DataFrame]:
+        """Index of a partitioned side, as returned by put_partitions, or None if it was never stored"""
+        return self.get(session_id, f'{kind}.index')
+
+    def get_partitions(self, session_id: str, kind: str, names: List[str]) -> Optional[List[pd.DataFrame]]:
+        """The named partitions of one side, or None if any of them is gone"""
+        partitions = [self.get(session_id, f'{kind}/{name}') for name in names]
+        if any(dataframe is None for dataframe in partitions):
+            return None
+        return partitions
+
+    def delete(self, session_id: str, kind: str) -> None:
+        """Drop one dataset of a session from memory and from the spill directory"""
+        with self._lock:
+            entry = self._sessions.get(session_id, {}).pop(kind, None)
+            if entry is not None:
+                self._memory_bytes -= entry['size']
+        self._remove_spilled(session_id, kind)
+
+    def discard(self, session_id: str) -> None:
+        """Drop a session from memory and from the spill directory"""
+        with self._lock:
+            self._drop(session_id)
+        if self.spill_dir:
+            shutil.rmtree(os.path.join(self.spill_dir, session_id), ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'memory_bytes': self._memory_bytes,
+                'memory_budget_bytes': self.memory_budget_bytes,
+            }
+
+    def _touch(self, session_id: str) -> None:
+        self._sessions.move_to_end(session_id)
+        self._last_access[session_id] = time.time()
+
+    def _drop(self, session_id: str) -> None:
+        datasets = self._sessions.pop(session_id, {})
+        self._last_access.pop(session_id, None)
+        self._memory_bytes -= sum(entry['size'] for entry in datasets.values())
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [session_id for session_id, accessed in self._last_access.items() if accessed < cutoff]
+        for session_id in expired:
+            self._drop(session_id)
+
+    def _evict_over_budget(self, keep: str) -> None:
+        # Least recently used sessions go first; spilled copies stay on disk
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._memory_bytes > self.memory_budget_bytes
+        ):
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                break
+            self._drop(oldest)
+
+    def _spill_path(self, session_id: str, kind: str) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        return os.path.join(self.spill_dir, session_id, f'{kind}.parquet')
+
+    def _spill(self, session_id: str, kind: str, dataframe: pd.DataFrame) -> float:
+        path = self._spill_path(session_id, kind)
+        if path is None:
+            return 0.0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so other workers never read a half-written file
+        temporary_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            dataframe.to_parquet(temporary_path, index=False)
+            os.replace(temporary_path, path)
+        except Exception:
+            logger.exception("Could not spill %s dataset for session %s, keeping it in memory only", kind, session_id)
+            for stale_path in (temporary_path, path):
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+            return 0.0
+        return os.path.getmtime(path)
+
+    def _remove_spilled(self, session_id: str, kind: str) -> None:
+        path = self._spill_path(session_id, kind)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,149 @@
+"""Streaming writers that export reconciliation result categories as CSV, XLSX or Parquet.
+
+Every writer takes the rows as an iterator of DataFrame chunks and never holds more than one chunk, so an
+export costs the same memory whatever the size of the category.
+"""
+import zlib
+from typing import Dict, Iterable, Iterator, List
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+# Rows converted and written at a time
+EXPORT_CHUNK_ROWS = 50_000
+
+EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Type of every exported column, so all chunks of an export share one schema even when a column is
+# entirely missing in some of them
+COLUMN_TYPES = {
+    'Invoice_No': pa.string(),
+    'APAR_Invoice_No': pa.string(),
+    'GSTIN': pa.string(),
+    'GST_Amount': pa.float64(),
+    'APAR_Amount': pa.float64(),
+    'GST_Date': pa.string(),
+    'APAR_Date': pa.string(),
+    'Difference': pa.float64(),
+    'Difference_Percentage': pa.float64(),
+    'Match_Type': pa.string(),
+    'Confidence': pa.float64(),
+    'Reason': pa.string(),
+    'Date_Mismatch': pa.bool_(),
+    'Date_Difference_Days': pa.int64(),
+    'Difference_Days': pa.int64(),
+    'Split_Total': pa.float64(),
+    'Split_Parts': pa.int64(),
+    'Tax_Checks': pa.int64(),
+}
+
+# Rows per worksheet, header included; longer categories continue on a numbered sheet
+XLSX_MAX_ROWS = 1_048_576
+
+
+def export_schema(columns: List[str]) -> pa.Schema:
+    return pa.schema([(column, COLUMN_TYPES[column]) for column in columns])
+
+
+def typed_chunk(frame: pd.DataFrame) -> pd.DataFrame:
+    """Cast a chunk to the exported column types: integers stay integers next to missing values"""
+    frame = frame.copy()
+    for column in frame.columns:
+        column_type = COLUMN_TYPES[column]
+        if pa.types.is_string(column_type):
+            frame[column] = frame[column].astype(object)
+        elif pa.types.is_integer(column_type):
+            frame[column] = frame[column].astype('Int64')
+        elif pa.types.is_floating(column_type):
+            frame[column] = frame[column].astype(float)
+    return frame
+
+
+def iter_csv(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """UTF-8 CSV of the chunks, with the header written once"""
+    header = True
+    for chunk in chunks:
+        yield typed_chunk(chunk).to_csv(index=False, header=header).encode('utf-8')
+        header = False
+
+
+def iter_parquet(chunks: Iterable[pd.DataFrame], schema: pa.Schema) -> Iterator[bytes]:
+    """Parquet file of the chunks, one row group each, yielded as the writer produces it"""
+    sink = _ChunkSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(typed_chunk(chunk), schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def gzip_stream(stream: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzip-compress a byte stream on the fly"""
+    # 16 + MAX_WBITS makes zlib write a gzip header and trailer
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for data in stream:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def write_xlsx(sheets: Dict[str, Iterable[pd.DataFrame]], path: str) -> None:
+    """Workbook with one worksheet per entry, written in openpyxl's write-only mode.
+
+    Write-only worksheets stream their rows to temporary files, so the workbook is never built in memory.
+    """
+    workbook = Workbook(write_only=True)
+    for name, chunks in sheets.items():
+        sheet, header, rows, part = None, None, 0, 1
+        for chunk in chunks:
+            if sheet is None:
+                header = list(chunk.columns)
+                sheet = workbook.create_sheet(name)
+                sheet.append(header)
+                rows = 1
+            for row in _xlsx_rows(chunk):
+                if rows == XLSX_MAX_ROWS:
+                    part += 1
+                    sheet = workbook.create_sheet(f'{name} ({part})')
+                    sheet.append(header)
+                    rows = 1
+                sheet.append(row)
+                rows += 1
+    workbook.save(path)
+
+
+def _xlsx_rows(chunk: pd.DataFrame) -> Iterator[tuple]:
+    # Excel has no NaN, missing cells are left empty
+    values = typed_chunk(chunk).astype(object)
+    return values.where(values.notna(), None).itertuples(index=False, name=None)
+
+
+class _ChunkSink:
+    """Write-only file object that keeps what the Parquet writer wrote until it is drained"""
+
+    closed = False
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
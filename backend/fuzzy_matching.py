@@ -0,0 +1,178 @@
+"""Second-pass fuzzy pairing of invoices whose (Invoice_No, GSTIN) keys did not match exactly"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process, utils
+
+# Minimum combined similarity (0-100) for two leftover invoices to be paired
+FUZZY_SCORE_THRESHOLD = 85
+
+# Relative amount difference allowed inside a candidate block
+FUZZY_AMOUNT_TOLERANCE = 0.02
+
+# Share of the score taken by Invoice_No similarity when both sides carry a party name
+INVOICE_SCORE_WEIGHT = 0.7
+
+# GST rows scored per cdist batch, and the largest score matrix computed at once
+FUZZY_BATCH_ROWS = 2000
+FUZZY_BATCH_CELLS = 4_000_000
+
+# Score matrices smaller than this are computed on a single thread
+PARALLEL_MIN_CELLS = 250_000
+
+# Rounds of mutual-best assignment before remaining candidates are dropped
+FUZZY_ASSIGNMENT_ROUNDS = 8
+
+
+def normalize_invoice_numbers(values: pd.Series) -> pd.Series:
+    """Uppercase, drop separators and leading zeros of digit runs, so INV-001 and inv/0001 compare equal"""
+    return (
+        values.astype(str)
+        .str.upper()
+        .str.replace(r'[^0-9A-Z]', '', regex=True)
+        .str.replace(r'(?<![0-9])0+(?=[0-9])', '', regex=True)
+    )
+
+
+def fuzzy_key_match(gst: pd.DataFrame, apar: pd.DataFrame, use_names: Optional[bool] = None) -> pd.DataFrame:
+    """Pair leftover GST and AP/AR rows by fuzzy Invoice_No and party-name similarity.
+
+    Candidates are blocked by GSTIN and amount: both sides are sorted by (GSTIN, amount) and each batch
+    of GST rows from one GSTIN is only scored against the AP/AR rows of that GSTIN whose amounts can fall
+    within FUZZY_AMOUNT_TOLERANCE. Scores come from ``rapidfuzz.process.cdist``, on all cores for large blocks.
+
+    ``gst`` needs Invoice_No, GSTIN, GST_Amount and GST_Name; ``apar`` the APAR_ equivalents. Party names
+    are scored when both sides have some, unless ``use_names`` decides it for a caller that only passes part
+    of the leftovers. Returns one row per accepted pair with the positions into both frames and the scores.
+    """
+    if gst.empty or apar.empty:
+        return no_fuzzy_pairs()
+
+    gstin_codes = pd.Categorical(pd.concat([gst['GSTIN'], apar['GSTIN']], ignore_index=True)).codes
+    gst_codes = gstin_codes[:len(gst)]
+    apar_codes = gstin_codes[len(gst):]
+    gst_amounts = gst['GST_Amount'].to_numpy(dtype=float)
+    apar_amounts = apar['APAR_Amount'].to_numpy(dtype=float)
+
+    gst_invoices = normalize_invoice_numbers(gst['Invoice_No']).to_numpy()
+    apar_invoices = normalize_invoice_numbers(apar['Invoice_No']).to_numpy()
+    gst_names = gst['GST_Name'].to_numpy()
+    apar_names = apar['APAR_Name'].to_numpy()
+    if use_names is None:
+        use_names = has_party_names(gst['GST_Name'], apar['APAR_Name'])
+
+    gst_order = np.lexsort((gst_amounts, gst_codes))
+    apar_order = np.lexsort((apar_amounts, apar_codes))
+    sorted_gst_codes = gst_codes[gst_order]
+    sorted_apar_codes = apar_codes[apar_order]
+    sorted_apar_amounts = apar_amounts[apar_order]
+
+    # Only GSTINs with leftovers on both sides can produce a pair
+    shared_codes = np.intersect1d(sorted_gst_codes, sorted_apar_codes)
+    gst_starts = np.searchsorted(sorted_gst_codes, shared_codes, 'left')
+    gst_ends = np.searchsorted(sorted_gst_codes, shared_codes, 'right')
+    apar_starts = np.searchsorted(sorted_apar_codes, shared_codes, 'left')
+    apar_ends = np.searchsorted(sorted_apar_codes, shared_codes, 'right')
+
+    found = []
+    for gst_start, gst_end, apar_start, apar_end in zip(gst_starts, gst_ends, apar_starts, apar_ends):
+        block_amounts = sorted_apar_amounts[apar_start:apar_end]
+
+        for start in range(gst_start, gst_end, FUZZY_BATCH_ROWS):
+            rows = gst_order[start:min(gst_end, start + FUZZY_BATCH_ROWS)]
+            # Rows are sorted by amount, so the first and last bound the amount window of the batch
+            low_amount = gst_amounts[rows[0]] - FUZZY_AMOUNT_TOLERANCE * abs(gst_amounts[rows[0]])
+            high_amount = gst_amounts[rows[-1]] + FUZZY_AMOUNT_TOLERANCE * abs(gst_amounts[rows[-1]])
+            low = apar_start + int(np.searchsorted(block_amounts, low_amount, 'left'))
+            high = apar_start + int(np.searchsorted(block_amounts, high_amount, 'right'))
+
+            step = max(1, FUZZY_BATCH_CELLS // len(rows))
+            for window_start in range(low, high, step):
+                window = apar_order[window_start:min(high, window_start + step)]
+                scored = _score_batch(
+                    rows, window, gst_amounts, apar_amounts,
+                    gst_invoices, apar_invoices, gst_names, apar_names, use_names,
+                )
+                if scored is not None:
+                    found.append(scored)
+
+    if not found:
+        return no_fuzzy_pairs()
+    columns = ['gst_position', 'apar_position', 'invoice_score', 'name_score', 'score']
+    return _assign_pairs(pd.DataFrame({
+        column: np.concatenate([batch[index] for batch in found]) for index, column in enumerate(columns)
+    }))
+
+
+def has_party_names(gst_names: pd.Series, apar_names: pd.Series) -> bool:
+    """Whether names can help: both sides need at least one non-empty party name"""
+    return bool((gst_names != '').any() and (apar_names != '').any())
+
+
+def no_fuzzy_pairs() -> pd.DataFrame:
+    """Empty result with the columns fuzzy_key_match returns"""
+    return pd.DataFrame({
+        'gst_position': np.array([], dtype=np.int64),
+        'apar_position': np.array([], dtype=np.int64),
+        'invoice_score': np.array([], dtype=float),
+        'name_score': np.array([], dtype=float),
+        'score': np.array([], dtype=float),
+    })
+
+
+def _score_batch(rows, window, gst_amounts, apar_amounts, gst_invoices, apar_invoices, gst_names, apar_names, use_names):
+    """Score one block of GST rows against an AP/AR window of the same GSTIN, returning the accepted cells"""
+    candidates = (
+        np.abs(gst_amounts[rows][:, None] - apar_amounts[window][None, :])
+        <= FUZZY_AMOUNT_TOLERANCE * np.abs(gst_amounts[rows])[:, None]
+    )
+    if not candidates.any():
+        return None
+
+    # Thread start-up costs more than it saves on small blocks
+    workers = -1 if candidates.size >= PARALLEL_MIN_CELLS else 1
+    invoice_scores = process.cdist(
+        gst_invoices[rows], apar_invoices[window], scorer=fuzz.ratio, dtype=np.uint8, workers=workers
+    )
+    if use_names:
+        name_scores = process.cdist(
+            gst_names[rows], apar_names[window], scorer=fuzz.token_sort_ratio,
+            processor=utils.default_process, dtype=np.uint8, workers=workers
+        )
+        scores = INVOICE_SCORE_WEIGHT * invoice_scores + (1 - INVOICE_SCORE_WEIGHT) * name_scores
+    else:
+        name_scores = np.zeros_like(invoice_scores)
+        scores = invoice_scores.astype(float)
+
+    gst_hits, apar_hits = np.nonzero(candidates & (scores >= FUZZY_SCORE_THRESHOLD))
+    if len(gst_hits) == 0:
+        return None
+    return (
+        rows[gst_hits],
+        window[apar_hits],
+        invoice_scores[gst_hits, apar_hits].astype(float),
+        name_scores[gst_hits, apar_hits].astype(float),
+        scores[gst_hits, apar_hits].astype(float),
+    )
+
+
+def _assign_pairs(candidates: pd.DataFrame) -> pd.DataFrame:
+    """Keep one-to-one pairs, taking mutual best matches first and repeating on what is left"""
+    candidates = candidates.sort_values(
+        ['score', 'gst_position', 'apar_position'], ascending=[False, True, True], kind='stable'
+    )
+    accepted = [no_fuzzy_pairs()]
+    for _ in range(FUZZY_ASSIGNMENT_ROUNDS):
+        if candidates.empty:
+            break
+        best_for_gst = candidates.drop_duplicates('gst_position')
+        best_for_apar = candidates.drop_duplicates('apar_position')
+        mutual = best_for_gst.merge(best_for_apar[['gst_position', 'apar_position']], on=['gst_position', 'apar_position'])
+        accepted.append(mutual)
+        candidates = candidates[
+            ~candidates['gst_position'].isin(mutual['gst_position'])
+            & ~candidates['apar_position'].isin(mutual['apar_position'])
+        ]
+
+    return pd.concat(accepted, ignore_index=True).sort_values('gst_position', kind='stable').reset_index(drop=True)
@@ -0,0 +1,191 @@
+"""Persistent, append-only index of every invoice uploaded, for lookups against past filings and ledgers.
+
+Uploads replace each other in the dataset store, so an earlier filing is gone once a new file arrives. Each
+upload is therefore also appended to a SQLite file holding one row per invoice. A row has the hash of the
+stripped (Invoice_No, GSTIN) key, the side and period it was uploaded under, its amount and date, and the
+upload it came from. The table is clustered on the key hash, so a lookup joins a batch of sorted key hashes
+against it and reads only the pages holding those keys; history never has to fit in memory. Rows are never updated
+or deleted: an amended filing is one more upload next to the one it corrects.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from itertools import repeat
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Keys looked up, or invoices inserted, per statement batch
+INDEX_BATCH_ROWS = 50_000
+
+# Seconds a writer waits for another process's write to finish
+INDEX_LOCK_TIMEOUT_SECONDS = 30
+
+# Page cache of each connection, in KiB
+INDEX_CACHE_KIB = 64 * 1024
+
+# Columns add() reads from its frame, in table order
+INVOICE_COLUMNS = ['key_hash', 'period', 'amount_paise', 'invoice_date', 'invoice_no', 'gstin']
+
+# Columns lookup() returns after the position of the looked-up key
+LOOKUP_COLUMNS = ['period', 'amount_paise', 'invoice_date', 'source']
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS uploads (
+        upload_id INTEGER PRIMARY KEY,
+        source TEXT NOT NULL,
+        side TEXT NOT NULL,
+        rows INTEGER NOT NULL,
+        indexed_at REAL NOT NULL,
+        UNIQUE (source, side)
+    )""",
+    # Stored in key order, so every invoice of a key sits together and the table is its own covering index
+    """CREATE TABLE IF NOT EXISTS invoices (
+        key_hash INTEGER NOT NULL,
+        side TEXT NOT NULL,
+        upload_id INTEGER NOT NULL,
+        row INTEGER NOT NULL,
+        period TEXT NOT NULL,
+        amount_paise INTEGER,
+        invoice_date TEXT,
+        invoice_no TEXT NOT NULL,
+        gstin TEXT NOT NULL,
+        PRIMARY KEY (key_hash, side, upload_id, row)
+    ) WITHOUT ROWID""",
+]
+
+
+class InvoiceIndex:
+    """Invoices of every upload in a SQLite file at ``path``; without a path nothing is kept and lookups find nothing.
+
+    Each call opens its own connection, so the index can be used from any thread and shared by several
+    uvicorn workers pointed at the same file.
+    """
+
+    def __init__(self, path: Optional[str] = None, batch_rows: int = INDEX_BATCH_ROWS):
+        self.path = path
+        self.batch_rows = batch_rows
+        self._lock = threading.Lock()
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with closing(self._connect()) as connection, connection:
+                # Readers keep reading while an upload is being appended
+                connection.execute('PRAGMA journal_mode=WAL')
+                for statement in SCHEMA:
+                    connection.execute(statement)
+
+    @classmethod
+    def from_env(cls) -> "InvoiceIndex":
+        """Build an index from INVOICE_INDEX_PATH; unset or empty keeps no index"""
+        return cls(path=os.environ.get('INVOICE_INDEX_PATH') or None)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def add(self, side: str, source: str, invoices: pd.DataFrame) -> bool:
+        """Append the invoices of one upload, with INVOICE_COLUMNS, unless ``source`` was added for ``side`` before.
+
+        Returns whether they were added. ``key_hash`` holds unsigned 64-bit key hashes.
+        """
+        if not self.enabled:
+            return False
+        key_hashes = invoices['key_hash'].to_numpy(dtype=np.uint64).view(np.int64)
+        # Inserting in key order appends to the clustered table page by page instead of all over it
+        order = np.argsort(key_hashes, kind='stable')
+        amounts = invoices['amount_paise'].astype(object)
+        columns = [
+            key_hashes[order].tolist(),
+            order.tolist(),
+            invoices['period'].astype(str).to_numpy(dtype=object)[order].tolist(),
+            amounts.where(amounts.notna(), None).to_numpy(dtype=object)[order].tolist(),
+            invoices['invoice_date'].astype(str).to_numpy(dtype=object)[order].tolist(),
+            invoices['invoice_no'].astype(str).to_numpy(dtype=object)[order].tolist(),
+            invoices['gstin'].astype(str).to_numpy(dtype=object)[order].tolist(),
+        ]
+        # One writer per process at a time; SQLite serializes writers of other processes
+        with self._lock, closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO uploads (source, side, rows, indexed_at) VALUES (?, ?, ?, ?)',
+                (source, side, len(invoices), time.time()),
+            )
+            if not cursor.rowcount:
+                return False
+            upload_id = cursor.lastrowid
+            for start in range(0, len(invoices), self.batch_rows):
+                batch = [column[start:start + self.batch_rows] for column in columns]
+                connection.executemany(
+                    'INSERT INTO invoices (key_hash, side, upload_id, row, period, amount_paise, invoice_date, invoice_no, gstin) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    zip(batch[0], repeat(side), repeat(upload_id), *batch[1:]),
+                )
+        return True
+
+    def lookup(self, side: str, key_hashes: np.ndarray, exclude_source: Optional[str] = None) -> pd.DataFrame:
+        """Every indexed invoice of ``side`` whose key is among ``key_hashes``, with the position of that key.
+
+        Keys are looked up INDEX_BATCH_ROWS at a time. Invoices of ``exclude_source`` are left out.
+        """
+        key_hashes = np.asarray(key_hashes, dtype=np.uint64)
+        if not self.enabled or len(key_hashes) == 0:
+            return no_indexed_invoices()
+
+        found = []
+        query = (
+            'SELECT k.position, i.period, i.amount_paise, i.invoice_date, u.source '
+            # CROSS JOIN keeps the batch as the outer loop, so each key is one seek into the clustered table
+            'FROM lookup_keys AS k CROSS JOIN invoices AS i CROSS JOIN uploads AS u '
+            'WHERE i.key_hash = k.key_hash AND i.side = ? AND u.upload_id = i.upload_id AND u.source != ?'
+        )
+        signed = key_hashes.view(np.int64)
+        # Keys in ascending order make the seeks of a batch walk the table front to back
+        order = np.argsort(signed, kind='stable')
+        with closing(self._connect()) as connection:
+            connection.execute('CREATE TEMP TABLE lookup_keys (key_hash INTEGER NOT NULL, position INTEGER NOT NULL)')
+            for start in range(0, len(order), self.batch_rows):
+                batch = order[start:start + self.batch_rows]
+                connection.execute('DELETE FROM lookup_keys')
+                connection.executemany(
+                    'INSERT INTO lookup_keys (key_hash, position) VALUES (?, ?)', zip(signed[batch].tolist(), batch.tolist())
+                )
+                found.extend(connection.execute(query, (side, exclude_source or '')).fetchall())
+
+        if not found:
+            return no_indexed_invoices()
+        matches = pd.DataFrame.from_records(found, columns=['position'] + LOOKUP_COLUMNS)
+        matches['amount_paise'] = matches['amount_paise'].astype('Int64')
+        return matches.sort_values('position', kind='stable').reset_index(drop=True)
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {'enabled': False}
+        with closing(self._connect()) as connection:
+            uploads = dict(connection.execute('SELECT side, COUNT(*) FROM uploads GROUP BY side').fetchall())
+            invoices = dict(connection.execute('SELECT side, SUM(rows) FROM uploads GROUP BY side').fetchall())
+        return {
+            'enabled': True,
+            'uploads': uploads,
+            'invoices': invoices,
+            'bytes': sum(
+                os.path.getsize(self.path + suffix) for suffix in ('', '-wal') if os.path.exists(self.path + suffix)
+            ),
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=INDEX_LOCK_TIMEOUT_SECONDS)
+        # In WAL mode a commit survives a crash of the process without waiting for the disk
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(f'PRAGMA cache_size=-{INDEX_CACHE_KIB}')
+        return connection
+
+
+def no_indexed_invoices() -> pd.DataFrame:
+    """Empty result with the columns lookup returns"""
+    matches = pd.DataFrame({'position': np.array([], dtype=np.int64)})
+    for column in LOOKUP_COLUMNS:
+        matches[column] = pd.Series([], dtype='Int64' if column == 'amount_paise' else object)
+    return matches
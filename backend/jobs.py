@@ -0,0 +1,300 @@
+"""Background reconciliation jobs executed in a process pool"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import StageTimings, observe_stages
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when the job was cancelled between two phases"""
+
+
+class JobLimitReached(Exception):
+    """Raised when the concurrent job cap would be exceeded"""
+
+
+class JobProgress:
+    """Picklable progress callback handed to the worker process.
+
+    Each call publishes the current phase and row counts through a manager dict and
+    is also the point where a cancellation request takes effect.
+    """
+
+    def __init__(self, job_id: str, shared_state, cancel_event):
+        self.job_id = job_id
+        self.shared_state = shared_state
+        self.cancel_event = cancel_event
+
+    def __call__(self, phase: str, rows_processed: int = 0, rows_total: int = 0) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.job_id)
+        self.shared_state[self.job_id] = {
+            'phase': phase,
+            'rows_processed': int(rows_processed),
+            'rows_total': int(rows_total),
+        }
+
+
+def _run_job(fn: Callable, args: tuple, progress: JobProgress):
+    """Run a job and return its result with the timings of the phases it reported"""
+    progress('started')
+    stages = StageTimings(progress)
+    result = fn(*args, progress=stages)
+    return result, stages.finish()
+
+
+class JobManager:
+    """Runs CPU-bound jobs in a process pool and keeps their status and results for polling.
+
+    A job's result is collected, and its ``on_complete`` hook run, on a small thread pool of its own. The
+    pool's management thread only hands finished futures over, so a slow hook never holds up collecting
+    other jobs' results or starting queued ones. A job counts as finished once its hook has returned.
+
+    A job that only coordinates work done in other processes can run on a thread of this process instead,
+    so its inputs are never pickled into a pool worker.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_active_jobs: int = 4,
+        result_ttl_seconds: float = 3600,
+        completion_workers: int = 2,
+    ):
+        self.max_workers = max_workers
+        self.max_active_jobs = max_active_jobs
+        self.result_ttl_seconds = result_ttl_seconds
+        self.completion_workers = completion_workers
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._completions: Optional[ThreadPoolExecutor] = None
+        self._coordinators: Optional[ThreadPoolExecutor] = None
+        self._manager = None
+        self._shared_state = None
+
+    @classmethod
+    def from_env(cls) -> "JobManager":
+        """Build a manager from the JOB_* environment variables"""
+        return cls(
+            max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+            max_active_jobs=int(os.environ.get('JOB_MAX_ACTIVE', 4)),
+            result_ttl_seconds=float(os.environ.get('JOB_RESULT_TTL_SECONDS', 3600)),
+            completion_workers=int(os.environ.get('JOB_COMPLETION_WORKERS', 2)),
+        )
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        on_complete: Optional[Callable] = None,
+        on_finish: Optional[Callable] = None,
+        in_process: bool = False,
+    ) -> str:
+        """Queue ``fn(*args, progress=...)`` in the pool and return its job ID.
+
+        ``on_complete`` runs in this process, on a completion thread, on a successful result, and what it
+        returns is kept as the result. ``on_finish`` runs after it however the job ended, even if it was
+        cancelled before it started. With ``in_process``, ``fn`` runs on a coordinator thread of this
+        process rather than in the pool.
+        """
+        with self._lock:
+            self._evict_expired()
+            active = sum(1 for job in self._jobs.values() if job['status'] not in FINISHED_STATES)
+            if active >= self.max_active_jobs:
+                raise JobLimitReached(f"{active} reconciliation job(s) already running")
+
+            self._start_pool()
+            job_id = uuid.uuid4().hex
+            cancel_event = self._manager.Event()
+            progress = JobProgress(job_id, self._shared_state, cancel_event)
+            job = {
+                'status': QUEUED,
+                'created_at': time.time(),
+                'finished_at': None,
+                'error': None,
+                'result': None,
+                'stages': [],
+                'cancel_event': cancel_event,
+                'on_complete': on_complete,
+                'on_finish': on_finish,
+                # Set once the job's record is final, after its completion hook
+                'done': Future(),
+            }
+            self._jobs[job_id] = job
+            executor = self._coordinators if in_process else self._executor
+            job['future'] = executor.submit(_run_job, fn, args, progress)
+
+        job['future'].add_done_callback(lambda future: self._hand_over(job_id, future))
+        return job_id
+
+    def add_completed(self, result: Any, stages: List[Dict[str, Any]], rows_total: int = 0) -> str:
+        """Register a result computed without the pool, such as a cached one, as a completed job and return its ID"""
+        done = Future()
+        done.set_result(None)
+        with self._lock:
+            self._evict_expired()
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            self._jobs[job_id] = {
+                'status': COMPLETED,
+                'created_at': now,
+                'finished_at': now,
+                'error': None,
+                'result': result,
+                'stages': stages,
+                'progress': {'phase': 'cached', 'rows_processed': rows_total, 'rows_total': rows_total},
+                'cancel_event': None,
+                'on_complete': None,
+                'on_finish': None,
+                'future': done,
+                'done': done,
+            }
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Public view of a job: state, phase and row counts"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            progress = self._shared_state.get(job_id, {}) if job['status'] not in FINISHED_STATES else job.get('progress', {})
+            if job['status'] == QUEUED and progress:
+                job['status'] = RUNNING
+            return {
+                'job_id': job_id,
+                'status': job['status'],
+                'phase': progress.get('phase'),
+                'rows_processed': progress.get('rows_processed', 0),
+                'rows_total': progress.get('rows_total', 0),
+                'created_at': job['created_at'],
+                'finished_at': job['finished_at'],
+                'error': job['error'],
+            }
+
+    def result(self, job_id: str) -> Any:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job['result'] if job is not None else None
+
+    def timings(self, job_id: str) -> List[Dict[str, Any]]:
+        """Timed stages of a completed job, in the order they ran"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job['stages'] if job is not None else []
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job outright or ask a running one to stop at its next phase"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in FINISHED_STATES:
+                return False
+            job['cancel_event'].set()
+        job['future'].cancel()
+        return True
+
+    async def wait(self, job_id: str) -> Dict[str, Any]:
+        """Wait for a job to finish without blocking the event loop"""
+        with self._lock:
+            done = self._jobs[job_id]['done']
+        await asyncio.wrap_future(done)
+        return self.status(job_id)
+
+    def start(self) -> None:
+        """Start the pool ahead of the first job"""
+        with self._lock:
+            self._start_pool()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._coordinators is not None:
+            self._coordinators.shutdown(wait=False, cancel_futures=True)
+        if self._completions is not None:
+            self._completions.shutdown(wait=False)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+    def _start_pool(self) -> None:
+        # Created on first use so importing the API doesn't fork worker processes
+        if self._executor is None:
+            self._manager = multiprocessing.Manager()
+            self._shared_state = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._coordinators = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job-coordinator')
+            self._completions = ThreadPoolExecutor(max_workers=self.completion_workers, thread_name_prefix='job-completion')
+
+    def _hand_over(self, job_id: str, future: Future) -> None:
+        """Done callback of a pool future: queue its completion instead of running it on the pool's thread"""
+        try:
+            self._completions.submit(self._finish, job_id, future)
+        except RuntimeError:
+            # The completion threads are shut down, so finish here rather than leave the job unfinished
+            self._finish(job_id, future)
+
+    def _finish(self, job_id: str, future: Future) -> None:
+        """Record how a job ended; runs on a completion thread once the pool is done with it"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            on_complete = job['on_complete']
+            on_finish = job['on_finish']
+
+        # The completion hook may do I/O, so it runs before the lock is taken again
+        status, result, stages, error = COMPLETED, None, [], None
+        try:
+            result, stages = future.result()
+            observe_stages(stages)
+            if on_complete is not None:
+                result = on_complete(result)
+        except (CancelledError, JobCancelled):
+            status = CANCELLED
+        except Exception as e:
+            status, error = FAILED, str(e)
+        if on_finish is not None:
+            try:
+                on_finish()
+            except Exception:
+                logger.exception("Could not release the resources of job %s", job_id)
+
+        try:
+            progress = self._shared_state.pop(job_id, {})
+        except Exception:
+            # The manager process is gone when the server is shutting down
+            progress = {}
+        with self._lock:
+            job['finished_at'] = time.time()
+            job['progress'] = progress
+            job['result'] = result
+            job['stages'] = stages
+            job['status'] = status
+            job['error'] = error
+        job['done'].set_result(None)
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - self.result_ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] is not None and job['finished_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
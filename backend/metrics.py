@@ -0,0 +1,155 @@
+"""Per-stage wall time, row counts and peak allocation of uploads and reconciliations.
+
+Stages are timed by StageTimings, a progress callback that starts a new stage whenever it is told about a new
+phase, so every function that already reports progress is instrumented without further changes. Finished
+stages are collected into Prometheus histograms served by the /metrics endpoint.
+"""
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+# Set METRICS_ENABLED=0 to skip stage timing altogether
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+
+# tracemalloc slows allocation-heavy code down several times, so peak allocation is only measured when asked for
+METRICS_TRACE_MEMORY = os.environ.get('METRICS_TRACE_MEMORY', '0') == '1'
+
+# Starlette appends the charset to text media types
+METRICS_MEDIA_TYPE = 'text/plain; version=0.0.4'
+
+# Histogram bucket upper bounds
+SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+ROWS_BUCKETS = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+# 1 MiB to 4 GiB
+BYTES_BUCKETS = [2 ** power for power in range(20, 33, 2)]
+
+
+class StageTimings:
+    """Progress callback that times each phase it is told about.
+
+    A stage lasts from the first call with its phase until the next phase starts or finish() is called, and
+    its row count is the largest count reported for it. Every call is passed on to ``forward`` first, so this
+    can wrap a job's own progress callback.
+    """
+
+    def __init__(self, forward: Optional[Callable] = None):
+        self.forward = forward
+        self.stages: List[Dict[str, Any]] = []
+        self._current: Optional[Dict[str, Any]] = None
+        if METRICS_ENABLED and METRICS_TRACE_MEMORY and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def __call__(self, phase: str, rows_processed: int = 0, rows_total: int = 0) -> None:
+        now = time.perf_counter()
+        if self.forward is not None:
+            self.forward(phase, rows_processed, rows_total)
+        if not METRICS_ENABLED:
+            return
+        rows = max(int(rows_processed), int(rows_total))
+        if self._current is not None and self._current['stage'] == phase:
+            self._current['rows'] = max(self._current['rows'], rows)
+            return
+        self._close(now)
+        self._current = {'stage': phase, 'rows': rows, 'started': now}
+        if METRICS_TRACE_MEMORY:
+            self._current['allocated'] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Close the current stage and return every finished one"""
+        self._close(time.perf_counter())
+        return self.stages
+
+    def _close(self, now: float) -> None:
+        stage = self._current
+        if stage is None:
+            return
+        peak_bytes = None
+        if METRICS_TRACE_MEMORY:
+            peak_bytes = max(tracemalloc.get_traced_memory()[1] - stage['allocated'], 0)
+        self.stages.append({
+            'stage': stage['stage'],
+            'seconds': round(now - stage['started'], 6),
+            'rows': stage['rows'],
+            'peak_bytes': peak_bytes,
+        })
+        self._current = None
+
+
+def timings_block(stages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The ``timings`` entry of a response"""
+    return {'stages': stages, 'total_seconds': round(sum(stage['seconds'] for stage in stages), 6)}
+
+
+def server_timing(stages: List[Dict[str, Any]]) -> str:
+    """Server-Timing header value of the stages, in milliseconds"""
+    return ', '.join(
+        f'stage{position};desc="{stage["stage"]}";dur={stage["seconds"] * 1000:.1f}'
+        for position, stage in enumerate(stages)
+    )
+
+
+class Histogram:
+    """Prometheus histogram with a ``stage`` label"""
+
+    def __init__(self, name: str, documentation: str, buckets: List[float]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # Per stage: the count in each bucket, then the sum and the count of all observations
+        self._series: Dict[str, Dict[str, Any]] = {}
+
+    def observe(self, stage: str, value: float) -> None:
+        series = self._series.setdefault(stage, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                series['buckets'][position] += 1
+                break
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for stage, series in sorted(self._series.items()):
+            label = f'stage="{_escape_label(stage)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['buckets']):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+            lines.append(f'{self.name}_sum{{{label}}} {series["sum"]}')
+            lines.append(f'{self.name}_count{{{label}}} {series["count"]}')
+        return lines
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+STAGE_SECONDS = Histogram('reconciliation_stage_seconds', 'Wall time of each upload and reconciliation stage.', SECONDS_BUCKETS)
+STAGE_ROWS = Histogram('reconciliation_stage_rows', 'Rows handled by each upload and reconciliation stage.', ROWS_BUCKETS)
+STAGE_PEAK_BYTES = Histogram(
+    'reconciliation_stage_peak_bytes', 'Peak traced allocation of each stage above what was allocated when it started.',
+    BYTES_BUCKETS,
+)
+
+# Stages are observed from the event loop, the thread pool and job completion callbacks
+_histogram_lock = threading.Lock()
+
+
+def observe_stages(stages: List[Dict[str, Any]]) -> None:
+    with _histogram_lock:
+        for stage in stages:
+            STAGE_SECONDS.observe(stage['stage'], stage['seconds'])
+            STAGE_ROWS.observe(stage['stage'], stage['rows'])
+            if stage['peak_bytes'] is not None:
+                STAGE_PEAK_BYTES.observe(stage['stage'], stage['peak_bytes'])
+
+
+def render_metrics() -> str:
+    """Every histogram in the Prometheus text exposition format"""
+    with _histogram_lock:
+        lines = STAGE_SECONDS.render() + STAGE_ROWS.render() + STAGE_PEAK_BYTES.render()
+    return '\n'.join(lines) + '\n'
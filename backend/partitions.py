@@ -0,0 +1,202 @@
+"""GSTIN hash partitioning of reconciliation inputs and Arrow transport between worker processes"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+def partition_count(rows: int) -> int:
+    """Partitions to split ``rows`` input rows into, from the RECONCILE_PARTITION* environment variables.
+
+    1 means reconcile in this process: partitioning is off by default and skipped for inputs below
+    RECONCILE_PARTITION_MIN_ROWS, where starting workers costs more than it saves.
+    """
+    partitions = int(os.environ.get('RECONCILE_PARTITIONS', 1))
+    min_rows = int(os.environ.get('RECONCILE_PARTITION_MIN_ROWS', 200_000))
+    return partitions if partitions > 1 and rows >= min_rows else 1
+
+
+def partition_workers() -> int:
+    """Worker processes partitions are reconciled in: RECONCILE_PARTITION_WORKERS, at most the core count"""
+    cores = os.cpu_count() or 1
+    return max(1, min(int(os.environ.get('RECONCILE_PARTITION_WORKERS', 0)) or cores, cores))
+
+
+# The process pool shared by every partitioned run of this process, and the process that started it
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def partition_pool() -> ProcessPoolExecutor:
+    """The pool partitions are reconciled in, started on first use and kept for later runs.
+
+    Concurrent runs queue their partitions on the same partition_workers() processes instead of each
+    starting a pool. A forked child does not inherit the parent's pool and starts its own.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=partition_workers())
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def discard_partition_pool(pool: Optional[ProcessPoolExecutor] = None) -> None:
+    """Shut the shared pool down, or only ``pool`` if it is still the shared one, so the next run starts afresh"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid() or (pool is not None and pool is not _pool):
+            return
+        stale, _pool = _pool, None
+    stale.shutdown(wait=False, cancel_futures=True)
+
+
+def partition_ids(gstins: pd.Series, partitions: int) -> np.ndarray:
+    """Partition of each row from a hash of its GSTIN, so one GSTIN never spans two partitions.
+
+    GSTINs are already stripped at upload; categorical ones hash like the same text.
+    """
+    hashes = pd.util.hash_pandas_object(gstins, index=False).to_numpy()
+    return (hashes % np.uint64(partitions)).astype(np.int64)
+
+
+class SharedPartitions:
+    """Row partitions of one DataFrame, each an Arrow IPC stream, packed into one shared memory block.
+
+    Workers attach by name and read only their partition, so the frame is never pickled through a pipe.
+    Rows keep their original order within a partition.
+    """
+
+    def __init__(self, frame: pd.DataFrame, ids: np.ndarray, partitions: int):
+        order = np.argsort(ids, kind='stable')
+        bounds = np.searchsorted(ids[order], np.arange(partitions + 1))
+        table = pa.Table.from_pandas(frame.iloc[order], preserve_index=False)
+        streams = [_arrow_stream(table.slice(start, end - start)) for start, end in zip(bounds[:-1], bounds[1:])]
+
+        self.extents: List[Tuple[int, int]] = []
+        self._memory = shared_memory.SharedMemory(create=True, size=max(1, sum(stream.size for stream in streams)))
+        self.name = self._memory.name
+        try:
+            offset = 0
+            for stream in streams:
+                self._memory.buf[offset:offset + stream.size] = memoryview(stream).cast('B')
+                self.extents.append((offset, stream.size))
+                offset += stream.size
+        except BaseException:
+            self.close()
+            raise
+
+    @classmethod
+    def whole(cls, frame: pd.DataFrame) -> "SharedPartitions":
+        """The entire frame as partition 0, to hand a worker process without pickling it"""
+        return cls(frame, np.zeros(len(frame), dtype=np.int64), 1)
+
+    def handle(self, partition: int) -> Tuple[str, int, int]:
+        """What a worker needs to read one partition with read_shared_partition"""
+        offset, size = self.extents[partition]
+        return self.name, offset, size
+
+    def close(self) -> None:
+        self._memory.close()
+        self._memory.unlink()
+
+    def __enter__(self) -> "SharedPartitions":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def read_shared_partition(handle: Tuple[str, int, int]) -> pd.DataFrame:
+    """Load one partition written by SharedPartitions"""
+    name, offset, size = handle
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        # Copied out so no view into the block outlives this function
+        data = memory.buf[offset:offset + size].tobytes()
+    finally:
+        memory.close()
+    return frame_from_arrow(data)
+
+
+def frame_to_arrow(frame: pd.DataFrame) -> bytes:
+    """Serialize a frame as an Arrow IPC stream, dropping its index"""
+    return _arrow_stream(pa.Table.from_pandas(frame, preserve_index=False)).to_pybytes()
+
+
+def frame_from_arrow(data: bytes) -> pd.DataFrame:
+    """Read a frame written by frame_to_arrow or SharedPartitions.
+
+    Arrow has a single null, so missing values in object columns come back as NaN, as pandas produced them.
+    """
+    with pa.ipc.open_stream(pa.py_buffer(data)) as reader:
+        return _to_pandas(reader.read_all())
+
+
+def _to_pandas(table: pa.Table) -> pd.DataFrame:
+    frame = table.to_pandas()
+    for column in frame.columns[(frame.dtypes == object).to_numpy()]:
+        missing = frame[column].isna().to_numpy()
+        if missing.any():
+            values = frame[column].to_numpy(copy=True)
+            values[missing] = np.nan
+            frame[column] = values
+    return frame
+
+
+def _arrow_stream(table: pa.Table) -> pa.Buffer:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+class PartitionSpill:
+    """Row partitions of a frame that arrives in chunks, appended to one Arrow IPC stream file each.
+
+    Every chunk is converted to ``schema``, so a column that happens to be all missing in one chunk still
+    has the type of the others. Read a partition back once writing is closed.
+    """
+
+    def __init__(self, directory: str, partitions: int, schema: pa.Schema):
+        os.makedirs(directory, exist_ok=True)
+        self.schema = schema
+        self.paths = [os.path.join(directory, f'{partition}.arrow') for partition in range(partitions)]
+        self.sizes = [0] * partitions
+        self._writers = []
+        try:
+            for path in self.paths:
+                sink = pa.OSFile(path, 'wb')
+                self._writers.append((sink, pa.ipc.new_stream(sink, schema)))
+        except BaseException:
+            self.close()
+            raise
+
+    def write(self, frame: pd.DataFrame, ids: np.ndarray) -> None:
+        order = np.argsort(ids, kind='stable')
+        bounds = np.searchsorted(ids[order], np.arange(len(self.paths) + 1))
+        table = pa.Table.from_pandas(frame.iloc[order], schema=self.schema, preserve_index=False)
+        for partition, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            if end > start:
+                self._writers[partition][1].write_table(table.slice(start, end - start))
+
+    def close(self) -> None:
+        for sink, writer in self._writers:
+            writer.close()
+            sink.close()
+        self._writers = []
+        self.sizes = [os.path.getsize(path) if os.path.exists(path) else 0 for path in self.paths]
+
+    def read(self, partitions: List[int]) -> pd.DataFrame:
+        """The rows of some partitions, one partition after the other"""
+        tables = []
+        for partition in partitions:
+            with pa.OSFile(self.paths[partition], 'rb') as source, pa.ipc.open_stream(source) as reader:
+                tables.append(reader.read_all())
+        return _to_pandas(pa.concat_tables(tables) if tables else self.schema.empty_table())
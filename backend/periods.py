@@ -0,0 +1,129 @@
+"""Filing periods of uploaded invoices, and the periods a scoped reconciliation reads.
+
+Every uploaded row belongs to one period, a calendar month written 'YYYY-MM': its Filing_Period where the
+upload has one, as GST returns do, otherwise the month of its Invoice_Date, as for AP/AR ledgers. Uploads
+are stored one partition per period, so a reconciliation of a range of periods reads only the partitions
+of that range and of the adjacent months in its spill-over window.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Column added at upload holding each row's period
+PERIOD_COLUMN = 'Period'
+FILING_PERIOD_FIELD = 'Filing_Period'
+
+# Period of rows with neither a Filing_Period nor an Invoice_Date that parses; only unscoped runs read them
+UNKNOWN_PERIOD = 'unknown'
+
+# Layouts of Filing_Period, most common first: 'Jul-2025' as in GST exports, the 'MMYYYY' of GST returns
+FILING_PERIOD_FORMATS = ['%b-%Y', '%m%Y', '%Y-%m', '%m-%Y', '%B-%Y', '%b %Y', '%B %Y', '%m/%Y', '%b-%y']
+
+# Months either side of a period range whose invoices are read for keys booked in the range
+DEFAULT_SPILLOVER_MONTHS = int(os.environ.get('PERIOD_SPILLOVER_MONTHS', 1))
+MAX_SPILLOVER_MONTHS = 12
+
+
+class PeriodError(ValueError):
+    """Raised when a requested period or period range cannot be read"""
+
+
+def filing_periods(values: pd.Series) -> np.ndarray:
+    """Period of each Filing_Period value, UNKNOWN_PERIOD where it fits none of the layouts.
+
+    Each distinct value is parsed once. Numeric columns are read back as 'MMYYYY' text, since a CSV reader
+    turns '072025' into 72025.
+    """
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    if pd.api.types.is_numeric_dtype(values):
+        text = text.str.replace(r'\.0$', '', regex=True).str.zfill(6)
+
+    months = np.full(len(text), np.datetime64('NaT'), dtype='datetime64[M]')
+    remaining = (text != '').to_numpy()
+    for period_format in FILING_PERIOD_FORMATS:
+        if not remaining.any():
+            break
+        attempt = pd.to_datetime(text[remaining], format=period_format, errors='coerce')
+        parsed = attempt.notna().to_numpy()
+        positions = np.flatnonzero(remaining)[parsed]
+        months[positions] = attempt.to_numpy()[parsed].astype('datetime64[M]')
+        remaining[positions] = False
+
+    labels = _labels(months)
+    return np.where(codes >= 0, labels[codes], UNKNOWN_PERIOD)
+
+
+def invoice_months(dates: pd.Series) -> np.ndarray:
+    """Period of each parsed invoice date, UNKNOWN_PERIOD where it is missing"""
+    return _labels(dates.to_numpy().astype('datetime64[M]'))
+
+
+def parse_period(text: str) -> str:
+    """A requested period as 'YYYY-MM', accepting the Filing_Period layouts"""
+    periods = filing_periods(pd.Series([text], dtype=object))
+    if periods[0] == UNKNOWN_PERIOD:
+        raise PeriodError(f"'{text}' is not a period; use YYYY-MM")
+    return str(periods[0])
+
+
+class PeriodScope:
+    """An inclusive range of periods, open at either end, with the spill-over months around it"""
+
+    def __init__(self, start: Optional[str], end: Optional[str], spillover_months: int):
+        self.start = start
+        self.end = end
+        self.spillover_months = spillover_months
+
+    @classmethod
+    def from_params(
+        cls, period_from: Optional[str], period_to: Optional[str], spillover_months: int
+    ) -> Optional["PeriodScope"]:
+        """Scope of a request's period parameters, or None when it names no period and so reads everything"""
+        if period_from is None and period_to is None:
+            return None
+        start = parse_period(period_from) if period_from is not None else None
+        end = parse_period(period_to) if period_to is not None else None
+        if start is not None and end is not None and start > end:
+            raise PeriodError(f"period_from {start} is after period_to {end}")
+        if not 0 <= spillover_months <= MAX_SPILLOVER_MONTHS:
+            raise PeriodError(f"spillover_months must be between 0 and {MAX_SPILLOVER_MONTHS}")
+        return cls(start, end, spillover_months)
+
+    def spec(self) -> Dict[str, Any]:
+        return {'from': self.start, 'to': self.end, 'spillover_months': self.spillover_months}
+
+    def core(self, periods: List[str]) -> List[str]:
+        """The given periods inside the range"""
+        return [period for period in periods if self._within(period, self.start, self.end)]
+
+    def adjacent(self, periods: List[str]) -> List[str]:
+        """The given periods outside the range but inside its spill-over window"""
+        start = _shift(self.start, -self.spillover_months)
+        end = _shift(self.end, self.spillover_months)
+        return [
+            period for period in periods
+            if self._within(period, start, end) and not self._within(period, self.start, self.end)
+        ]
+
+    @staticmethod
+    def _within(period: str, start: Optional[str], end: Optional[str]) -> bool:
+        # 'YYYY-MM' labels order like the months they name
+        if period == UNKNOWN_PERIOD:
+            return False
+        return (start is None or period >= start) and (end is None or period <= end)
+
+
+def _shift(period: Optional[str], months: int) -> Optional[str]:
+    if period is None:
+        return None
+    return str(np.datetime64(period, 'M') + months)
+
+
+def _labels(months: np.ndarray) -> np.ndarray:
+    labels = np.full(len(months), UNKNOWN_PERIOD, dtype=object)
+    known = ~np.isnat(months)
+    labels[known] = np.datetime_as_string(months[known], unit='M')
+    return labels
@@ -0,0 +1,306 @@
+"""Content-addressed cache of parsed uploads and reconciliation results"""
+import hashlib
+import json
+import logging
+import os
+import stat
+import struct
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from partitions import frame_from_arrow
+
+logger = logging.getLogger(__name__)
+
+# Part of every key; bump it when the cached values change shape so older disk entries are never read
+CACHE_FORMAT_VERSION = 6
+
+# Bytes read at a time while fingerprinting an upload
+HASH_BLOCK_BYTES = 1024 * 1024
+
+CACHE_KINDS = ('upload', 'result')
+
+# Suffix of the entry files in the cache directory
+ENTRY_SUFFIX = '.entry'
+
+# Entry files start with the byte length of their JSON manifest
+MANIFEST_LENGTH = struct.Struct('<Q')
+
+
+def file_sha256(source: BinaryIO) -> str:
+    """SHA-256 of a file object's whole content, leaving it rewound"""
+    digest = hashlib.sha256()
+    source.seek(0)
+    for block in iter(lambda: source.read(HASH_BLOCK_BYTES), b''):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def cache_key(kind: str, parts: Dict[str, Any]) -> str:
+    """Stable key of a cache entry from everything its value depends on"""
+    text = json.dumps({'kind': kind, 'version': CACHE_FORMAT_VERSION, **parts}, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Two-tier cache keyed by content hash: an in-memory LRU and an optional directory of entry files.
+
+    The memory tier is bounded by entry count and by the estimated size of its values. With a cache
+    directory every entry is also written to ``<cache_dir>/<key>.entry``, so it survives eviction from
+    memory, restarts and other uvicorn workers pointed at the same directory; the least recently used
+    files are removed once the directory outgrows its budget. An entry file holds plain data only: a JSON
+    manifest followed by the entry's frames as Arrow IPC streams, so reading one never runs code. The
+    directory must belong to this user and be closed to everyone else. Values are shared, never copied,
+    so callers must not modify what they get back.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 16,
+        memory_budget_bytes: int = 512 * 1024 * 1024,
+        cache_dir: Optional[str] = None,
+        disk_budget_bytes: int = 2048 * 1024 * 1024,
+    ):
+        self.max_entries = max_entries
+        self.memory_budget_bytes = memory_budget_bytes
+        self.cache_dir = cache_dir
+        self.disk_budget_bytes = disk_budget_bytes
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._counts = {kind: {'memory_hits': 0, 'disk_hits': 0, 'misses': 0} for kind in CACHE_KINDS}
+        self._lock = threading.Lock()
+
+        if cache_dir:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            _check_private_directory(cache_dir)
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """Build a cache from the RESULT_CACHE_* environment variables; without RESULT_CACHE_DIR it stays in memory"""
+        return cls(
+            max_entries=int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 16)),
+            memory_budget_bytes=int(float(os.environ.get('RESULT_CACHE_MEMORY_MB', 512)) * 1024 * 1024),
+            cache_dir=os.environ.get('RESULT_CACHE_DIR') or None,
+            disk_budget_bytes=int(float(os.environ.get('RESULT_CACHE_DISK_MB', 2048)) * 1024 * 1024),
+        )
+
+    def get(self, kind: str, key: str) -> Optional[Any]:
+        """The cached value, promoted to memory when it was only on disk, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counts[kind]['memory_hits'] += 1
+                return entry['value']
+
+        value = self._read(key)
+        with self._lock:
+            self._counts[kind]['misses' if value is None else 'disk_hits'] += 1
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def put(self, kind: str, key: str, value: Any) -> None:
+        self._remember(key, value)
+        self._write(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {kind: dict(counts) for kind, counts in self._counts.items()}
+            stats = {
+                'entries': len(self._entries),
+                'memory_bytes': self._memory_bytes,
+                'memory_budget_bytes': self.memory_budget_bytes,
+            }
+        for kind_counts in counts.values():
+            lookups = sum(kind_counts.values())
+            kind_counts['hit_rate'] = round((lookups - kind_counts['misses']) / lookups, 4) if lookups else 0.0
+        stats.update(counts)
+        if self.cache_dir:
+            files = self._disk_files()
+            stats['disk_entries'] = len(files)
+            stats['disk_bytes'] = sum(size for _, size, _ in files)
+            stats['disk_budget_bytes'] = self.disk_budget_bytes
+        return stats
+
+    def _remember(self, key: str, value: Any) -> None:
+        size = _size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self._memory_bytes -= self._entries.pop(key)['size']
+            if self.max_entries <= 0 or size > self.memory_budget_bytes:
+                return
+            self._entries[key] = {'value': value, 'size': size}
+            self._memory_bytes += size
+            # Least recently used entries go first
+            while len(self._entries) > self.max_entries or self._memory_bytes > self.memory_budget_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._memory_bytes -= evicted['size']
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}{ENTRY_SUFFIX}')
+
+    def _read(self, key: str) -> Optional[Any]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as source:
+                value = decode_entry(source.read())
+            # The modification time orders files for eviction, so a hit makes the file recent again
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.exception("Could not read cache entry %s, dropping it", key)
+            self._remove(path)
+            return None
+        return value
+
+    def _write(self, key: str, value: Any) -> None:
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        # Write then rename so other workers never read a half-written file
+        temporary_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            data = encode_entry(value)
+            with open(temporary_path, 'wb') as target:
+                target.write(data)
+            os.replace(temporary_path, path)
+        except Exception:
+            logger.exception("Could not write cache entry %s, keeping it in memory only", key)
+            self._remove(temporary_path)
+            return
+        self._evict_disk()
+
+    def _disk_files(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(ENTRY_SUFFIX):
+                continue
+            try:
+                status = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            files.append((status.st_mtime, status.st_size, name))
+        return files
+
+    def _evict_disk(self) -> None:
+        files = sorted(self._disk_files())
+        disk_bytes = sum(size for _, size, _ in files)
+        for _, size, name in files:
+            if disk_bytes <= self.disk_budget_bytes:
+                break
+            self._remove(os.path.join(self.cache_dir, name))
+            disk_bytes -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _check_private_directory(path: str) -> None:
+    """Refuse a cache directory that is a symlink, belongs to another user or is open to group or others"""
+    status = os.lstat(path)
+    if not stat.S_ISDIR(status.st_mode):
+        raise PermissionError(f"Cache directory {path} is not a directory")
+    if hasattr(os, 'getuid') and status.st_uid != os.getuid():
+        raise PermissionError(f"Cache directory {path} belongs to another user")
+    if status.st_mode & 0o077:
+        raise PermissionError(f"Cache directory {path} must not be accessible to group or others (chmod 700)")
+
+
+def encode_entry(value: Any) -> bytes:
+    """Serialize a cached value: nested dicts and lists of JSON values, numpy scalars and DataFrames"""
+    frames: List[bytes] = []
+    manifest = {'value': _to_manifest(value, frames), 'frames': [len(frame) for frame in frames]}
+    text = json.dumps(manifest, default=_json_scalar).encode('utf-8')
+    return b''.join([MANIFEST_LENGTH.pack(len(text)), text] + frames)
+
+
+def decode_entry(data: bytes) -> Any:
+    """Read a value written by encode_entry"""
+    (length,) = MANIFEST_LENGTH.unpack_from(data)
+    start = MANIFEST_LENGTH.size
+    manifest = json.loads(data[start:start + length])
+    buffer = memoryview(data)
+    frames, offset = [], start + length
+    for size in manifest['frames']:
+        frames.append(buffer[offset:offset + size])
+        offset += size
+    return _from_manifest(manifest['value'], frames)
+
+
+def _to_manifest(value: Any, frames: List[bytes]) -> Any:
+    if isinstance(value, pd.DataFrame):
+        frames.append(_frame_bytes(value))
+        return {
+            'frame': len(frames) - 1,
+            'attrs': value.attrs,
+            # Arrow reads every string column back as python-backed strings
+            'string_storage': {
+                str(column): dtype.storage for column, dtype in value.dtypes.items() if isinstance(dtype, pd.StringDtype)
+            },
+        }
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise TypeError("Cached dicts must have string keys")
+        return {'dict': {key: _to_manifest(item, frames) for key, item in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'list': [_to_manifest(item, frames) for item in value]}
+    return {'value': value}
+
+
+def _from_manifest(node: Dict[str, Any], frames: List[memoryview]) -> Any:
+    if 'frame' in node:
+        frame = frame_from_arrow(frames[node['frame']])
+        for column, storage in node['string_storage'].items():
+            frame[column] = frame[column].astype(pd.StringDtype(storage))
+        frame.attrs.update(node['attrs'])
+        return frame
+    if 'dict' in node:
+        return {key: _from_manifest(item, frames) for key, item in node['dict'].items()}
+    if 'list' in node:
+        return [_from_manifest(item, frames) for item in node['list']]
+    return node['value']
+
+
+def _frame_bytes(frame: pd.DataFrame) -> bytes:
+    table = pa.Table.from_pandas(frame)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _json_scalar(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot cache a value of type {type(value).__name__}")
+
+
+def _size_of(value: Any) -> int:
+    """Estimated memory held by a cached value"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_size_of(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_size_of(item) for item in value)
+    return sys.getsizeof(value)
@@ -0,0 +1,151 @@
+"""Pairing of leftover GST invoices with several AP/AR entries whose amounts add up to them.
+
+A GST invoice the ledger books as two partial entries, or settles with credit notes netted against it, is
+left over on both sides by key matching. This pass searches each GSTIN's leftovers for the smallest
+combination of AP/AR entries, dated near the GST invoice, whose total equals its amount within tolerance.
+
+The search is bounded so a GSTIN with thousands of open items stays cheap: only AP/AR entries inside the
+date window are candidates, only the nearest of them by date are combined, and combinations that cannot
+reach the amount are skipped from the sorted amounts before any of them is summed.
+"""
+from functools import lru_cache
+from itertools import combinations
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+# Fewest and most AP/AR entries combined into one GST invoice
+SPLIT_MIN_PARTS = 2
+SPLIT_MAX_PARTS = 4
+
+# Days an AP/AR entry may be dated from the GST invoice it is part of
+SPLIT_DATE_WINDOW_DAYS = 31
+
+# Candidate entries combined per GST invoice, nearest by date first; this bounds the combinations summed
+# per invoice by the sum of C(SPLIT_MAX_CANDIDATES, parts) over the part counts
+SPLIT_MAX_CANDIDATES = 24
+
+
+def split_match(gst: pd.DataFrame, apar: pd.DataFrame, tolerance: Any = 0.0) -> pd.DataFrame:
+    """Combine leftover AP/AR rows into leftover GST rows of the same GSTIN whose amount they add up to.
+
+    ``gst`` needs GSTIN, GST_Amount and GST_Date_Parsed; ``apar`` needs GSTIN, APAR_Amount and
+    APAR_Date_Parsed. ``tolerance`` is in rupees, one value or one per GST row. GST rows are served in
+    order and every AP/AR row is used at most once. Returns one row per AP/AR part with the positions of
+    both rows and the number of parts, ordered by GST position.
+    """
+    if len(gst) == 0 or len(apar) == 0:
+        return no_split_matches()
+
+    gst_codes, apar_codes = _shared_codes(gst['GSTIN'].to_numpy(), apar['GSTIN'].to_numpy())
+    gst_paise, gst_known = _paise(gst['GST_Amount'].to_numpy())
+    apar_paise, apar_known = _paise(apar['APAR_Amount'].to_numpy())
+    gst_days, gst_dated = _days(gst['GST_Date_Parsed'].to_numpy())
+    apar_days, apar_dated = _days(apar['APAR_Date_Parsed'].to_numpy())
+    tolerance_paise = np.round(np.broadcast_to(np.asarray(tolerance, dtype=float), len(gst)) * 100).astype(np.int64)
+
+    # Rows without an amount or a date can be neither a target nor a part
+    gst_open = gst_known & gst_dated & (gst_paise != 0) & (gst_codes >= 0)
+    apar_open = apar_known & apar_dated & (apar_codes >= 0)
+
+    found = []
+    apar_groups = _rows_by_code(apar_codes, apar_open)
+    for code, gst_positions in _rows_by_code(gst_codes, gst_open).items():
+        if code not in apar_groups:
+            continue
+        # AP/AR rows by date, so each date window is one slice
+        apar_positions = apar_groups[code]
+        apar_positions = apar_positions[np.argsort(apar_days[apar_positions], kind='stable')]
+        found.extend(_match_gstin(
+            gst_positions, gst_paise, gst_days, tolerance_paise, apar_positions, apar_paise[apar_positions],
+            apar_days[apar_positions],
+        ))
+
+    if not found:
+        return no_split_matches()
+    gst_position, apar_position, parts = (np.array(column, dtype=np.int64) for column in zip(*found))
+    matches = pd.DataFrame({'gst_position': gst_position, 'apar_position': apar_position, 'parts': parts})
+    return matches.sort_values('gst_position', kind='stable').reset_index(drop=True)
+
+
+def no_split_matches() -> pd.DataFrame:
+    """Empty result with the columns split_match returns"""
+    return pd.DataFrame({
+        'gst_position': np.array([], dtype=np.int64),
+        'apar_position': np.array([], dtype=np.int64),
+        'parts': np.array([], dtype=np.int64),
+    })
+
+
+def _match_gstin(gst_positions, gst_paise, gst_days, tolerance_paise, apar_positions, apar_paise, apar_days):
+    """Split matches of one GSTIN as (GST position, AP/AR position, parts) tuples"""
+    found = []
+    available = np.ones(len(apar_positions), dtype=bool)
+    for position in gst_positions:
+        target = gst_paise[position]
+        tolerance = tolerance_paise[position]
+        day = gst_days[position]
+        start, end = np.searchsorted(apar_days, [day - SPLIT_DATE_WINDOW_DAYS, day + SPLIT_DATE_WINDOW_DAYS + 1])
+        window = start + np.flatnonzero(available[start:end])
+        amounts = apar_paise[window]
+        # Without credit notes no single part can exceed the target
+        if len(amounts) and amounts.min() >= 0 and target > 0:
+            window = window[amounts <= target + tolerance]
+        if len(window) < SPLIT_MIN_PARTS:
+            continue
+
+        nearest = window[np.argsort(np.abs(apar_days[window] - day), kind='stable')[:SPLIT_MAX_CANDIDATES]]
+        parts = _cheapest_combination(apar_paise[nearest], target, tolerance)
+        if parts is None:
+            continue
+        chosen = np.sort(nearest[parts])
+        available[chosen] = False
+        found.extend((position, apar_positions[index], len(chosen)) for index in chosen)
+    return found
+
+
+def _cheapest_combination(amounts: np.ndarray, target: int, tolerance: int):
+    """Indices of the fewest ``amounts`` whose total is within ``tolerance`` of ``target``, closest total first"""
+    order = np.argsort(amounts, kind='stable')
+    ordered = amounts[order]
+    for parts in range(SPLIT_MIN_PARTS, min(SPLIT_MAX_PARTS, len(ordered)) + 1):
+        # The smallest and largest totals of this many parts bound every combination of them
+        if ordered[:parts].sum() > target + tolerance or ordered[-parts:].sum() < target - tolerance:
+            continue
+        indices = _combinations(len(ordered), parts)
+        gaps = np.abs(ordered[indices].sum(axis=1) - target)
+        best = int(np.argmin(gaps))
+        if gaps[best] <= tolerance:
+            return order[indices[best]]
+    return None
+
+
+@lru_cache(maxsize=None)
+def _combinations(candidates: int, parts: int) -> np.ndarray:
+    return np.array(list(combinations(range(candidates), parts)), dtype=np.int64).reshape(-1, parts)
+
+
+def _rows_by_code(codes: np.ndarray, selected: np.ndarray) -> Dict[int, np.ndarray]:
+    """Positions of the selected rows of each code, in position order"""
+    rows = np.flatnonzero(selected)
+    rows = rows[np.argsort(codes[rows], kind='stable')]
+    groups = np.split(rows, np.flatnonzero(np.diff(codes[rows])) + 1)
+    return {int(codes[group[0]]): group for group in groups if len(group)}
+
+
+def _shared_codes(gst_values: np.ndarray, apar_values: np.ndarray):
+    """GSTIN codes shared by both sides, -1 where missing"""
+    codes, _ = pd.factorize(np.concatenate([gst_values.astype(object), apar_values.astype(object)]))
+    return codes[:len(gst_values)], codes[len(gst_values):]
+
+
+def _paise(amounts: np.ndarray):
+    known = np.isfinite(amounts)
+    return np.where(known, np.round(np.where(known, amounts, 0) * 100), 0).astype(np.int64), known
+
+
+def _days(dates: np.ndarray):
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    dated = ~np.isnat(dates)
+    return np.where(dated, dates, np.datetime64(0, 'D')).astype(np.int64), dated
@@ -0,0 +1,153 @@
+"""Tax-component checks of invoices, packed into one bitmask per invoice.
+
+Each side's Taxable_Value, CGST, SGST, IGST and Total_Tax form a matrix with a column per component. The
+checks compare whole columns of those matrices at once, so the cost per invoice is a handful of vectorized
+comparisons however many invoices there are. A paired invoice gets the bits of both sides plus one bit per
+component the two sides disagree on:
+
+    bits 0-4    the component differs between GST and AP/AR (TAX_COMPONENTS order)
+    bits 5-9    a GST-side consistency check fails (SIDE_CHECKS order)
+    bits 10-14  an AP/AR-side consistency check fails (SIDE_CHECKS order)
+
+Missing components are never flagged: a check only runs where every value it reads is present.
+"""
+import re
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Upload columns holding the tax split of an invoice, in bit order
+TAX_COMPONENTS = ['Taxable_Value', 'CGST_Amount', 'SGST_Amount', 'IGST_Amount', 'Total_Tax']
+PLACE_OF_SUPPLY_FIELD = 'Place_of_Supply'
+TAX_FIELDS = TAX_COMPONENTS + [PLACE_OF_SUPPLY_FIELD]
+
+# Column holding each invoice's bitmask
+TAX_CHECK_COLUMN = 'Tax_Checks'
+
+# Paise two tax amounts may differ by, since returns round tax to the rupee
+TAX_TOLERANCE_PAISE = 100
+
+# Consistency checks of one side's split, in bit order:
+#   cgst_sgst_unequal       CGST and SGST are always levied in equal halves
+#   value_not_taxable_plus_tax  Taxable_Value plus Total_Tax is not the invoice value
+#   tax_not_sum_of_components   CGST plus SGST plus IGST is not Total_Tax
+#   igst_with_cgst_sgst     IGST is charged together with CGST or SGST
+#   supply_type_mismatch    IGST on a supply within the supplier's state, or CGST/SGST on one across states
+SIDE_CHECKS = [
+    'cgst_sgst_unequal', 'value_not_taxable_plus_tax', 'tax_not_sum_of_components', 'igst_with_cgst_sgst',
+    'supply_type_mismatch',
+]
+
+# First bit of each side's consistency checks
+SIDE_CHECK_SHIFT = {'GST': len(TAX_COMPONENTS), 'APAR': len(TAX_COMPONENTS) + len(SIDE_CHECKS)}
+
+# Name of every bit, lowest first
+TAX_CHECKS = (
+    [f'{component.lower()}_differs' for component in TAX_COMPONENTS]
+    + [f'gst_{check}' for check in SIDE_CHECKS]
+    + [f'apar_{check}' for check in SIDE_CHECKS]
+)
+
+# GST state codes, the first two digits of a GSTIN, by the state names Place_of_Supply uses
+STATE_CODES = {
+    'jammu and kashmir': '01', 'himachal pradesh': '02', 'punjab': '03', 'chandigarh': '04', 'uttarakhand': '05',
+    'haryana': '06', 'delhi': '07', 'rajasthan': '08', 'uttar pradesh': '09', 'bihar': '10', 'sikkim': '11',
+    'arunachal pradesh': '12', 'nagaland': '13', 'manipur': '14', 'mizoram': '15', 'tripura': '16',
+    'meghalaya': '17', 'assam': '18', 'west bengal': '19', 'jharkhand': '20', 'odisha': '21',
+    'chhattisgarh': '22', 'madhya pradesh': '23', 'gujarat': '24', 'daman and diu': '25',
+    'dadra and nagar haveli and daman and diu': '26', 'maharashtra': '27', 'karnataka': '29', 'goa': '30',
+    'lakshadweep': '31', 'kerala': '32', 'tamil nadu': '33', 'puducherry': '34',
+    'andaman and nicobar islands': '35', 'telangana': '36', 'andhra pradesh': '37', 'ladakh': '38',
+    'other territory': '97',
+    # Older spellings still found in ledgers
+    'new delhi': '07', 'orissa': '21', 'pondicherry': '34', 'uttaranchal': '05',
+}
+
+
+def tax_components(df: pd.DataFrame) -> np.ndarray:
+    """The tax split of every row as a (rows, TAX_COMPONENTS) matrix in rupees, NaN where missing or absent"""
+    matrix = np.full((len(df), len(TAX_COMPONENTS)), np.nan)
+    for position, component in enumerate(TAX_COMPONENTS):
+        if component in df.columns:
+            matrix[:, position] = pd.to_numeric(df[component], errors='coerce').to_numpy(dtype=float)
+    return matrix
+
+
+def side_checks(
+    components: np.ndarray, amounts: np.ndarray, gstins: pd.Series, places: Optional[pd.Series], prefix: str
+) -> np.ndarray:
+    """Bitmask of the consistency checks each row of one side fails, at that side's bits.
+
+    ``components`` is the tax_components matrix, ``amounts`` the invoice values in rupees and ``places`` the
+    Place_of_Supply column, or None when the side has none.
+    """
+    paise = np.round(components * 100)
+    taxable, cgst, sgst, igst, total_tax = paise.T
+    value = np.round(amounts * 100)
+    interstate = _interstate(gstins, places)
+    with np.errstate(invalid='ignore'):
+        charged = np.abs(paise) > TAX_TOLERANCE_PAISE
+        cgst_charged, sgst_charged, igst_charged = charged[:, 1], charged[:, 2], charged[:, 3]
+        failed = np.column_stack([
+            _differs(cgst, sgst),
+            _differs(taxable + total_tax, value),
+            _differs(cgst + sgst + igst, total_tax),
+            igst_charged & (cgst_charged | sgst_charged),
+            (interstate == 1) & (cgst_charged | sgst_charged) | (interstate == 0) & igst_charged,
+        ])
+    return _pack(failed, SIDE_CHECK_SHIFT[prefix])
+
+
+def difference_checks(gst_components: np.ndarray, apar_components: np.ndarray) -> np.ndarray:
+    """Bitmask of the components that differ between the two sides of each pair"""
+    with np.errstate(invalid='ignore'):
+        failed = _differs(np.round(gst_components * 100), np.round(apar_components * 100))
+    return _pack(failed, 0)
+
+
+def check_counts(masks: np.ndarray) -> Dict[str, Any]:
+    """Invoices failing any check, and invoices failing each check by name"""
+    masks = np.asarray(masks, dtype=np.uint16)
+    bits = (masks[:, None] >> np.arange(len(TAX_CHECKS), dtype=np.uint16)) & 1
+    return {
+        'flagged': int((masks != 0).sum()),
+        'checks': dict(zip(TAX_CHECKS, bits.sum(axis=0).tolist())),
+    }
+
+
+def _differs(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    # NaN compares False, so a missing value never fails a check
+    return np.abs(left - right) > TAX_TOLERANCE_PAISE
+
+
+def _pack(failed: np.ndarray, shift: int) -> np.ndarray:
+    weights = (1 << (np.arange(failed.shape[1]) + shift)).astype(np.uint16)
+    return (failed.astype(np.uint16) * weights).sum(axis=1, dtype=np.uint16)
+
+
+def _interstate(gstins: pd.Series, places: Optional[pd.Series]) -> np.ndarray:
+    """1 where the supplier's state and the place of supply differ, 0 where they agree, -1 where unknown"""
+    if places is None:
+        return np.full(len(gstins), -1, dtype=np.int8)
+    supplier_codes, supplier_states = pd.factorize(gstins)
+    place_codes, place_states = pd.factorize(places)
+    # States are worked out once per distinct GSTIN and place
+    supplier = np.array([_gstin_state(gstin) for gstin in supplier_states] + [''], dtype=object)[supplier_codes]
+    place = np.array([_state_code(value) for value in place_states] + [''], dtype=object)[place_codes]
+    known = (supplier != '') & (place != '')
+    return np.where(known, (supplier != place).astype(np.int8), -1)
+
+
+def _gstin_state(gstin: Any) -> str:
+    code = str(gstin).strip()[:2]
+    return code if len(code) == 2 and code.isdigit() else ''
+
+
+def _state_code(place: Any) -> str:
+    """State code of a Place_of_Supply written as a name, a code or '27-Maharashtra'"""
+    text = str(place).strip()
+    code = re.match(r'^(\d{2})\b', text)
+    if code:
+        return code.group(1)
+    return STATE_CODES.get(re.sub(r'\s+', ' ', text.replace('&', 'and')).casefold(), '')
@@ -0,0 +1,69 @@
+"""Inputs shared by the engine tests: the sample files at the repository root and small edge-case uploads"""
+import io
+import os
+
+import pandas as pd
+
+import api
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEADER = 'Invoice_No,GSTIN,Invoice_Value,Invoice_Date\n'
+
+# Small uploads exercising what the loop did implicitly
+EDGE_CASES = {
+    'duplicate_keys': (
+        HEADER
+        + 'INV-1,29AAAAA0000A1Z5,1000,2025-07-01\n'
+        + 'INV-2,29AAAAA0000A1Z5,500,2025-07-02\n'
+        + 'INV-1,29AAAAA0000A1Z5,1000,2025-07-01\n',
+        # The loop's dict lookup keeps the last AP/AR row of a key
+        HEADER
+        + 'INV-1,29AAAAA0000A1Z5,1500,2025-08-30\n'
+        + 'INV-1,29AAAAA0000A1Z5,1000,2025-07-01\n'
+        + 'INV-2,29AAAAA0000A1Z5,495,2025-07-02\n'
+        + 'INV-2,29AAAAA0000A1Z5,490,2025-07-20\n'
+        + 'INV-3,29AAAAA0000A1Z5,700,2025-07-07\n',
+    ),
+    'missing_amounts': (
+        HEADER
+        + 'INV-1,29AAAAA0000A1Z5,,2025-07-01\n'
+        + 'INV-2,29AAAAA0000A1Z5,abc,2025-07-02\n'
+        + 'INV-3,29AAAAA0000A1Z5,300,2025-07-03\n'
+        + 'INV-4,29AAAAA0000A1Z5,,2025-07-04\n'
+        + 'INV-5,29AAAAA0000A1Z5,500,2025-07-05\n',
+        HEADER
+        + 'INV-1,29AAAAA0000A1Z5,100,2025-07-01\n'
+        + 'INV-2,29AAAAA0000A1Z5,200,2025-07-02\n'
+        + 'INV-3,29AAAAA0000A1Z5,,2025-07-03\n'
+        + 'INV-4,29AAAAA0000A1Z5,,2025-07-04\n'
+        + 'INV-5,29AAAAA0000A1Z5,500,2025-07-05\n',
+    ),
+    'bad_dates': (
+        HEADER
+        + 'INV-1,29AAAAA0000A1Z5,1000,not a date\n'
+        + 'INV-2,29AAAAA0000A1Z5,1000,\n'
+        + 'INV-3,27BBBBB1111B1Z5,100,2025-05-01\n'
+        + 'INV-4,27BBBBB1111B1Z5,100,2025-07-10\n',
+        HEADER
+        + 'INV-1,29AAAAA0000A1Z5,1000,2025-07-04\n'
+        + 'INV-2,29AAAAA0000A1Z5,1010,2025-07-05\n'
+        + 'INV-3,27BBBBB1111B1Z5,100,2025-07-01\n'
+        + 'INV-4,27BBBBB1111B1Z5,100,2025-07-10\n',
+    ),
+    'padded_keys': (
+        HEADER + ' INV-1 , 29AAAAA0000A1Z5,1000,2025-07-01\n' + 'INV-2,29AAAAA0000A1Z5,1000,2025-07-02\n',
+        HEADER + 'INV-1,29AAAAA0000A1Z5 ,1000,2025-07-01\n' + 'INV-3,29AAAAA0000A1Z5,1000,2025-07-03\n',
+    ),
+}
+
+
+def read_sample(name: str) -> str:
+    """Text of one of the sample CSV files at the repository root"""
+    with open(os.path.join(DATA_DIR, name), encoding='utf-8') as source:
+        return source.read()
+
+
+def engine_upload(csv: str) -> pd.DataFrame:
+    """CSV text parsed the way /upload parses it"""
+    return api.load_csv_upload(io.BytesIO(csv.encode('utf-8')))['dataframe']
@@ -0,0 +1,19 @@
+"""Dates are read day-first; only a value no day-first layout can read is tried month-first"""
+import pandas as pd
+
+import api
+
+
+def test_month_first_only_for_impossible_day_first_dates():
+    values = pd.Series(['03/04/2025', '04/25/2025', '31/12/2024', '2025-07-01', '13/13/2025', None])
+    parsed, failed = api.parse_dates(values)
+    assert parsed.dt.strftime('%Y-%m-%d').tolist()[:4] == ['2025-04-03', '2025-04-25', '2024-12-31', '2025-07-01']
+    assert parsed.iloc[4:].isna().all()
+    assert failed.tolist() == [False, False, False, False, True, False]
+
+
+def test_month_first_dates_never_set_the_column_format():
+    # Even when most values are only valid month-first, the ambiguous ones keep their day-first reading
+    values = pd.Series(['04/25/2025', '05/26/2025', '03/04/2025'])
+    assert api.column_date_format(values) not in api.FALLBACK_DATE_FORMATS
+    assert api.parse_dates(values)[0].iloc[2] == pd.Timestamp('2025-04-03')
@@ -0,0 +1,80 @@
+"""An incremental run must give what a full run of the same files gives, and report what changed.
+
+The sample files are reconciled once, then again after keys are amended, added and deleted on either side
+and a row is moved. The second run, given the first run's state, has to carry the unchanged keys over
+rather than fall back to a full run, and everything it renders apart from ``changes`` must equal a full
+run's bytes.
+"""
+import csv
+import io
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pytest
+
+import api
+from samples import engine_upload, read_sample
+
+
+def rows(csv_text: str) -> List[Dict[str, str]]:
+    return list(csv.DictReader(io.StringIO(csv_text)))
+
+
+def to_csv(records: List[Dict[str, str]]) -> str:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=list(records[0]), lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(records)
+    return out.getvalue()
+
+
+def edited_samples():
+    """Both sample files after the edits, with the change counts they must produce"""
+    gst, apar = rows(read_sample('gst_data.csv')), rows(read_sample('apar_data.csv'))
+    counts = pd.Series([row['Invoice_No'] for row in gst + apar]).value_counts()
+    # Invoices with exactly one row on each side, so every edit touches one key
+    single = [row['Invoice_No'] for row in gst if counts[row['Invoice_No']] == 2][:5]
+    gst_amended, apar_amended, deleted, gst_deleted, moved = single
+
+    def find(records: List[Dict[str, str]], invoice: str) -> Dict[str, str]:
+        return next(row for row in records if row['Invoice_No'] == invoice)
+
+    find(gst, gst_amended)['Invoice_Value'] = str(float(find(gst, gst_amended)['Invoice_Value']) * 2)
+    find(apar, apar_amended)['Invoice_Date'] = '2025-12-31'
+    gst = [row for row in gst if row['Invoice_No'] not in (deleted, gst_deleted)]
+    apar = [row for row in apar if row['Invoice_No'] != deleted]
+    # An unchanged key at another position
+    gst.append(gst.pop(gst.index(find(gst, moved))))
+    # A new key on both sides and one on AP/AR only
+    gst.append(dict(gst[0], Invoice_No='INV-NEW-1'))
+    apar.append(dict(apar[0], Invoice_No='INV-NEW-1', GSTIN=gst[0]['GSTIN']))
+    apar.append(dict(apar[0], Invoice_No='INV-NEW-2'))
+    return to_csv(gst), to_csv(apar), {'added': 2, 'amended': 3, 'reclassified': 0, 'removed': 1}
+
+
+def classify(gst_csv: str, apar_csv: str, options: Dict[str, Any], baseline: Optional[Dict[str, pd.DataFrame]] = None):
+    return api.classify_reconciliation(
+        engine_upload(gst_csv), engine_upload(apar_csv), fuzzy_matching=False, baseline=baseline, partitions=1, **options
+    )
+
+
+@pytest.mark.parametrize('options', [{}, {'tax_checks': True}], ids=['default', 'tax_checks'])
+def test_incremental_run_matches_full_run(options: Dict[str, Any], monkeypatch):
+    baseline = classify(read_sample('gst_data.csv'), read_sample('apar_data.csv'), options)['baseline']
+    gst_csv, apar_csv, expected_counts = edited_samples()
+
+    carried = []
+    carry_over = api._carry_over_baseline
+    monkeypatch.setattr(api, '_carry_over_baseline', lambda *args: carried.append(carry_over(*args)) or carried[-1])
+    incremental = classify(gst_csv, apar_csv, options, baseline)
+    assert carried and carried[-1] is not None, "the incremental run fell back to a full run"
+
+    full = classify(gst_csv, apar_csv, options)
+    assert api.count_changes(incremental['changes']) == expected_counts
+    incremental_baseline, full_baseline = incremental.pop('baseline'), full.pop('baseline')
+    incremental['changes'] = None
+    assert api.render_reconciliation_result(**incremental) == api.render_reconciliation_result(**full)
+    for kind, frame in full_baseline.items():
+        pd.testing.assert_frame_equal(
+            incremental_baseline[kind].reset_index(drop=True), frame.reset_index(drop=True), check_dtype=False
+        )
@@ -0,0 +1,72 @@
+"""An out-of-core run must report what an in-memory run reports, however small its memory budget.
+
+The budget is set so low that the spilled partitions are reconciled in several groups. The summary and
+insights must equal perform_reconciliation's, and each category file, put back in input order, must hold
+the rows of the in-memory run's category frame, from which perform_reconciliation builds its details.
+AP/AR keys are numbered by their first input row rather than by their rank among keys, so APAR_Order only
+has to put the rows in the same order.
+"""
+import io
+import os
+
+import pandas as pd
+import pytest
+
+import api
+from samples import DATA_DIR, EDGE_CASES, engine_upload
+
+# Columns read back as text, as numbers would lose leading zeros and dates their format
+TEXT_COLUMNS = ['Invoice_No', 'APAR_Invoice_No', 'GSTIN', 'GST_Date', 'APAR_Date', 'GST_Name', 'APAR_Name', 'Reason']
+
+CASES = {
+    'sample_files': ('gst_data.csv', 'apar_data.csv'),
+    'other_sample_files': ('1.csv', '2.csv'),
+    'bad_dates': EDGE_CASES['bad_dates'],
+}
+
+
+def read_category_file(source) -> pd.DataFrame:
+    """A category file with its rows in input order; a whole number reads the same from 2 as from 2.0"""
+    frame = pd.read_csv(source, dtype=dict.fromkeys(TEXT_COLUMNS, str))
+    order = [column for column in ('GST_Row', 'APAR_Order') if column in frame.columns]
+    return frame.sort_values(order, kind='stable').drop(columns=['APAR_Order']).reset_index(drop=True)
+
+
+def read_text(path: str) -> str:
+    with open(path, encoding='utf-8') as source:
+        return source.read()
+
+
+@pytest.mark.parametrize('case', list(CASES))
+@pytest.mark.parametrize('fuzzy', [False, True], ids=['exact', 'fuzzy'])
+def test_out_of_core_run_matches_in_memory_run(case: str, fuzzy: bool, tmp_path, monkeypatch):
+    gst, apar = CASES[case]
+    if case in EDGE_CASES:
+        (tmp_path / 'gst.csv').write_text(gst, encoding='utf-8')
+        (tmp_path / 'apar.csv').write_text(apar, encoding='utf-8')
+        gst_path, apar_path = str(tmp_path / 'gst.csv'), str(tmp_path / 'apar.csv')
+    else:
+        gst_path, apar_path = os.path.join(DATA_DIR, gst), os.path.join(DATA_DIR, apar)
+
+    # The frames of a run take several times the size of its input, so no group can hold them all
+    budget = os.path.getsize(gst_path) + os.path.getsize(apar_path)
+    groups = []
+    partition_groups = api._partition_groups
+    monkeypatch.setattr(api, '_partition_groups', lambda *args: (groups.append(group) or group for group in partition_groups(*args)))
+    result = api.reconcile_out_of_core(gst_path, apar_path, str(tmp_path / 'out'), fuzzy, budget)
+    assert len(groups) > 1, "the budget did not split the run"
+
+    gst_df, apar_df = engine_upload(read_text(gst_path)), engine_upload(read_text(apar_path))
+    expected = api.perform_reconciliation(gst_df, apar_df, fuzzy, partitions=1)
+    assert result['summary'] == expected['summary']
+    assert result['insights'] == expected['insights']
+
+    classified = api.classify_reconciliation(gst_df, apar_df, fuzzy, partitions=1)
+    for name, frame in classified['categories'].items():
+        assert result['counts'][name] == len(frame)
+        pd.testing.assert_frame_equal(
+            read_category_file(result['files'][name]),
+            read_category_file(io.StringIO(frame.to_csv(index=False))),
+            check_dtype=False,
+            obj=name,
+        )
@@ -0,0 +1,355 @@
+"""Parity of the columnar engine with the row-by-row loop it replaced.
+
+``reference_reconciliation`` is the baseline ``perform_reconciliation`` copied verbatim, with its two date
+helpers, and must not be edited: it is the specification the engine is held to. Both run on the same CSV
+text and their JSON payloads are compared field by field. The engine runs with fuzzy and split matching off,
+the only settings the loop had.
+
+Deliberate departures from the loop, made by later changes, are applied to the reference result before
+comparing (see ``expected_payload``):
+
+* ``summary`` gains ``fuzzyKeyMatch``, ``splitMatch`` and ``unparsedDates``, and ``details`` gains the first
+  two categories. With both passes off those are empty, and unparsedDates only feeds an insight.
+* An insight reports dates that could not be parsed.
+* A mismatched pair whose amount could not be read says so instead of "Amount differs by nan%".
+* Amounts are compared in paise, so differences carry no float noise; floats are compared approximately.
+"""
+import io
+import json
+import math
+from typing import Any, Dict
+
+import pandas as pd
+import pytest
+
+import api
+from samples import EDGE_CASES, engine_upload, read_sample
+
+# Categories and summary counts added after the loop, empty with fuzzy and split matching off
+ADDED_CATEGORIES = ['fuzzyKeyMatch', 'splitMatch']
+ADDED_SUMMARY_FIELDS = ADDED_CATEGORIES + ['unparsedDates']
+
+UNPARSED_DATES_INSIGHT = 'could not be parsed'
+
+# Frozen copy of the baseline loop; do not edit.
+def parse_date_safely(date_value):
+    """Safely parse date from various formats"""
+    if pd.isna(date_value):
+        return None
+    
+    try:
+        # Try pandas datetime parsing with multiple formats
+        return pd.to_datetime(date_value, errors='coerce')
+    except:
+        return None
+
+
+def calculate_date_difference(date1, date2):
+    """Calculate difference between two dates in days"""
+    if date1 is None or date2 is None:
+        return None
+    
+    try:
+        diff = abs((date1 - date2).days)
+        return diff
+    except:
+        return None
+
+
+
+def reference_reconciliation(gst_df: pd.DataFrame, apar_df: pd.DataFrame) -> Dict[str, Any]:
+    """Core reconciliation logic with AI fuzzy matching and date discrepancy detection"""
+    
+    # Initialize result categories
+    matched = []
+    partial_match = []
+    mismatched = []
+    missing_in_apar = []
+    missing_in_gst = []
+    insights = []
+    date_discrepancies = []  # NEW: Track date mismatches
+    
+    # Clean data
+    gst_df['Invoice_No'] = gst_df['Invoice_No'].astype(str).str.strip()
+    apar_df['Invoice_No'] = apar_df['Invoice_No'].astype(str).str.strip()
+    gst_df['GSTIN'] = gst_df['GSTIN'].astype(str).str.strip()
+    apar_df['GSTIN'] = apar_df['GSTIN'].astype(str).str.strip()
+    
+    # Convert Invoice_Value to float
+    gst_df['Invoice_Value'] = pd.to_numeric(gst_df['Invoice_Value'], errors='coerce')
+    apar_df['Invoice_Value'] = pd.to_numeric(apar_df['Invoice_Value'], errors='coerce')
+    
+    # NEW: Parse dates
+    gst_df['Invoice_Date_Parsed'] = gst_df['Invoice_Date'].apply(parse_date_safely)
+    apar_df['Invoice_Date_Parsed'] = apar_df['Invoice_Date'].apply(parse_date_safely)
+    
+    # Create indexes for faster lookup
+    apar_lookup = {}
+    for idx, row in apar_df.iterrows():
+        key = (row['Invoice_No'], row['GSTIN'])
+        apar_lookup[key] = row
+    
+    gst_lookup = {}
+    for idx, row in gst_df.iterrows():
+        key = (row['Invoice_No'], row['GSTIN'])
+        gst_lookup[key] = row
+    
+    # Process GST records
+    for idx, gst_row in gst_df.iterrows():
+        invoice_no = gst_row['Invoice_No']
+        gstin = gst_row['GSTIN']
+        gst_amount = gst_row['Invoice_Value']
+        gst_date = gst_row['Invoice_Date_Parsed']
+        
+        key = (invoice_no, gstin)
+        
+        if key in apar_lookup:
+            apar_row = apar_lookup[key]
+            apar_amount = apar_row['Invoice_Value']
+            apar_date = apar_row['Invoice_Date_Parsed']
+            
+            # NEW: Check date discrepancy
+            date_diff = calculate_date_difference(gst_date, apar_date)
+            has_date_mismatch = date_diff is not None and date_diff > 0
+            
+            # Exact match check
+            if abs(gst_amount - apar_amount) < 0.01:
+                match_record = {
+                    'Invoice_No': invoice_no,
+                    'GSTIN': gstin,
+                    'GST_Amount': float(gst_amount),
+                    'APAR_Amount': float(apar_amount),
+                    'GST_Date': str(gst_row['Invoice_Date']),
+                    'APAR_Date': str(apar_row['Invoice_Date']),
+                    'Difference': 0,
+                    'Match_Type': 'Exact Match',
+                    'Confidence': 1.0
+                }
+                
+                # NEW: Add date mismatch flag
+                if has_date_mismatch:
+                    match_record['Date_Mismatch'] = True
+                    match_record['Date_Difference_Days'] = int(date_diff)
+                    date_discrepancies.append({
+                        'Invoice_No': invoice_no,
+                        'GSTIN': gstin,
+                        'GST_Date': str(gst_row['Invoice_Date']),
+                        'APAR_Date': str(apar_row['Invoice_Date']),
+                        'Difference_Days': int(date_diff)
+                    })
+                
+                matched.append(match_record)
+            else:
+                # Check if within ±2% (fuzzy match)
+                diff_percentage = abs((gst_amount - apar_amount) / gst_amount * 100)
+                
+                if diff_percentage <= 2:
+                    partial_record = {
+                        'Invoice_No': invoice_no,
+                        'GSTIN': gstin,
+                        'GST_Amount': float(gst_amount),
+                        'APAR_Amount': float(apar_amount),
+                        'GST_Date': str(gst_row['Invoice_Date']),
+                        'APAR_Date': str(apar_row['Invoice_Date']),
+                        'Difference': float(abs(gst_amount - apar_amount)),
+                        'Difference_Percentage': round(diff_percentage, 2),
+                        'Match_Type': 'Partial Match',
+                        'Confidence': round(1 - (diff_percentage / 100), 2),
+                        'Reason': 'Amount within ±2% threshold'
+                    }
+                    
+                    # NEW: Add date mismatch flag
+                    if has_date_mismatch:
+                        partial_record['Date_Mismatch'] = True
+                        partial_record['Date_Difference_Days'] = int(date_diff)
+                        date_discrepancies.append({
+                            'Invoice_No': invoice_no,
+                            'GSTIN': gstin,
+                            'GST_Date': str(gst_row['Invoice_Date']),
+                            'APAR_Date': str(apar_row['Invoice_Date']),
+                            'Difference_Days': int(date_diff)
+                        })
+                    
+                    partial_match.append(partial_record)
+                else:
+                    mismatch_record = {
+                        'Invoice_No': invoice_no,
+                        'GSTIN': gstin,
+                        'GST_Amount': float(gst_amount),
+                        'APAR_Amount': float(apar_amount),
+                        'GST_Date': str(gst_row['Invoice_Date']),
+                        'APAR_Date': str(apar_row['Invoice_Date']),
+                        'Difference': float(abs(gst_amount - apar_amount)),
+                        'Difference_Percentage': round(diff_percentage, 2),
+                        'Match_Type': 'Mismatched',
+                        'Confidence': 0.0,
+                        'Reason': f'Amount differs by {diff_percentage:.2f}%'
+                    }
+                    
+                    # NEW: Add date mismatch flag
+                    if has_date_mismatch:
+                        mismatch_record['Date_Mismatch'] = True
+                        mismatch_record['Date_Difference_Days'] = int(date_diff)
+                        date_discrepancies.append({
+                            'Invoice_No': invoice_no,
+                            'GSTIN': gstin,
+                            'GST_Date': str(gst_row['Invoice_Date']),
+                            'APAR_Date': str(apar_row['Invoice_Date']),
+                            'Difference_Days': int(date_diff)
+                        })
+                    
+                    mismatched.append(mismatch_record)
+        else:
+            # Missing in AP/AR
+            missing_in_apar.append({
+                'Invoice_No': invoice_no,
+                'GSTIN': gstin,
+                'GST_Amount': float(gst_amount),
+                'GST_Date': str(gst_row['Invoice_Date']),
+                'Match_Type': 'Missing in AP/AR',
+                'Confidence': 0.0,
+                'Reason': 'Invoice exists in GST but not in AP/AR ledger'
+            })
+    
+    # Find invoices in AP/AR but missing in GST
+    for key, apar_row in apar_lookup.items():
+        if key not in gst_lookup:
+            missing_in_gst.append({
+                'Invoice_No': apar_row['Invoice_No'],
+                'GSTIN': apar_row['GSTIN'],
+                'APAR_Amount': float(apar_row['Invoice_Value']),
+                'APAR_Date': str(apar_row['Invoice_Date']),
+                'Match_Type': 'Missing in GST',
+                'Confidence': 0.0,
+                'Reason': 'Invoice exists in AP/AR but not filed in GST'
+            })
+    
+    # Generate AI insights
+    if len(partial_match) > 0:
+        insights.append(f"TDS deductions causing ±2% variations in {len(partial_match)} invoices")
+    
+    if len(missing_in_apar) > 0:
+        insights.append(f"{len(missing_in_apar)} invoices filed in GST but missing in AP/AR ledger")
+    
+    if len(missing_in_gst) > 0:
+        insights.append(f"{len(missing_in_gst)} invoices in AP/AR but not yet filed in GST")
+    
+    # NEW: Date discrepancy insights
+    if len(date_discrepancies) > 0:
+        insights.append(f"⚠️ Found {len(date_discrepancies)} invoice(s) with date mismatches between GST and AP/AR")
+        
+        # Find the largest date difference
+        max_diff = max(date_discrepancies, key=lambda x: x['Difference_Days'])
+        if max_diff['Difference_Days'] > 30:
+            insights.append(f"🚨 Critical: Invoice {max_diff['Invoice_No']} has {max_diff['Difference_Days']} days date difference")
+    
+    if len(mismatched) > 0:
+        mismatch_invoices = [m['Invoice_No'] for m in mismatched[:5]]
+        insights.append(f"Recommended: Review invoices {', '.join(mismatch_invoices)} for amount discrepancies")
+    
+    if len(matched) / len(gst_df) > 0.95:
+        insights.append("Excellent reconciliation rate (>95%)! Financial data is well-aligned.")
+    elif len(matched) / len(gst_df) < 0.80:
+        insights.append("Warning: Low match rate (<80%). Consider reviewing data entry processes.")
+    
+    # Calculate summary
+    summary = {
+        'totalInvoices': len(gst_df) + len(apar_df),
+        'matched': len(matched),
+        'partialMatch': len(partial_match),
+        'mismatched': len(mismatched),
+        'missingInGST': len(missing_in_gst),
+        'missingInAPAR': len(missing_in_apar),
+        'dateDiscrepancies': len(date_discrepancies),  # NEW
+        'matchRate': round((len(matched) / len(gst_df)) * 100, 2) if len(gst_df) > 0 else 0
+    }
+    
+    return {
+        'summary': summary,
+        'details': {
+            'matched': matched[:100],
+            'partialMatch': partial_match,
+            'mismatched': mismatched,
+            'missingInGST': missing_in_gst,
+            'missingInAPAR': missing_in_apar,
+            'dateDiscrepancies': date_discrepancies  # NEW
+        },
+        'insights': insights
+    }
+
+
+def engine_payload(gst_csv: str, apar_csv: str) -> Dict[str, Any]:
+    """The /reconcile payload of the columnar engine, as a client decodes it"""
+    classified = api.classify_reconciliation(engine_upload(gst_csv), engine_upload(apar_csv), fuzzy_matching=False)
+    classified.pop('baseline')
+    return json.loads(api.render_reconciliation_result(**classified))
+
+
+def expected_payload(gst_csv: str, apar_csv: str) -> Dict[str, Any]:
+    """The loop's payload on the same text, with the departures listed in the module docstring applied"""
+    expected = _plain(reference_reconciliation(pd.read_csv(io.StringIO(gst_csv)), pd.read_csv(io.StringIO(apar_csv))))
+    for record in expected['details']['mismatched']:
+        gst_missing, apar_missing = record['GST_Amount'] is None, record['APAR_Amount'] is None
+        if gst_missing and apar_missing:
+            record['Reason'] = 'GST and AP/AR amounts missing or not numeric'
+        elif gst_missing:
+            record['Reason'] = 'GST amount missing or not numeric'
+        elif apar_missing:
+            record['Reason'] = 'AP/AR amount missing or not numeric'
+    return expected
+
+
+def assert_parity(actual: Dict[str, Any], expected: Dict[str, Any]) -> None:
+    for field in ADDED_SUMMARY_FIELDS:
+        assert field in actual['summary']
+    for name in ADDED_CATEGORIES:
+        assert actual['summary'][name] == 0
+        assert actual['details'].pop(name) == []
+    unparsed_dates = actual['summary'].pop('unparsedDates')
+    assert {key: value for key, value in actual['summary'].items() if key not in ADDED_CATEGORIES} == expected['summary']
+
+    assert list(actual['details']) == list(expected['details'])
+    for name, records in expected['details'].items():
+        assert len(actual['details'][name]) == len(records), name
+        for position, (actual_record, expected_record) in enumerate(zip(actual['details'][name], records)):
+            assert list(actual_record) == list(expected_record), (name, position)
+            for field, value in expected_record.items():
+                assert _same(actual_record[field], value), (name, position, field, actual_record[field], value)
+
+    insights = [insight for insight in actual['insights'] if UNPARSED_DATES_INSIGHT not in insight]
+    assert len(insights) == len(actual['insights']) - (1 if unparsed_dates else 0)
+    assert insights == expected['insights']
+
+
+def _plain(value: Any) -> Any:
+    """``value`` as JSON would carry it: NaN becomes None and numpy scalars become Python numbers"""
+    return json.loads(json.dumps(value, default=lambda scalar: scalar.item()), parse_constant=lambda constant: None)
+
+
+def _same(actual: Any, expected: Any) -> bool:
+    if isinstance(expected, float) and isinstance(actual, (int, float)) and not isinstance(actual, bool):
+        return math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-6)
+    return type(actual) is type(expected) and actual == expected
+
+
+@pytest.mark.parametrize('gst_name, apar_name', [('gst_data.csv', 'apar_data.csv'), ('1.csv', '2.csv')])
+def test_sample_files_match_the_loop(gst_name: str, apar_name: str):
+    gst_csv, apar_csv = read_sample(gst_name), read_sample(apar_name)
+    assert_parity(engine_payload(gst_csv, apar_csv), expected_payload(gst_csv, apar_csv))
+
+
+@pytest.mark.parametrize('case', list(EDGE_CASES))
+def test_edge_cases_match_the_loop(case: str):
+    gst_csv, apar_csv = EDGE_CASES[case]
+    assert_parity(engine_payload(gst_csv, apar_csv), expected_payload(gst_csv, apar_csv))
+
+
+def test_unreadable_amounts_are_named_in_the_reason():
+    gst_csv, apar_csv = EDGE_CASES['missing_amounts']
+    reasons = {record['Invoice_No']: record['Reason'] for record in engine_payload(gst_csv, apar_csv)['details']['mismatched']}
+    assert reasons == {
+        'INV-1': 'GST amount missing or not numeric',
+        'INV-2': 'GST amount missing or not numeric',
+        'INV-3': 'AP/AR amount missing or not numeric',
+        'INV-4': 'GST and AP/AR amounts missing or not numeric',
+    }
@@ -0,0 +1,58 @@
+"""The rendered reconciliation payload must be byte for byte what JSONResponse writes for the built one.
+
+render_reconciliation_result writes the records layout straight from the column arrays, while clients were
+written against ``JSONResponse(jsonable_encoder(build_reconciliation_result(...)))``. The inputs hold the
+values the two encoders are most likely to disagree on: non-ASCII names, missing and unreadable amounts,
+and ``%`` in keys and names.
+"""
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import api
+from samples import engine_upload, read_sample
+
+GST_CSV = (
+    'Invoice_No,GSTIN,Trade_Name,Invoice_Value,Invoice_Date\n'
+    'INV-1,29AAAAA0000A1Z5,Śrī Gaṇeśa Traders,1000,2025-07-01\n'
+    'INV-50%,29AAAAA0000A1Z5,100% Agro,500,2025-07-02\n'
+    'INV-3,29AAAAA0000A1Z5,Müller & Söhne,,2025-07-03\n'
+    'INV-4,27BBBBB1111B1Z5,東京商事,abc,2025-07-04\n'
+    'INV-5,27BBBBB1111B1Z5,"Rao, Rao & Co",980,2025-07-05\n'
+    'INV-6,27BBBBB1111B1Z5,Ünïcode ₹ Ltd,700,not a date\n'
+)
+APAR_CSV = (
+    'Invoice_No,GSTIN,Vendor_Customer_Name,Invoice_Value,Invoice_Date\n'
+    'INV-1,29AAAAA0000A1Z5,Śrī Gaṇeśa Traders,1000,2025-07-01\n'
+    'INV-50%,29AAAAA0000A1Z5,100% Agro,510,2025-07-02\n'
+    'INV-3,29AAAAA0000A1Z5,Müller & Söhne,300,2025-07-03\n'
+    'INV-4,27BBBBB1111B1Z5,東京商事,,2025-07-04\n'
+    'INV5,27BBBBB1111B1Z5,"Rao, Rao & Co",980,2025-07-05\n'
+    'INV-7,27BBBBB1111B1Z5,Ünïcode ₹ Ltd,350,2025-07-06\n'
+    'INV-8,27BBBBB1111B1Z5,Ünïcode ₹ Ltd,350,2025-07-06\n'
+)
+
+CASES = {
+    'special_values': (GST_CSV, APAR_CSV),
+    'sample_files': (read_sample('gst_data.csv'), read_sample('apar_data.csv')),
+}
+
+
+def json_response_body(result) -> bytes:
+    return JSONResponse(jsonable_encoder(api.build_reconciliation_result(**result))).body
+
+
+@pytest.mark.parametrize('case', list(CASES))
+def test_rendered_result_matches_json_response(case: str):
+    gst_csv, apar_csv = CASES[case]
+    options = dict(fuzzy_matching=True, split_matching=True, tax_checks=True, partitions=1)
+    first = api.classify_reconciliation(engine_upload(gst_csv), engine_upload(apar_csv), **options)
+    # The second run against the first one's state also reports changes
+    second = api.classify_reconciliation(
+        engine_upload(gst_csv), engine_upload(''.join(apar_csv.splitlines(keepends=True)[:-1])),
+        baseline=first.pop('baseline'), **options
+    )
+    second.pop('baseline')
+
+    for result in (first, second):
+        assert api.render_reconciliation_result(**result) == json_response_body(result)
@@ -0,0 +1,200 @@
+"""Tolerance rules deciding which invoice pairs match, per GSTIN, ledger type and party.
+
+A rule set is a JSON object of ``defaults`` and an ordered list of ``rules``. Each rule names the scope it
+applies to, any of ``gstin``, ``ledger_type`` and ``client`` (the party name on either side), and the
+tolerances it overrides; the first rule whose scope covers a pair decides that pair's tolerances:
+
+    {"defaults": {"partial_percent": 2},
+     "rules": [{"gstin": ["29ABCDE1234F1Z5"], "tds": true, "date_window_days": 3},
+               {"ledger_type": "Receivable", "partial_amount": 10}]}
+
+Scopes are compared case-insensitively. Rules are evaluated once per distinct combination of the scoped
+columns rather than per row, so a pair costs the same however many rules there are.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Tolerances a rule can set, with the values that reproduce the fixed thresholds reconciliation used to have:
+#   exact_amount        rupees two amounts may differ by and still match exactly
+#   partial_percent     percent of the GST amount a partial match may differ by
+#   partial_amount      rupees a partial match may differ by, whatever the percentage
+#   tds                 whether TDS_Deducted is added to partial_amount
+#   date_window_days    days two dates may differ by before the pair is a date discrepancy
+#   critical_date_days  days beyond which a date discrepancy is reported as critical
+DEFAULT_TOLERANCES = {
+    'exact_amount': 0.0,
+    'partial_percent': 2.0,
+    'partial_amount': 0.0,
+    'tds': False,
+    'date_window_days': 0,
+    'critical_date_days': 30,
+}
+
+# Pair columns each scope is matched against; a client matches the party name on either side
+SCOPE_COLUMNS = {
+    'gstin': ['GSTIN'],
+    'ledger_type': ['APAR_Ledger_Type'],
+    'client': ['GST_Name', 'APAR_Name'],
+}
+
+# AP/AR upload columns that rules read, and the pair column each is carried in
+LEDGER_TYPE_FIELD = 'Ledger_Type'
+TDS_FIELD = 'TDS_Deducted'
+RULE_FIELDS = [LEDGER_TYPE_FIELD, TDS_FIELD]
+RULE_COLUMNS = [f'APAR_{field}' for field in RULE_FIELDS]
+
+# Rules per request; each adds work per distinct scope combination
+MAX_RULES = 1000
+
+# Partial match reasons by what covered the difference
+PARTIAL_REASONS = {
+    'percent': 'Amount within ±{:g}% threshold',
+    'amount': 'Amount within ₹{:g} tolerance',
+    'tds': 'Amount difference covered by TDS deducted',
+}
+
+
+class ToleranceRuleError(ValueError):
+    """Raised when a rule set does not have the documented shape"""
+
+
+class ToleranceRules:
+    """A validated rule set, compiled to case-folded scope sets and complete tolerance values per rule"""
+
+    def __init__(self, defaults: Dict[str, Any], rules: List[Dict[str, Any]]):
+        self.defaults = defaults
+        self.rules = rules
+
+    @classmethod
+    def from_spec(cls, spec: Optional[Dict[str, Any]]) -> "ToleranceRules":
+        """Compile a rule set as sent by clients; None gives the default tolerances"""
+        spec = spec or {}
+        if not isinstance(spec, dict):
+            raise ToleranceRuleError("Tolerance rules must be a JSON object")
+        _check_keys(spec, {'defaults', 'rules'}, 'tolerance rules')
+        defaults = dict(DEFAULT_TOLERANCES, **_tolerances(spec.get('defaults') or {}, 'defaults'))
+
+        rule_specs = spec.get('rules') or []
+        if not isinstance(rule_specs, list):
+            raise ToleranceRuleError("'rules' must be a list")
+        if len(rule_specs) > MAX_RULES:
+            raise ToleranceRuleError(f"At most {MAX_RULES} rules are allowed, got {len(rule_specs)}")
+
+        rules = []
+        for position, rule_spec in enumerate(rule_specs):
+            where = f'rule {position}'
+            if not isinstance(rule_spec, dict):
+                raise ToleranceRuleError(f"{where} must be a JSON object")
+            _check_keys(rule_spec, set(SCOPE_COLUMNS) | set(DEFAULT_TOLERANCES), where)
+            scope = {field: _scope_values(rule_spec[field], f'{where} {field}') for field in SCOPE_COLUMNS if field in rule_spec}
+            overrides = _tolerances({name: value for name, value in rule_spec.items() if name in DEFAULT_TOLERANCES}, where)
+            rules.append({'scope': scope, 'tolerances': dict(defaults, **overrides)})
+        return cls(defaults, rules)
+
+    def spec(self) -> Dict[str, Any]:
+        """Canonical form of the rule set, equal for rule sets that decide alike"""
+        return {
+            'defaults': self.defaults,
+            'rules': [{**{field: sorted(values) for field, values in rule['scope'].items()}, **rule['tolerances']} for rule in self.rules],
+        }
+
+    @property
+    def is_default(self) -> bool:
+        """Whether every pair is judged by the default tolerances, the fixed thresholds reconciliation used to have"""
+        return self.defaults == DEFAULT_TOLERANCES and all(rule['tolerances'] == DEFAULT_TOLERANCES for rule in self.rules)
+
+    @property
+    def apar_fields(self) -> List[str]:
+        """AP/AR upload columns the rules read, which reconciliation then carries into the pairs"""
+        fields = []
+        if any('ledger_type' in rule['scope'] for rule in self.rules):
+            fields.append(LEDGER_TYPE_FIELD)
+        if self.defaults['tds'] or any(rule['tolerances']['tds'] for rule in self.rules):
+            fields.append(TDS_FIELD)
+        return fields
+
+    def evaluate(self, pairs: pd.DataFrame) -> Dict[str, Any]:
+        """Each tolerance for every pair: one value when all pairs share it, otherwise an array per row"""
+        if not self.rules:
+            return dict(self.defaults)
+
+        # Rules are applied to the distinct combinations of the scoped columns, then spread to the rows
+        columns = sorted({column for rule in self.rules for field in rule['scope'] for column in SCOPE_COLUMNS[field]})
+        codes = {}
+        folded = {}
+        for column in columns:
+            codes[column], uniques = pd.factorize(pairs[column].to_numpy(), use_na_sentinel=False)
+            folded[column] = np.array([str(value).strip().casefold() for value in uniques], dtype=object)
+        combinations = pd.DataFrame(codes)
+        row_combinations = combinations.groupby(columns, sort=False).ngroup().to_numpy()
+        combinations = combinations.drop_duplicates()
+
+        rule_of = np.full(len(combinations), len(self.rules))
+        for position in range(len(self.rules) - 1, -1, -1):
+            covered = np.ones(len(combinations), dtype=bool)
+            for field, wanted in self.rules[position]['scope'].items():
+                in_scope = np.zeros(len(combinations), dtype=bool)
+                for column in SCOPE_COLUMNS[field]:
+                    hits = np.isin(folded[column], list(wanted))
+                    in_scope |= hits[combinations[column].to_numpy()]
+                covered &= in_scope
+            rule_of[covered] = position
+
+        # Tolerances every pair shares stay single values, so the default ones cost nothing per row
+        tolerances = dict(self.defaults)
+        choices = [rule['tolerances'] for rule in self.rules] + [self.defaults]
+        for name in self.defaults:
+            values = np.array([choice[name] for choice in choices])[rule_of]
+            if len(values) and (values != values[0]).any():
+                tolerances[name] = values[row_combinations]
+            elif len(values):
+                tolerances[name] = values[0].item()
+        return tolerances
+
+
+def partial_reasons(
+    within_percent: np.ndarray, within_amount: np.ndarray, percent: Any, amount: Any
+) -> np.ndarray:
+    """Reason text of each partial match: the percentage, the rupee tolerance, or else TDS covered it"""
+    if len(within_percent) == 0:
+        return np.array([], dtype=object)
+    kinds = np.where(within_percent, 'percent', np.where(within_amount, 'amount', 'tds'))
+    limits = np.where(within_percent, percent, np.where(within_amount, amount, 0.0))
+    codes, uniques = pd.MultiIndex.from_arrays([kinds, limits]).factorize()
+    texts = np.array([PARTIAL_REASONS[kind].format(limit) for kind, limit in uniques], dtype=object)
+    return texts[codes]
+
+
+def _check_keys(spec: Dict[str, Any], allowed, where: str) -> None:
+    unknown = sorted(set(spec) - set(allowed))
+    if unknown:
+        raise ToleranceRuleError(f"Unknown field(s) in {where}: {', '.join(unknown)}")
+
+
+def _tolerances(values: Dict[str, Any], where: str) -> Dict[str, Any]:
+    """Validated tolerance values of a rule or of the defaults"""
+    if not isinstance(values, dict):
+        raise ToleranceRuleError(f"{where} must be a JSON object")
+    _check_keys(values, DEFAULT_TOLERANCES, where)
+    checked = {}
+    for name, value in values.items():
+        if name == 'tds':
+            if not isinstance(value, bool):
+                raise ToleranceRuleError(f"{where} tds must be true or false")
+            checked[name] = value
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value) or value < 0:
+            raise ToleranceRuleError(f"{where} {name} must be a non-negative number")
+        # Day windows compare against whole days
+        checked[name] = int(value) if name.endswith('_days') else float(value)
+    return checked
+
+
+def _scope_values(values: Any, where: str) -> frozenset:
+    if isinstance(values, str):
+        values = [values]
+    if not isinstance(values, list) or not values or not all(isinstance(value, str) for value in values):
+        raise ToleranceRuleError(f"{where} must be a string or a non-empty list of strings")
+    return frozenset(value.strip().casefold() for value in values)
@@ -0,0 +1,144 @@
+"""Loading of the reconciliation engine in the background, so the API answers before pandas is imported.
+
+Importing pandas, pyarrow, rapidfuzz and openpyxl, and the modules built on them, takes about a second. main.py
+imports only FastAPI and this module, so uvicorn serves health checks at once. The routes that need the
+engine live in api.py, which an EngineLoader imports off the event loop once the server is up. Requests to
+those routes wait for it; the paths EngineGate leaves open do not. A load that fails is tried again by the
+first request after a backoff, so a transient failure does not need a restart to clear.
+"""
+import asyncio
+import importlib
+import math
+import os
+import time
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from starlette.responses import JSONResponse
+
+# Engine states
+IDLE = 'idle'
+LOADING = 'loading'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+# Seconds before a failed load is tried again, doubled after every further failure up to the maximum
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 60.0
+
+
+class EngineUnavailable(Exception):
+    """Raised to requests waiting for an engine that failed to load"""
+
+
+class EngineLoader:
+    """Imports the engine module once, in a worker thread, then runs its ``warm_up`` function.
+
+    ``on_import`` runs on the event loop as soon as the module is imported, to add its routes to the app.
+    After a failure the load is started again by the first caller once the backoff has passed. A module
+    that was imported before is not imported or added again; only ``warm_up`` is retried.
+    """
+
+    def __init__(
+        self,
+        module: str,
+        on_import: Callable[[ModuleType], None],
+        preload: bool = True,
+        retry_base_seconds: float = RETRY_BASE_SECONDS,
+        retry_max_seconds: float = RETRY_MAX_SECONDS,
+    ):
+        self.module_name = module
+        self.on_import = on_import
+        self.preload = preload
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.module: Optional[ModuleType] = None
+        self.state = IDLE
+        self.error: Optional[str] = None
+        self.import_seconds: Optional[float] = None
+        self.warm_up_seconds: Optional[float] = None
+        self.failures = 0
+        self._failed_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, module: str, on_import: Callable[[ModuleType], None]) -> "EngineLoader":
+        """Build a loader from ENGINE_PRELOAD; with it off the engine is loaded by the first request that needs it"""
+        return cls(module, on_import, preload=os.environ.get('ENGINE_PRELOAD', 'true').lower() not in ('0', 'false', 'no'))
+
+    def start(self) -> None:
+        """Begin loading in the background, unless it has begun already or failed too recently to try again"""
+        if self._task is None or (self.state == FAILED and self.retry_in() == 0):
+            self._task = asyncio.get_running_loop().create_task(self._load())
+
+    async def wait(self) -> ModuleType:
+        """The engine module once it is loaded and warm, starting the load if nothing has yet"""
+        self.start()
+        # Shielded, so a client hanging up does not cancel the load for everyone else
+        await asyncio.shield(self._task)
+        if self.state == FAILED:
+            raise EngineUnavailable(self.error)
+        return self.module
+
+    def retry_in(self) -> float:
+        """Seconds until a failed load may be tried again, 0 once it may"""
+        if self.state != FAILED:
+            return 0.0
+        backoff = min(self.retry_base_seconds * 2 ** (self.failures - 1), self.retry_max_seconds)
+        return max(0.0, self._failed_at + backoff - time.monotonic())
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'status': self.state,
+            'import_seconds': self.import_seconds,
+            'warm_up_seconds': self.warm_up_seconds,
+            'error': self.error,
+            'failures': self.failures,
+            'retry_in_seconds': round(self.retry_in(), 1) if self.state == FAILED else None,
+        }
+
+    async def _load(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            if self.module is None:
+                self.state = LOADING
+                started = time.perf_counter()
+                module = await loop.run_in_executor(None, importlib.import_module, self.module_name)
+                self.import_seconds = round(time.perf_counter() - started, 4)
+                self.on_import(module)
+                self.module = module
+
+            self.state = WARMING
+            started = time.perf_counter()
+            await loop.run_in_executor(None, self.module.warm_up)
+            self.warm_up_seconds = round(time.perf_counter() - started, 4)
+            self.state, self.error = READY, None
+        except Exception as e:
+            self.failures += 1
+            self._failed_at = time.monotonic()
+            self.state, self.error = FAILED, f"{type(e).__name__}: {e}"
+
+
+class EngineGate:
+    """ASGI middleware holding each HTTP request until the engine is ready, except those to ``open_paths``"""
+
+    def __init__(self, app, loader: EngineLoader, open_paths: Iterable[str]):
+        self.app = app
+        self.loader = loader
+        self.open_paths = frozenset(open_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] not in self.open_paths:
+            try:
+                await self.loader.wait()
+            except EngineUnavailable as e:
+                # Clients may come back once the next attempt is allowed
+                response = JSONResponse(
+                    {'detail': f"Reconciliation engine failed to load: {e}"},
+                    status_code=503,
+                    headers={'Retry-After': str(max(1, math.ceil(self.loader.retry_in())))},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,279 @@
+"""Benchmark the reconciliation pipeline on synthetic data and write a JSON report.
+
+Each scale is generated with generate_synthetic_data.py, then upload parsing, duplicate detection,
+/preview-missing and perform_reconciliation are timed. Timings are the best of --repeat runs; peak memory
+comes from a separate tracemalloc pass so tracing never slows the timed runs. Pass --compare with an
+earlier report to print the speed-up per stage.
+
+Cold start is timed too, each run in a fresh interpreter: importing main.py, which is what uvicorn waits for
+before serving, importing the engine in api.py, and the first and second reconciliation after that. A real
+uvicorn process is also started to time how soon it answers / and /ready.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import api  # noqa: E402
+from generate_synthetic_data import generate_datasets, write_datasets  # noqa: E402
+
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000]
+
+REPORT_VERSION = 2
+
+# Run in a fresh interpreter by benchmark_startup, with the GST and AP/AR file paths, fuzzy flag and partitions
+# as arguments; prints the seconds each cold-start stage took as JSON
+STARTUP_PROBE = """
+import json, sys, time
+gst_path, apar_path, fuzzy, partitions = sys.argv[1], sys.argv[2], sys.argv[3] == 'True', int(sys.argv[4])
+marks = [('started', time.perf_counter())]
+import main
+marks.append(('import_main', time.perf_counter()))
+import api
+marks.append(('import_engine', time.perf_counter()))
+frames = []
+for path in (gst_path, apar_path):
+    with open(path, 'rb') as source:
+        frames.append(api.load_upload(source, api.upload_format(path))['dataframe'])
+marks.append(('first_upload', time.perf_counter()))
+api.perform_reconciliation(*frames, fuzzy, partitions=partitions)
+marks.append(('first_reconcile', time.perf_counter()))
+api.perform_reconciliation(*frames, fuzzy, partitions=partitions)
+marks.append(('second_reconcile', time.perf_counter()))
+api.job_manager.shutdown()
+print(json.dumps({name: end - start for (_, start), (name, end) in zip(marks, marks[1:])}))
+"""
+
+# Seconds to wait for a started server to answer
+SERVE_TIMEOUT_SECONDS = 60
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def measure(stage: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """Best and mean wall time over ``repeat`` runs, plus the traced peak of one more run"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'seconds': round(min(timings), 4),
+        'mean_seconds': round(sum(timings) / len(timings), 4),
+        'peak_memory_bytes': peak,
+    }
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, 'rb') as source:
+        return api.load_upload(source, api.upload_format(path))
+
+
+def benchmark_scale(records: int, options: argparse.Namespace, work_dir: str) -> Dict[str, Any]:
+    """Generate one scale and time every stage on it"""
+    gst, apar = generate_datasets(
+        records=records,
+        duplicate_rate=options.duplicate_rate,
+        fuzzy_variation_rate=options.fuzzy_variation_rate,
+        date_skew_rate=options.date_skew_rate,
+        key_noise_rate=options.key_noise_rate,
+        invoices_per_party=options.invoices_per_party,
+        seed=options.seed,
+    )
+    gst_path, apar_path = write_datasets(gst, apar, os.path.join(work_dir, str(records)), options.format)
+
+    gst_df = load(gst_path)['dataframe']
+    apar_df = load(apar_path)['dataframe']
+    stages = {
+        'upload_gst': lambda: load(gst_path),
+        'upload_apar': lambda: load(apar_path),
+        'detect_duplicates': lambda: api.detect_duplicates(gst_df),
+        'preview_missing': lambda: api.build_missing_preview(gst_df, apar_df),
+        'perform_reconciliation': lambda: api.perform_reconciliation(gst_df, apar_df, options.fuzzy, partitions=options.partitions),
+    }
+
+    results = {}
+    for name, stage in stages.items():
+        if options.stages and name not in options.stages:
+            continue
+        results[name] = measure(stage, options.repeat)
+        print(f"  {name:<24} {results[name]['seconds']:>9.3f}s  peak {results[name]['peak_memory_bytes'] / 2**20:>8.1f} MiB")
+
+    return {
+        'records': records,
+        'gst_rows': len(gst_df),
+        'apar_rows': len(apar_df),
+        'file_bytes': {'gst': os.path.getsize(gst_path), 'apar': os.path.getsize(apar_path)},
+        'stages': results,
+    }
+
+
+def benchmark_startup(options: argparse.Namespace, work_dir: str) -> Dict[str, Any]:
+    """Time cold starts on one generated scale, --repeat fresh processes per stage"""
+    gst, apar = generate_datasets(records=options.startup_records, seed=options.seed)
+    gst_path, apar_path = write_datasets(gst, apar, os.path.join(work_dir, 'startup'), options.format)
+
+    runs = []
+    for _ in range(options.repeat):
+        probe = subprocess.run(
+            [sys.executable, '-c', STARTUP_PROBE, gst_path, apar_path, str(options.fuzzy), str(options.partitions)],
+            capture_output=True, text=True, check=True, cwd=BACKEND_DIR,
+        )
+        runs.append(dict(json.loads(probe.stdout.splitlines()[-1]), **serve_startup()))
+
+    results = {}
+    for name in runs[0]:
+        timings = [run[name] for run in runs]
+        results[name] = {'seconds': round(min(timings), 4), 'mean_seconds': round(sum(timings) / len(timings), 4)}
+        print(f"  {name:<24} {results[name]['seconds']:>9.3f}s")
+    return {'records': options.startup_records, 'stages': results}
+
+
+def serve_startup() -> Dict[str, float]:
+    """Seconds from starting uvicorn until / answers, and until /ready reports the engine warm"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        health = _wait_for(f'http://127.0.0.1:{port}/', started)
+        ready = _wait_for(f'http://127.0.0.1:{port}/ready', started)
+    finally:
+        server.terminate()
+        server.wait()
+    return {'serve_health': health, 'serve_ready': ready}
+
+
+def _wait_for(url: str, started: float) -> float:
+    while time.perf_counter() - started < SERVE_TIMEOUT_SECONDS:
+        try:
+            with urllib.request.urlopen(url):
+                return time.perf_counter() - started
+        except OSError:
+            # Refused while the server starts, 503 from /ready while the engine loads
+            time.sleep(0.005)
+    raise TimeoutError(f"{url} did not answer within {SERVE_TIMEOUT_SECONDS}s")
+
+
+def compare_reports(previous: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """One line per stage timed in both reports, with the old and new time and the speed-up"""
+    before = {
+        (scale['records'], name): stage['seconds']
+        for scale in previous['scales'] for name, stage in scale['stages'].items()
+    }
+    lines = [f"Compared with {previous.get('git_commit', 'unknown')} ({previous.get('created_at', '')})"]
+    for scale in current['scales']:
+        for name, stage in scale['stages'].items():
+            old = before.get((scale['records'], name))
+            if old is None:
+                continue
+            speedup = old / stage['seconds'] if stage['seconds'] else float('inf')
+            lines.append(f"  {scale['records']:>10} {name:<24} {old:>9.3f}s -> {stage['seconds']:>9.3f}s  x{speedup:.2f}")
+    if previous.get('startup') and current.get('startup'):
+        for name, stage in current['startup']['stages'].items():
+            old = previous['startup']['stages'].get(name, {}).get('seconds')
+            if old is None:
+                continue
+            speedup = old / stage['seconds'] if stage['seconds'] else float('inf')
+            lines.append(f"  {'startup':>10} {name:<24} {old:>9.3f}s -> {stage['seconds']:>9.3f}s  x{speedup:.2f}")
+    return lines
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help='distinct invoices per run')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage')
+    parser.add_argument('--stages', nargs='+', help='only run these stages')
+    parser.add_argument('--format', choices=['csv', 'parquet', 'feather'], default='csv', help='upload file format')
+    parser.add_argument('--partitions', type=int, default=1, help='GSTIN partitions reconciled in parallel')
+    parser.add_argument('--no-fuzzy', dest='fuzzy', action='store_false', help='skip the fuzzy matching pass')
+    parser.add_argument('--startup-records', type=int, default=10_000, help='distinct invoices of the cold-start runs')
+    parser.add_argument('--no-startup', dest='startup', action='store_false', help='skip the cold-start timings')
+    parser.add_argument('--duplicate-rate', type=float, default=0.01)
+    parser.add_argument('--fuzzy-variation-rate', type=float, default=0.1)
+    parser.add_argument('--date-skew-rate', type=float, default=0.05)
+    parser.add_argument('--key-noise-rate', type=float, default=0.02)
+    parser.add_argument('--invoices-per-party', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark-report.json', help='where to write the JSON report')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    options = parse_args(argv)
+    report = {
+        'version': REPORT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+        },
+        'parameters': {key: value for key, value in vars(options).items() if key not in ('output', 'compare')},
+        'scales': [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix='recon-benchmark-') as work_dir:
+        if options.startup:
+            print(f"🚀 cold start, {options.startup_records} records")
+            report['startup'] = benchmark_startup(options, work_dir)
+        for records in options.scales:
+            print(f"📊 {records} records")
+            report['scales'].append(benchmark_scale(records, options, work_dir))
+
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report['max_rss_bytes'] = max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+    with open(options.output, 'w') as output:
+        json.dump(report, output, indent=2)
+    print(f"📄 Report written to {options.output}")
+
+    if options.compare:
+        with open(options.compare) as previous:
+            print('\n'.join(compare_reports(json.load(previous), report)))
+
+
+if __name__ == '__main__':
+    main()
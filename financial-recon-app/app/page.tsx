@@ -63,8 +63,10 @@ export default function Home() {
       const formData2 = new FormData();
       formData2.append('file', aparFile);
       
-      console.log('Uploading AP/AR file to http://localhost:8000/upload/apar');
-      const aparResponse = await fetch('http://localhost:8000/upload/apar', {
+      // Upload AP/AR into the same session as the GST file
+      const aparUrl = `http://localhost:8000/upload/apar?session_id=${encodeURIComponent(gstResult.session_id)}`;
+      console.log('Uploading AP/AR file to', aparUrl);
+      const aparResponse = await fetch(aparUrl, {
         method: 'POST',
         body: formData2,
       });
@@ -95,7 +97,8 @@ export default function Home() {
     setCurrentStep(4);
 
     try {
-      const response = await fetch('http://localhost:8000/reconcile', {
+      const sessionId = encodeURIComponent(gstData.session_id);
+      const response = await fetch(`http://localhost:8000/reconcile?session_id=${sessionId}`, {
         method: 'POST',
       });
       
@@ -34,7 +34,8 @@ export default function DataSummary({ gstData, aparData, onReconcile }: DataSumm
   const loadMissingPreview = async () => {
     setIsLoadingPreview(true);
     try {
-      const response = await fetch('http://localhost:8000/preview-missing');
+      const sessionId = encodeURIComponent(gstData.session_id);
+      const response = await fetch(`http://localhost:8000/preview-missing?session_id=${sessionId}`);
       const data = await response.json();
       setMissingPreview(data);
       setShowPreview(true);
@@ -3,6 +3,8 @@
 import { useState, useCallback } from 'react';
 import { Upload, FileText, AlertCircle, CheckCircle, X, RefreshCw } from 'lucide-react'; // NEW: Added RefreshCw
 
+const ACCEPTED_EXTENSIONS = ['.csv', '.parquet', '.pq', '.arrow', '.feather', '.ipc'];
+
 interface FileUploadProps {
   label: string;
   onFileSelect: (file: File | null) => void;
@@ -28,8 +30,8 @@ export default function FileUpload({ label, onFileSelect, file }: FileUploadProp
     setError('');
     setSuccessMessage('');
 
-    if (!selectedFile.name.endsWith('.csv')) {
-      setError('Please upload a CSV file');
+    if (!ACCEPTED_EXTENSIONS.some((extension) => selectedFile.name.toLowerCase().endsWith(extension))) {
+      setError('Please upload a CSV, Parquet or Arrow file');
       return;
     }
 
@@ -70,7 +72,7 @@ export default function FileUpload({ label, onFileSelect, file }: FileUploadProp
   const handleReplaceFile = useCallback(() => {
     const input = document.createElement('input');
     input.type = 'file';
-    input.accept = '.csv';
+    input.accept = ACCEPTED_EXTENSIONS.join(',');
     input.onchange = (e: any) => {
       const selectedFile = e.target?.files?.[0];
       if (selectedFile) {
@@ -100,7 +102,7 @@ export default function FileUpload({ label, onFileSelect, file }: FileUploadProp
         >
           <input
             type="file"
-            accept=".csv"
+            accept={ACCEPTED_EXTENSIONS.join(',')}
             onChange={handleFileInput}
             className="absolute inset-0 w-full h-full opacity-0 cursor-pointer"
           />
@@ -110,7 +112,7 @@ export default function FileUpload({ label, onFileSelect, file }: FileUploadProp
           <p className="mt-2 text-sm text-gray-600">
             <span className="font-semibold">Click to upload</span> or drag and drop
           </p>
-          <p className="text-xs text-gray-500 mt-1">CSV files only</p>
+          <p className="text-xs text-gray-500 mt-1">CSV, Parquet or Arrow files</p>
         </div>
       ) : (
         <div className="border border-gray-300 rounded-lg p-4 bg-gray-50">
@@ -1,229 +1,276 @@
+"""Generate synthetic GST and AP/AR datasets for demos and benchmarks.
+
+Every column is built with NumPy in one pass, so millions of rows take seconds. Faker is only used for a
+small pool of party names and states. Run with --help for the knobs; the defaults match the original
+1000-invoice sample.
+"""
+import argparse
+import os
+from datetime import datetime
+from typing import Tuple
+
+import numpy as np
 import pandas as pd
-import random
-from datetime import datetime, timedelta
 from faker import Faker
 
-fake = Faker('en_IN')  # Indian locale for realistic names
-random.seed(42)  # For reproducibility
-
 # Configuration
 TOTAL_RECORDS = 1000
-EXACT_MATCH_COUNT = 850
-FUZZY_MATCH_COUNT = 100
-MISSING_IN_APAR = 25
-MISSING_IN_GST = 25
+MISSING_IN_APAR_RATE = 0.025
+MISSING_IN_GST_RATE = 0.025
+FUZZY_VARIATION_RATE = 0.1
+DUPLICATE_RATE = 0.0
+DATE_SKEW_RATE = 0.0
+KEY_NOISE_RATE = 0.0
+INVOICES_PER_PARTY = 1
+SEED = 42
+
+# Date range: Sep 2024 to Sep 2025
+START_DATE = '2024-09-01'
+END_DATE = '2025-09-30'
+
+# Faker is slow, so names come from a pool and are numbered beyond it
+NAME_POOL_SIZE = 5000
+
+# Largest shift, in days, applied to AP/AR dates picked for date skew
+MAX_DATE_SKEW_DAYS = 45
+
+STATE_CODES = np.array(['27', '29', '07', '09', '19', '24'])
+LETTERS = np.frombuffer(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ', dtype='S1')
+DIGITS = np.frombuffer(b'0123456789', dtype='S1')
+TAX_RATES = np.array([0.05, 0.12, 0.18, 0.28])
+
+OUTPUT_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
 
 # Helper functions
-def generate_gstin():
+def generate_gstins(rng: np.random.Generator, count: int) -> np.ndarray:
     """Generate realistic GSTIN format: 27ABCDE1234F1Z5"""
-    state_code = random.choice(['27', '29', '07', '09', '19', '24'])
-    pan = ''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', k=10))
-    entity = random.choice(['1', '2', '4'])
-    check = random.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
-    return f"{state_code}{pan}{entity}Z{check}"
-
-def generate_invoice_no(index):
-    """Generate invoice number"""
-    return f"INV-{str(index).zfill(5)}"
-
-def random_date(start_date, end_date):
-    """Generate random date between start and end"""
-    delta = end_date - start_date
-    random_days = random.randint(0, delta.days)
-    return start_date + timedelta(days=random_days)
+    # PAN: five letters, four digits, one letter
+    pan = np.concatenate([
+        LETTERS[rng.integers(0, 26, size=(count, 5))],
+        DIGITS[rng.integers(0, 10, size=(count, 4))],
+        LETTERS[rng.integers(0, 26, size=(count, 1))],
+    ], axis=1).view('S10').ravel().astype(str)
+    entity = rng.choice(np.array(['1', '2', '4']), count)
+    check = LETTERS[rng.integers(0, 26, count)].astype(str)
+    return (
+        pd.Series(rng.choice(STATE_CODES, count)) + pan + entity + 'Z' + check
+    ).to_numpy()
 
-# Date range: Sep 2024 to Sep 2025
-start_date = datetime(2024, 9, 1)
-end_date = datetime(2025, 9, 30)
-
-# Generate base data for matching records
-base_records = []
-
-for i in range(EXACT_MATCH_COUNT + FUZZY_MATCH_COUNT):
-    gstin = generate_gstin()
-    trade_name = fake.company()
-    invoice_no = generate_invoice_no(i + 1)
-    invoice_date = random_date(start_date, end_date)
-    taxable_value = round(random.uniform(10000, 500000), 2)
-    
-    # Tax calculation
-    tax_rate = random.choice([0.05, 0.12, 0.18, 0.28])
-    total_tax = round(taxable_value * tax_rate, 2)
-    
-    # Determine CGST/SGST vs IGST
-    is_interstate = random.choice([True, False])
-    if is_interstate:
-        cgst = 0
-        sgst = 0
-        igst = total_tax
-    else:
-        cgst = round(total_tax / 2, 2)
-        sgst = round(total_tax / 2, 2)
-        igst = 0
-    
-    invoice_value = round(taxable_value + total_tax, 2)
-    
-    base_records.append({
-        'gstin': gstin,
-        'trade_name': trade_name,
-        'invoice_no': invoice_no,
-        'invoice_date': invoice_date,
-        'invoice_value': invoice_value,
-        'taxable_value': taxable_value,
-        'cgst': cgst,
-        'sgst': sgst,
-        'igst': igst,
-        'total_tax': total_tax,
-        'place_of_supply': fake.state(),
-        'is_interstate': is_interstate
-    })
 
-print(f"✅ Generated {len(base_records)} base records")
-
-# Create GST Dataset
-gst_data = []
-
-# Add exact matches + fuzzy matches
-for record in base_records:
-    gst_data.append({
-        'GSTIN': record['gstin'],
-        'Trade_Name': record['trade_name'],
-        'Invoice_No': record['invoice_no'],
-        'Invoice_Date': record['invoice_date'].strftime('%Y-%m-%d'),
-        'Invoice_Value': record['invoice_value'],
-        'Taxable_Value': record['taxable_value'],
-        'CGST_Amount': record['cgst'],
-        'SGST_Amount': record['sgst'],
-        'IGST_Amount': record['igst'],
-        'Total_Tax': record['total_tax'],
-        'Reverse_Charge': random.choice(['Yes', 'No']),
-        'Place_of_Supply': record['place_of_supply'],
-        'Filing_Period': record['invoice_date'].strftime('%b-%Y'),
-        'Upload_Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    })
+def generate_invoice_numbers(count: int) -> np.ndarray:
+    """Generate invoice numbers INV-00001 onwards, widening past 99999"""
+    width = max(5, len(str(count)))
+    return ('INV-' + pd.Series(np.arange(1, count + 1)).astype(str).str.zfill(width)).to_numpy()
 
-# Add records missing in AP/AR
-for i in range(MISSING_IN_APAR):
-    idx = EXACT_MATCH_COUNT + FUZZY_MATCH_COUNT + i
-    gstin = generate_gstin()
-    taxable_value = round(random.uniform(10000, 500000), 2)
-    total_tax = round(taxable_value * 0.18, 2)
-    invoice_value = round(taxable_value + total_tax, 2)
-    invoice_date = random_date(start_date, end_date)
-    
-    gst_data.append({
-        'GSTIN': gstin,
-        'Trade_Name': fake.company(),
-        'Invoice_No': generate_invoice_no(idx + 1),
-        'Invoice_Date': invoice_date.strftime('%Y-%m-%d'),
-        'Invoice_Value': invoice_value,
-        'Taxable_Value': taxable_value,
-        'CGST_Amount': round(total_tax / 2, 2),
-        'SGST_Amount': round(total_tax / 2, 2),
-        'IGST_Amount': 0,
-        'Total_Tax': total_tax,
-        'Reverse_Charge': 'No',
-        'Place_of_Supply': fake.state(),
-        'Filing_Period': invoice_date.strftime('%b-%Y'),
-        'Upload_Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    })
 
-print(f"✅ GST dataset: {len(gst_data)} records")
-
-# Create AP/AR Dataset
-apar_data = []
-
-# Add exact matches (first 850)
-for i, record in enumerate(base_records[:EXACT_MATCH_COUNT]):
-    apar_data.append({
-        'Vendor_Customer_Name': record['trade_name'],
-        'GSTIN': record['gstin'],
-        'Invoice_No': record['invoice_no'],
-        'Invoice_Date': record['invoice_date'].strftime('%Y-%m-%d'),
-        'Ledger_Type': random.choice(['Payable', 'Receivable']),
-        'Invoice_Value': record['invoice_value'],  # Exact match
-        'Taxable_Value': record['taxable_value'],
-        'CGST_Amount': record['cgst'],
-        'SGST_Amount': record['sgst'],
-        'IGST_Amount': record['igst'],
-        'Total_Tax': record['total_tax'],
-        'Payment_Status': random.choice(['Paid', 'Unpaid', 'Partial']),
-        'Payment_Date': (record['invoice_date'] + timedelta(days=random.randint(1, 30))).strftime('%Y-%m-%d'),
-        'TDS_Deducted': round(record['invoice_value'] * 0.01, 2) if random.random() > 0.5 else 0,
-        'Account_Code': f"ACC-{random.randint(1000, 9999)}",
-        'Remarks': random.choice(['Verified', 'Pending review', 'Approved', '']),
-        'Upload_Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    })
+def add_key_noise(rng: np.random.Generator, invoice_numbers: pd.Series) -> pd.Series:
+    """Reformat invoice numbers the way ledgers often do: lowercase, other separators, extra zeros"""
+    variant = rng.integers(0, 4, len(invoice_numbers))
+    noisy = invoice_numbers.str.lower()
+    noisy = noisy.where(variant != 1, invoice_numbers.str.replace('-', '/', regex=False))
+    noisy = noisy.where(variant != 2, invoice_numbers.str.replace('-', '', regex=False))
+    noisy = noisy.where(variant != 3, invoice_numbers.str.replace('-', '-0', regex=False))
+    return noisy
+
+
+def format_dates(offsets: np.ndarray, date_format: str) -> np.ndarray:
+    """Format day offsets from START_DATE, formatting each distinct day once"""
+    days = pd.date_range(START_DATE, periods=int(offsets.max()) + 1 if len(offsets) else 1, freq='D')
+    return days.strftime(date_format).to_numpy()[offsets]
+
+
+def pick(rng: np.random.Generator, count: int, rate: float) -> np.ndarray:
+    """Boolean mask selecting round(count * rate) random rows"""
+    mask = np.zeros(count, dtype=bool)
+    mask[rng.choice(count, int(round(count * rate)), replace=False)] = True
+    return mask
 
-# Add fuzzy matches (next 100) - with ±2% amount variation
-for i, record in enumerate(base_records[EXACT_MATCH_COUNT:]):
-    # Add small variation to invoice value
-    variation = random.uniform(-0.02, 0.02)  # ±2%
-    fuzzy_invoice_value = round(record['invoice_value'] * (1 + variation), 2)
-    
-    apar_data.append({
-        'Vendor_Customer_Name': record['trade_name'],
-        'GSTIN': record['gstin'],
-        'Invoice_No': record['invoice_no'],
-        'Invoice_Date': record['invoice_date'].strftime('%Y-%m-%d'),
-        'Ledger_Type': random.choice(['Payable', 'Receivable']),
-        'Invoice_Value': fuzzy_invoice_value,  # Fuzzy match
-        'Taxable_Value': record['taxable_value'],
-        'CGST_Amount': record['cgst'],
-        'SGST_Amount': record['sgst'],
-        'IGST_Amount': record['igst'],
-        'Total_Tax': record['total_tax'],
-        'Payment_Status': random.choice(['Paid', 'Unpaid', 'Partial']),
-        'Payment_Date': (record['invoice_date'] + timedelta(days=random.randint(1, 30))).strftime('%Y-%m-%d'),
-        'TDS_Deducted': round(record['invoice_value'] * 0.01, 2),
-        'Account_Code': f"ACC-{random.randint(1000, 9999)}",
-        'Remarks': 'Amount discrepancy - verify TDS',
-        'Upload_Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    })
 
-# Add records missing in GST
-for i in range(MISSING_IN_GST):
-    idx = EXACT_MATCH_COUNT + FUZZY_MATCH_COUNT + MISSING_IN_APAR + i
-    gstin = generate_gstin()
-    taxable_value = round(random.uniform(10000, 500000), 2)
-    total_tax = round(taxable_value * 0.18, 2)
-    invoice_value = round(taxable_value + total_tax, 2)
-    invoice_date = random_date(start_date, end_date)
-    
-    apar_data.append({
-        'Vendor_Customer_Name': fake.company(),
-        'GSTIN': gstin,
-        'Invoice_No': generate_invoice_no(idx + 1),
-        'Invoice_Date': invoice_date.strftime('%Y-%m-%d'),
-        'Ledger_Type': random.choice(['Payable', 'Receivable']),
+def add_duplicates(rng: np.random.Generator, df: pd.DataFrame, rate: float) -> pd.DataFrame:
+    """Append copies of a random share of rows, as re-imported ledger entries would be"""
+    copies = rng.choice(len(df), int(round(len(df) * rate)), replace=False)
+    return pd.concat([df, df.iloc[np.sort(copies)]], ignore_index=True)
+
+
+def generate_datasets(
+    records: int = TOTAL_RECORDS,
+    missing_in_apar_rate: float = MISSING_IN_APAR_RATE,
+    missing_in_gst_rate: float = MISSING_IN_GST_RATE,
+    fuzzy_variation_rate: float = FUZZY_VARIATION_RATE,
+    duplicate_rate: float = DUPLICATE_RATE,
+    date_skew_rate: float = DATE_SKEW_RATE,
+    key_noise_rate: float = KEY_NOISE_RATE,
+    invoices_per_party: int = INVOICES_PER_PARTY,
+    seed: int = SEED,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Build the GST and AP/AR frames for ``records`` distinct invoices.
+
+    Invoices are split into GST-only, AP/AR-only and common ones. Rates other than the missing ones apply to
+    the common invoices: ``fuzzy_variation_rate`` moves the AP/AR amount by up to ±2%, ``date_skew_rate``
+    shifts the AP/AR date and ``key_noise_rate`` reformats the AP/AR Invoice_No. ``duplicate_rate`` appends
+    repeated rows to both files.
+    """
+    rng = np.random.default_rng(seed)
+    fake = Faker('en_IN')  # Indian locale for realistic names
+    fake.seed_instance(seed)
+
+    missing_in_apar = int(round(records * missing_in_apar_rate))
+    missing_in_gst = int(round(records * missing_in_gst_rate))
+    common = records - missing_in_apar - missing_in_gst
+
+    # Parties: GSTIN, name and state, shared by invoices_per_party invoices each
+    parties = max(1, -(-records // invoices_per_party))
+    name_pool = np.array([fake.company() for _ in range(min(parties, NAME_POOL_SIZE))], dtype=object)
+    party_names = pd.Series(name_pool[np.arange(parties) % len(name_pool)])
+    numbered = np.arange(parties) >= len(name_pool)
+    party_names[numbered] = party_names[numbered] + ' ' + pd.Series(np.arange(parties) // len(name_pool))[numbered].astype(str)
+    party_gstins = generate_gstins(rng, parties)
+    state_pool = np.array(sorted({fake.state() for _ in range(200)}), dtype=object)
+    party_states = state_pool[rng.integers(0, len(state_pool), parties)]
+    party = rng.integers(0, parties, records)
+
+    # Invoice amounts and taxes
+    taxable_value = np.round(rng.uniform(10000, 500000, records), 2)
+    tax_rate = rng.choice(TAX_RATES, records)
+    total_tax = np.round(taxable_value * tax_rate, 2)
+    is_interstate = rng.random(records) < 0.5
+    half_tax = np.round(total_tax / 2, 2)
+    cgst = np.where(is_interstate, 0, half_tax)
+    igst = np.where(is_interstate, total_tax, 0)
+    invoice_value = np.round(taxable_value + total_tax, 2)
+
+    span = (pd.Timestamp(END_DATE) - pd.Timestamp(START_DATE)).days
+    day = rng.integers(0, span + 1, records)
+    invoice_date = format_dates(day, '%Y-%m-%d')
+    upload_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    invoices = pd.DataFrame({
+        'GSTIN': party_gstins[party],
+        'Name': party_names.to_numpy()[party],
+        'Invoice_No': generate_invoice_numbers(records),
+        'Invoice_Date': invoice_date,
         'Invoice_Value': invoice_value,
         'Taxable_Value': taxable_value,
-        'CGST_Amount': round(total_tax / 2, 2),
-        'SGST_Amount': round(total_tax / 2, 2),
-        'IGST_Amount': 0,
+        'CGST_Amount': cgst,
+        'SGST_Amount': cgst,
+        'IGST_Amount': igst,
         'Total_Tax': total_tax,
-        'Payment_Status': 'Unpaid',
-        'Payment_Date': '',
-        'TDS_Deducted': 0,
-        'Account_Code': f"ACC-{random.randint(1000, 9999)}",
-        'Remarks': 'Missing in GST filing',
-        'Upload_Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     })
+    # Invoices are laid out as common, then GST-only, then AP/AR-only
+    gst_rows = slice(0, common + missing_in_apar)
+    apar_rows = np.r_[0:common, common + missing_in_apar:records]
+
+    # Create GST Dataset
+    gst = invoices.iloc[gst_rows].rename(columns={'Name': 'Trade_Name'})
+    gst_count = len(gst)
+    gst = gst.assign(
+        Reverse_Charge=rng.choice(np.array(['Yes', 'No']), gst_count),
+        Place_of_Supply=party_states[party[gst_rows]],
+        Filing_Period=format_dates(day[gst_rows], '%b-%Y'),
+        Upload_Timestamp=upload_timestamp,
+    )[['GSTIN', 'Trade_Name', 'Invoice_No', 'Invoice_Date', 'Invoice_Value', 'Taxable_Value', 'CGST_Amount',
+       'SGST_Amount', 'IGST_Amount', 'Total_Tax', 'Reverse_Charge', 'Place_of_Supply', 'Filing_Period',
+       'Upload_Timestamp']]
+
+    # Create AP/AR Dataset
+    apar = invoices.iloc[apar_rows].rename(columns={'Name': 'Vendor_Customer_Name'}).reset_index(drop=True)
+    apar_count = len(apar)
+    is_common = np.arange(apar_count) < common
+
+    def pick_common(rate: float) -> np.ndarray:
+        return np.r_[pick(rng, common, rate), np.zeros(missing_in_gst, dtype=bool)]
+
+    # Fuzzy matches - with ±2% amount variation
+    fuzzy = pick_common(fuzzy_variation_rate)
+    variation = rng.uniform(-0.02, 0.02, apar_count)
+    apar['Invoice_Value'] = np.where(fuzzy, np.round(apar['Invoice_Value'] * (1 + variation), 2), apar['Invoice_Value'])
+
+    # Date skew - AP/AR booked some days before or after the GST invoice date
+    skewed = pick_common(date_skew_rate)
+    shift = rng.integers(1, MAX_DATE_SKEW_DAYS + 1, apar_count) * rng.choice(np.array([-1, 1]), apar_count)
+    apar_day = np.where(skewed, np.clip(day[apar_rows] + shift, 0, None), day[apar_rows])
+    apar['Invoice_Date'] = format_dates(apar_day, '%Y-%m-%d')
+
+    # Key noise - same invoice, differently formatted Invoice_No
+    noisy = np.flatnonzero(pick_common(key_noise_rate))
+    apar.loc[noisy, 'Invoice_No'] = add_key_noise(rng, apar['Invoice_No'].iloc[noisy]).to_numpy()
+
+    tds = np.round(apar['Invoice_Value'].to_numpy() * 0.01, 2)
+    payment_date = format_dates(apar_day + rng.integers(1, 31, apar_count), '%Y-%m-%d')
+    apar = apar.assign(
+        Ledger_Type=rng.choice(np.array(['Payable', 'Receivable']), apar_count),
+        Payment_Status=np.where(is_common, rng.choice(np.array(['Paid', 'Unpaid', 'Partial']), apar_count), 'Unpaid'),
+        Payment_Date=np.where(is_common, payment_date, ''),
+        TDS_Deducted=np.where(fuzzy | (is_common & (rng.random(apar_count) > 0.5)), tds, 0),
+        Account_Code='ACC-' + pd.Series(rng.integers(1000, 10000, apar_count)).astype(str),
+        Remarks=np.where(
+            fuzzy, 'Amount discrepancy - verify TDS',
+            np.where(is_common, rng.choice(np.array(['Verified', 'Pending review', 'Approved', '']), apar_count), 'Missing in GST filing'),
+        ),
+        Upload_Timestamp=upload_timestamp,
+    )[['Vendor_Customer_Name', 'GSTIN', 'Invoice_No', 'Invoice_Date', 'Ledger_Type', 'Invoice_Value',
+       'Taxable_Value', 'CGST_Amount', 'SGST_Amount', 'IGST_Amount', 'Total_Tax', 'Payment_Status',
+       'Payment_Date', 'TDS_Deducted', 'Account_Code', 'Remarks', 'Upload_Timestamp']]
+
+    gst = add_duplicates(rng, gst.reset_index(drop=True), duplicate_rate)
+    apar = add_duplicates(rng, apar, duplicate_rate)
+    return gst, apar
+
+
+def write_datasets(gst: pd.DataFrame, apar: pd.DataFrame, output_dir: str = '.', output_format: str = 'csv') -> Tuple[str, str]:
+    """Save both frames as gst_data.<ext> and apar_data.<ext> and return their paths"""
+    extension = OUTPUT_FORMATS[output_format]
+    os.makedirs(output_dir, exist_ok=True)
+    paths = (os.path.join(output_dir, f'gst_data{extension}'), os.path.join(output_dir, f'apar_data{extension}'))
+    for frame, path in zip((gst, apar), paths):
+        if output_format == 'csv':
+            frame.to_csv(path, index=False)
+        elif output_format == 'parquet':
+            frame.to_parquet(path, index=False)
+        else:
+            frame.to_feather(path)
+    return paths
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=TOTAL_RECORDS, help='distinct invoices across both files')
+    parser.add_argument('--missing-in-apar-rate', type=float, default=MISSING_IN_APAR_RATE, help='share of invoices only in GST')
+    parser.add_argument('--missing-in-gst-rate', type=float, default=MISSING_IN_GST_RATE, help='share of invoices only in AP/AR')
+    parser.add_argument('--fuzzy-variation-rate', type=float, default=FUZZY_VARIATION_RATE, help='share of common invoices with a ±2%% amount change')
+    parser.add_argument('--duplicate-rate', type=float, default=DUPLICATE_RATE, help='share of rows repeated in each file')
+    parser.add_argument('--date-skew-rate', type=float, default=DATE_SKEW_RATE, help='share of common invoices with a shifted AP/AR date')
+    parser.add_argument('--key-noise-rate', type=float, default=KEY_NOISE_RATE, help='share of common invoices with a reformatted AP/AR Invoice_No')
+    parser.add_argument('--invoices-per-party', type=int, default=INVOICES_PER_PARTY, help='invoices sharing one GSTIN and name')
+    parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='csv', help='output file format')
+    parser.add_argument('--output-dir', default='.', help='directory for gst_data and apar_data')
+    parser.add_argument('--seed', type=int, default=SEED)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    df_gst, df_apar = generate_datasets(
+        records=args.records,
+        missing_in_apar_rate=args.missing_in_apar_rate,
+        missing_in_gst_rate=args.missing_in_gst_rate,
+        fuzzy_variation_rate=args.fuzzy_variation_rate,
+        duplicate_rate=args.duplicate_rate,
+        date_skew_rate=args.date_skew_rate,
+        key_noise_rate=args.key_noise_rate,
+        invoices_per_party=args.invoices_per_party,
+        seed=args.seed,
+    )
+    print(f"✅ GST dataset: {len(df_gst)} records")
+    print(f"✅ AP/AR dataset: {len(df_apar)} records")
 
-print(f"✅ AP/AR dataset: {len(apar_data)} records")
+    gst_path, apar_path = write_datasets(df_gst, df_apar, args.output_dir, args.format)
 
-# Convert to DataFrames and save as CSV
-df_gst = pd.DataFrame(gst_data)
-df_apar = pd.DataFrame(apar_data)
+    print("\n🎉 Success! Files created:")
+    print(f"📄 {gst_path}")
+    print(f"📄 {apar_path}")
 
-df_gst.to_csv('gst_data.csv', index=False)
-df_apar.to_csv('apar_data.csv', index=False)
 
-print("\n🎉 Success! Files created:")
-print("📄 gst_data.csv")
-print("📄 apar_data.csv")
-print(f"\n📊 Dataset Statistics:")
-print(f"   - Exact matches: {EXACT_MATCH_COUNT}")
-print(f"   - Fuzzy matches: {FUZZY_MATCH_COUNT}")
-print(f"   - Missing in AP/AR: {MISSING_IN_APAR}")
-print(f"   - Missing in GST: {MISSING_IN_GST}")
\ No newline at end of file
+if __name__ == '__main__':
+    main()